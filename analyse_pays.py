@@ -1,57 +1,126 @@
+import numpy as np
 import pandas as pd
 from scipy.cluster.hierarchy import linkage, leaves_list
-import streamlit as st
 from collections import Counter
 import matplotlib.pyplot as plt
 from io import BytesIO
+from instrumentation import instrumented
 
 
-def generate_tables_pays(df_impacts):
-    """ """
-    # remove trailing semicolon on Zone geo
-    df_impacts["Zone géographique"] = df_impacts["Zone géographique"].str.rstrip(";")
-
-    # Données mix electrique
-    st.write(df_impacts)
-    df_impacts["Categorie_niv_3"] = df_impacts["Categorie_niv_3"].str.strip()
-    df_mix_electrique = df_impacts[df_impacts["Categorie_niv_2"] == "Electricité"]
-    df_mix_electrique = df_mix_electrique[
-        df_mix_electrique["Categorie_niv_3"] == "Mix moyen"
-    ]
-
-    # Données transport ferroviaire
-    df_transport_ferro = df_impacts[df_impacts["Categorie_niv_2"] == "Ferroviaire"]
-    df_transport_ferro = df_transport_ferro[
-        df_transport_ferro["Categorie_niv_3"] == "Flotte moyenne nationale européenne"
-    ]
-
-    # Données transport routier
-    df_transport_routier = df_impacts[df_impacts["Categorie_niv_2"] == "Routier"]
-    df_transport_routier = df_transport_routier[
-        df_transport_routier["Categorie_niv_3"] == "Transport à température ambiante"
-    ]
-    df_transport_routier = df_transport_routier[
-        df_transport_routier["Categorie_niv_4"] == "Flotte moyenne nationale européenne"
-    ]
-    df_transport_routier = df_transport_routier[
-        ~df_transport_routier["Nom_procede"].str.contains("100%", na=False)
-    ]
-
-    # display le tableau
-    st.subheader("Tableau des pays")
-    st.write(df_mix_electrique)
-    st.write(df_transport_ferro)
-    st.write(df_transport_routier)
-
-    # Exporter le tableau en json
-    df_mix_electrique.to_json(
-        "export/mix_electriques.json", orient="records", force_ascii=False
-    )
-    df_transport_ferro.to_json(
-        "export/transport_ferro.json", orient="records", force_ascii=False
-    )
-    df_transport_routier.to_json(
-        "export/transport_routier.json", orient="records", force_ascii=False
-    )
-
-    return
+class ExtractSpec:
+    """
+    Extrait déclaratif de la table longue des impacts (ex: mix électriques
+    par pays).
+    :param name: Nom de l'extrait
+    :param conditions: {colonne: valeur ou liste de valeurs acceptées}, sur
+        les colonnes de la hiérarchie (ex: {"Categorie_niv_2": "Electricité"}) ;
+        les valeurs sont comparées sans les espaces de début et de fin
+    :param exclude_names: Sous-chaînes excluant un procédé de l'extrait
+        lorsqu'elles apparaissent dans Nom_procede
+    :param path: Fichier exporté (par défaut export/<name>.json)
+    """
+
+    def __init__(self, name, conditions, exclude_names=(), path=None):
+        self.name = name
+        self.conditions = {
+            column: [values] if isinstance(values, str) else list(values)
+            for column, values in conditions.items()
+        }
+        self.exclude_names = list(exclude_names)
+        self.path = path or f"export/{name}.json"
+
+
+EXTRACT_SPECS = [
+    ExtractSpec(
+        "mix_electriques",
+        {"Categorie_niv_2": "Electricité", "Categorie_niv_3": "Mix moyen"},
+    ),
+    ExtractSpec(
+        "transport_ferro",
+        {
+            "Categorie_niv_2": "Ferroviaire",
+            "Categorie_niv_3": "Flotte moyenne nationale européenne",
+        },
+    ),
+    ExtractSpec(
+        "transport_routier",
+        {
+            "Categorie_niv_2": "Routier",
+            "Categorie_niv_3": "Transport à température ambiante",
+            "Categorie_niv_4": "Flotte moyenne nationale européenne",
+        },
+        exclude_names=["100%"],
+    ),
+    ExtractSpec(
+        "mix_chaleur",
+        {"Categorie_niv_2": "Chaleur", "Categorie_niv_3": "Mix moyen"},
+    ),
+]
+
+# Nettoyage des colonnes des tables extraites (la table d'entrée n'est pas
+# modifiée) : ";" final des zones géographiques, espaces des catégories niv3
+OUTPUT_CLEANERS = {
+    "Zone géographique": lambda values: values.str.rstrip(";"),
+    "Categorie_niv_3": lambda values: values.str.strip(),
+}
+
+
+def _codes(values):
+    # Codes des valeurs distinctes d'une colonne ; les valeurs manquantes
+    # (code -1) pointent sur une entrée ajoutée en fin de table
+    codes, uniques = pd.factorize(values)
+    return np.where(codes < 0, len(uniques), codes), pd.Series(uniques, dtype=object)
+
+
+def compile_specs(df, specs):
+    """
+    Évalue tous les extraits en un passage : chaque colonne utilisée est
+    codée une seule fois, chaque condition devient un index booléen sur les
+    valeurs distinctes (valeurs x extraits), lu ensuite par code de ligne.
+    :param df: Table longue des impacts (non modifiée)
+    :param specs: Liste d'ExtractSpec
+    :return: Tableau booléen (lignes x extraits)
+    """
+    masks = np.ones((len(df), len(specs)), dtype=bool)
+
+    columns = {c for spec in specs for c in spec.conditions}
+    for column in sorted(columns):
+        codes, uniques = _codes(df[column])
+        labels = uniques.str.strip()
+        lookup = np.zeros((len(uniques) + 1, len(specs)), dtype=bool)
+        for k, spec in enumerate(specs):
+            if column in spec.conditions:
+                lookup[:-1, k] = labels.isin(spec.conditions[column]).to_numpy()
+            else:
+                lookup[:, k] = True
+        masks &= lookup[codes]
+
+    if any(spec.exclude_names for spec in specs):
+        codes, uniques = _codes(df["Nom_procede"])
+        lookup = np.ones((len(uniques) + 1, len(specs)), dtype=bool)
+        for k, spec in enumerate(specs):
+            for pattern in spec.exclude_names:
+                lookup[:-1, k] &= ~uniques.str.contains(
+                    pattern, regex=False, na=False
+                ).to_numpy()
+        masks &= lookup[codes]
+    return masks
+
+
+@instrumented()
+def generate_tables_pays(df_impacts, specs=EXTRACT_SPECS):
+    """
+    Tables par pays pour le frontend (mix électriques, transports...),
+    décrites par des ExtractSpec et évaluées ensemble.
+    :param df_impacts: Table longue des impacts enrichie (df_im), non modifiée
+    :param specs: Liste d'ExtractSpec
+    :return: Dictionnaire {fichier exporté: DataFrame}
+    """
+    masks = compile_specs(df_impacts, specs)
+    tables = {}
+    for k, spec in enumerate(specs):
+        table = df_impacts[masks[:, k]].copy()
+        for column, clean in OUTPUT_CLEANERS.items():
+            table[column] = clean(table[column])
+        tables[spec.path] = table
+    return tables
@@ -0,0 +1,456 @@
+"""
+API HTTP locale servant les tables du chargement depuis la mémoire : le
+frontend interroge un procédé, un noeud de la hiérarchie, un indicateur ou
+un pays au lieu de relire les gros fichiers de export/. Les données sont
+chargées une seule fois au démarrage ; les réponses sont paginées, mises en
+cache (corps JSON et version gzip précompressée) et portent un ETag.
+
+Usage : python api.py [--host 127.0.0.1] [--port 8502] [--version BI_2.02]
+                      [--data data]
+
+Routes (GET, réponses JSON) :
+    /indicateurs
+    /procedes?q=acier&noeud=Energie/Electricité&offset=0&limit=100
+    /procedes/<uuid>
+    /impacts?uuid=...&noeud=...&indicateur=...&pays=France&offset=0&limit=100
+    /arbre?noeud=Energie/Electricité
+    /pays                          (liste des extraits par pays)
+    /pays/<extrait>?pays=France&indicateur=...&offset=0&limit=100
+
+Dans le paramètre noeud, un niveau vide de la hiérarchie (ex: procédé sans
+catégorie de niveau 4) s'écrit EMPTY_LEVEL :
+    /arbre?noeud=Metal/Autre métal non-ferreux/produit intermédiaire/(vide)
+Les erreurs sont renvoyées en JSON ({"erreur": ...}) : 400 paramètre invalide,
+404 ressource inconnue, 500 erreur interne.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from traceback import format_exc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from load import DATA_DIR, run_pipeline, version_params
+
+
+# Pagination par défaut et taille de page maximale
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Séparateur des niveaux dans le paramètre noeud (ex: Energie/Electricité)
+NODE_SEPARATOR = "/"
+
+# Libellé d'un niveau vide ("") dans le paramètre noeud : un segment vide du
+# chemin (ex: "/" final) est ignoré, un niveau vide doit donc être nommé
+EMPTY_LEVEL = "(vide)"
+
+# Réponses plus petites que ce seuil : envoyées sans compression
+GZIP_MIN_BYTES = 1024
+
+ZONE = "Zone géographique"
+
+# Étapes du pipeline chargées en mémoire par l'API
+API_STAGES = [
+    "parse_meta",
+    "parse_categories",
+    "hierarchy",
+    "aggregate",
+    "tables_pays",
+    "search_index",
+]
+
+
+class ApiError(Exception):
+    """
+    Erreur renvoyée au client avec un code HTTP (400 paramètre invalide,
+    404 ressource inconnue).
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _zones(series):
+    # Même nettoyage que les extraits par pays (";" final)
+    return series.astype(str).str.rstrip(";").str.strip()
+
+
+def _positions(values):
+    # {valeur: positions des lignes}, positions triées
+    return pd.Series(values).groupby(values, sort=False).indices
+
+
+def _records(df):
+    # Même sérialisation que les fichiers exportés (NaN -> null)
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+class ImpactApi:
+    """
+    Requêtes de l'API sur les tables du chargement gardées en mémoire.
+    Les filtres s'appuient sur des index {valeur: positions des lignes}
+    construits une fois (UUID, indicateur, pays) et sur l'index de la
+    hiérarchie : une requête intersecte quelques tableaux de positions au
+    lieu de parcourir la table.
+    :param results: Résultats de run_pipeline (étapes de API_STAGES)
+    """
+
+    def __init__(self, results):
+        self.meta = results["parse_meta"].reset_index(drop=True)
+        self.categories = results["parse_categories"]
+        self.hierarchy = results["hierarchy"]
+        self.search_index = results["search_index"]
+        self.impacts, _ = results["aggregate"]
+        self.impacts = self.impacts.reset_index(drop=True)
+        self.tree = self.hierarchy.to_tree()
+
+        self.meta_rows = _positions(self.meta["UUID"].to_numpy())
+        self.impact_index = {
+            "uuid": _positions(self.impacts["UUID_procede"].to_numpy()),
+            "indicateur": _positions(self.impacts["category_name"].to_numpy()),
+            "pays": _positions(_zones(self.impacts[ZONE]).to_numpy()),
+        }
+        self.country_tables = {}
+        for path, df in results["tables_pays"].items():
+            name = os.path.splitext(os.path.basename(path))[0]
+            df = df.reset_index(drop=True)
+            index = {"indicateur": _positions(df["category_name"].to_numpy())}
+            if ZONE in df:
+                index["pays"] = _positions(_zones(df[ZONE]).to_numpy())
+            self.country_tables[name] = (df, index)
+
+    @staticmethod
+    def _page(df, rows, offset, limit):
+        total = len(df) if rows is None else len(rows)
+        rows = np.arange(total) if rows is None else rows
+        page = df.iloc[rows[offset : offset + limit]]
+        return {
+            "total": int(total),
+            "offset": offset,
+            "limit": limit,
+            "items": _records(page),
+        }
+
+    @staticmethod
+    def _filter(index, filters):
+        # Intersection des positions de chaque filtre (None = aucun filtre)
+        rows = None
+        for name, value in filters.items():
+            if value is None:
+                continue
+            found = index[name].get(value, np.empty(0, dtype=np.int64))
+            rows = found if rows is None else np.intersect1d(rows, found)
+        return rows
+
+    def _node_uuids(self, node):
+        path = tuple(node)
+        if path and path[-1] not in self.hierarchy.children_of(path[:-1]):
+            raise ApiError(404, f"Noeud inconnu : {_node_label(path)}")
+        return self.meta["UUID"].to_numpy()[self.hierarchy.subtree_rows(path)]
+
+    def indicators(self):
+        """
+        :return: Liste des catégories d'impacts (UUID, noms, unité)
+        """
+        columns = ["UUID_cat", "Nom français", "English Name", "Unité de référence"]
+        return _records(self.categories[columns])
+
+    def processes(self, q=None, node=None, offset=0, limit=DEFAULT_LIMIT):
+        """
+        Procédés, filtrés par recherche approchée et/ou noeud de la hiérarchie.
+        :param q: Texte recherché (résultats triés par pertinence)
+        :param node: Chemin du noeud (tuple de libellés)
+        :return: Page de métadonnées des procédés
+        """
+        rows = None
+        if node is not None:
+            uuids = self._node_uuids(node)
+            rows = np.concatenate(
+                [self.meta_rows[u] for u in uuids] or [np.empty(0, dtype=np.int64)]
+            )
+            rows.sort()
+        if q:
+            ranked = self.search_index.search(q, k=len(self.meta))["UUID"]
+            found = np.concatenate(
+                [self.meta_rows[u] for u in ranked if u in self.meta_rows]
+                or [np.empty(0, dtype=np.int64)]
+            )
+            rows = found if rows is None else found[np.isin(found, rows)]
+        return self._page(self.meta, rows, offset, limit)
+
+    def process(self, uuid):
+        """
+        Métadonnées et impacts d'un procédé.
+        :return: Dictionnaire {"procede": {...}, "impacts": [...]}
+        """
+        if uuid not in self.meta_rows:
+            raise ApiError(404, f"Procédé inconnu : {uuid}")
+        meta = self.meta.iloc[self.meta_rows[uuid][:1]]
+        rows = self.impact_index["uuid"].get(uuid, np.empty(0, dtype=np.int64))
+        columns = ["UUID_cat", "category_name", "valeur", "Unité de référence"]
+        return {
+            "procede": _records(meta)[0],
+            "impacts": _records(self.impacts.iloc[rows][columns]),
+        }
+
+    def impacts_query(
+        self,
+        uuid=None,
+        node=None,
+        indicator=None,
+        country=None,
+        offset=0,
+        limit=DEFAULT_LIMIT,
+    ):
+        """
+        Lignes de la table longue enrichie (impacts_long_merged), filtrées.
+        :param uuid: UUID du procédé
+        :param node: Chemin du noeud (tuple de libellés)
+        :param indicator: Nom français de la catégorie d'impact
+        :param country: Zone géographique (ex: "France")
+        :return: Page de lignes
+        """
+        index = self.impact_index
+        rows = self._filter(
+            index, {"uuid": uuid, "indicateur": indicator, "pays": country}
+        )
+        if node is not None:
+            uuids = self._node_uuids(node)
+            found = [index["uuid"][u] for u in uuids if u in index["uuid"]]
+            found = np.sort(np.concatenate(found or [np.empty(0, dtype=np.int64)]))
+            rows = found if rows is None else np.intersect1d(rows, found)
+        return self._page(self.impacts, rows, offset, limit)
+
+    def subtree(self, node=()):
+        """
+        Sous-arbre d'un noeud de la hiérarchie (même structure que
+        arbre_categories.json).
+        :return: Dictionnaire {"noeud": [...], "arbre": {...}}
+        """
+        tree = self.tree
+        for level in node:
+            if not isinstance(tree, dict) or level not in tree:
+                raise ApiError(404, f"Noeud inconnu : {_node_label(node)}")
+            tree = tree[level]
+        return {"noeud": list(node), "arbre": tree}
+
+    def country_table(
+        self, name, country=None, indicator=None, offset=0, limit=DEFAULT_LIMIT
+    ):
+        """
+        Lignes d'un extrait par pays (ex: mix_electriques), filtrées.
+        :param name: Nom de l'extrait (cf. country_tables)
+        :return: Page de lignes
+        """
+        if name not in self.country_tables:
+            raise ApiError(404, f"Extrait inconnu : {name}")
+        df, index = self.country_tables[name]
+        if country is not None and "pays" not in index:
+            raise ApiError(400, f"L'extrait {name} n'a pas de colonne {ZONE}")
+        rows = self._filter(index, {"indicateur": indicator, "pays": country})
+        return self._page(df, rows, offset, limit)
+
+
+class ResponseCache:
+    """
+    Cache borné des réponses (LRU) : corps JSON, version gzip précompressée
+    et ETag, calculés une fois par requête distincte.
+    :param max_entries: Nombre maximal de réponses gardées
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        Réponse mise en cache pour une clé, calculée par compute() si absente.
+        :param compute: Fonction renvoyant l'objet JSON de la réponse
+        :return: Tuple (etag, corps, corps gzip ou None)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        body = json.dumps(compute(), ensure_ascii=False).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        compressed = None
+        if len(body) >= GZIP_MIN_BYTES:
+            compressed = gzip.compress(body, mtime=0)
+        entry = (etag, body, compressed)
+
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+
+def _int_param(params, name, default, maximum=None):
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Paramètre {name} non entier : {value!r}")
+    if value < 0:
+        raise ApiError(400, f"Paramètre {name} négatif : {value}")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _node_param(params):
+    node = params.get("noeud")
+    if node is None:
+        return None
+    return tuple(
+        "" if level == EMPTY_LEVEL else level
+        for level in node.split(NODE_SEPARATOR)
+        if level
+    )
+
+
+def _node_label(node):
+    return NODE_SEPARATOR.join(level or EMPTY_LEVEL for level in node)
+
+
+def route(api, path, params):
+    """
+    Réponse d'une requête GET.
+    :param api: ImpactApi
+    :param path: Chemin de l'URL (décodé)
+    :param params: {paramètre: valeur} de la chaîne de requête
+    :return: Objet JSON de la réponse
+    """
+    parts = [p for p in path.split("/") if p]
+    page = {
+        "offset": _int_param(params, "offset", 0),
+        "limit": _int_param(params, "limit", DEFAULT_LIMIT, MAX_LIMIT),
+    }
+    if parts == ["indicateurs"]:
+        return api.indicators()
+    if parts == ["procedes"]:
+        return api.processes(params.get("q"), _node_param(params), **page)
+    if len(parts) == 2 and parts[0] == "procedes":
+        return api.process(parts[1])
+    if parts == ["impacts"]:
+        return api.impacts_query(
+            params.get("uuid"),
+            _node_param(params),
+            params.get("indicateur"),
+            params.get("pays"),
+            **page,
+        )
+    if parts == ["arbre"]:
+        return api.subtree(_node_param(params) or ())
+    if parts == ["pays"]:
+        return sorted(api.country_tables)
+    if len(parts) == 2 and parts[0] == "pays":
+        return api.country_table(
+            parts[1], params.get("pays"), params.get("indicateur"), **page
+        )
+    raise ApiError(404, f"Route inconnue : {path}")
+
+
+def make_handler(api, cache):
+    """
+    Classe de gestionnaire HTTP liée à une ImpactApi et à son cache.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            path = unquote(url.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            key = (path, tuple(sorted(params.items())))
+            try:
+                etag, body, compressed = cache.get(
+                    key, lambda: route(api, path, params)
+                )
+            except ApiError as e:
+                self._send_error(e.status, str(e))
+                return
+            except Exception:
+                # Erreur inattendue : trace côté serveur, corps JSON côté client
+                self.log_error("Erreur interne sur %s :\n%s", path, format_exc())
+                self._send_error(500, "Erreur interne du serveur")
+                return
+
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            accepts_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+            if compressed is not None and accepts_gzip:
+                self._send(200, compressed, etag, encoding="gzip")
+            else:
+                self._send(200, body, etag)
+
+        def _send_error(self, status, message):
+            body = json.dumps({"erreur": message}, ensure_ascii=False)
+            self._send(status, body.encode("utf-8"))
+
+        def _send(self, status, body, etag=None, encoding=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Vary", "Accept-Encoding")
+            if etag is not None:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            if encoding is not None:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def load_api(version=None, directory=None):
+    """
+    Exécute le pipeline de chargement (sans export) et construit l'API.
+    :param version: Version de la Base Impacts (None = fichiers de DEFAULT_PARAMS)
+    :param directory: Dossier des fichiers sources (par défaut DATA_DIR)
+    :return: ImpactApi
+    """
+    params = version_params(version, directory or DATA_DIR)
+    return ImpactApi(run_pipeline(params, targets=API_STAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--version", help="Version de la Base Impacts (ex: BI_2.02)")
+    parser.add_argument("--data", help="Dossier des fichiers sources")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    api = load_api(args.version, args.data)
+    print(f"Données chargées en {time.perf_counter() - start:.1f} s")
+
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(api, ResponseCache())
+    )
+    print(f"API disponible sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,27 +3,69 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from collections import Counter
 from load import (
+    DEFAULT_VERSION,
+    dataset_versions,
     load_data,
 )
+from instrumentation import memory_tracking, recent_records
 
 # Imports internes
 from page_procede import page_procede
 from page_comparatif import page_comparatif
+from page_versions import page_versions
 
 
 st.set_page_config(
     page_title="Dashboard Empreinte",  # layout="wide"  # 👈 ceci active le mode large
 )
 
-df_meta, df_impacts, df_cat = load_data()
-
-# Menu de navigation
-st.sidebar.title("Navigation")
-page = st.sidebar.radio(
-    "Aller à :", ["Accueil", "Impacts par procédé", "Comparatif procédé", "À propos"]
+show_frames = st.sidebar.checkbox("Afficher les tables intermédiaires", value=False)
+show_timings = st.sidebar.checkbox("Afficher les mesures de performance", value=False)
+# Pic mémoire via tracemalloc : ralentit tout le processus pendant
+# l'exécution mesurée, les sessions qui le mesurent passent une à une
+track_memory = show_timings and st.sidebar.checkbox(
+    "Mesurer le pic mémoire", value=False
+)
+# Version de la Base Impacts affichée (une par jeu de fichiers de data/)
+versions = list(dataset_versions()) or [DEFAULT_VERSION]
+version = st.sidebar.selectbox(
+    "Version de la Base Impacts",
+    versions,
+    index=versions.index(DEFAULT_VERSION) if DEFAULT_VERSION in versions else 0,
 )
+if version == DEFAULT_VERSION:
+    version = None  # Fichiers de DEFAULT_PARAMS (et bundle courant)
+with memory_tracking(track_memory):
+    df_meta, df_impacts, df_cat = load_data(show_frames, version)
+
+    # Menu de navigation
+    st.sidebar.title("Navigation")
+    page = st.sidebar.radio(
+        "Aller à :",
+        [
+            "Accueil",
+            "Impacts par procédé",
+            "Comparatif procédé",
+            "Comparaison de versions",
+            "À propos",
+        ],
+    )
+
+    if page == "Comparaison de versions":
+        page_versions()
+    elif page == "Impacts par procédé":
+        page_procede(version)
+    else:
+        page_comparatif(df_meta, df_impacts, df_cat, version)
 
-page_comparatif(df_meta, df_impacts, df_cat)
+# Mesures des étapes (chargement, exports, pages), aussi écrites dans
+# logs/instrumentation.jsonl
+if show_timings:
+    st.sidebar.subheader("Mesures de performance")
+    st.sidebar.dataframe(
+        recent_records(100).iloc[::-1][["stage", "wall_s", "cpu_s", "peak_mb", "rows"]],
+        hide_index=True,
+    )
 
 # # Page: Accueil
 # if page == "Accueil":
@@ -37,7 +79,7 @@ page_comparatif(df_meta, df_impacts, df_cat)
 # if page == "Impacts par procédé":
 #     st.title("Visualisation des impacts environnementaux par procédé")
 
-#     page_procede(df_meta, df_impacts, df_cat)
+#     page_procede(df_meta, df_impacts, df_cat, matrix)
 
 # if page == "Comparatif procédé":
 #     st.title("Comparatif des impacts environnementaux entre procédés")
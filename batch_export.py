@@ -0,0 +1,58 @@
+"""
+Export des tables du frontend en ligne de commande, sans session Streamlit :
+exécute le pipeline de chargement puis écrit les fichiers de export/ (et
+correlations.json) en parallèle, en sautant ceux dont le contenu est inchangé.
+
+Usage : python batch_export.py [--format json|ndjson|parquet] [--gzip]
+                               [--version BI_2.02] [--data data] [--workers 4]
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from exports import FORMATS
+from load import DATA_DIR, run_pipeline, version_params
+
+
+def run_export(
+    version=None, export_format="json", gzip=False, max_workers=None, directory=None
+):
+    """
+    Exécute le pipeline jusqu'à l'étape export.
+    :param version: Version de la Base Impacts (None = fichiers de DEFAULT_PARAMS)
+    :param export_format: Format des tables ("json", "ndjson" ou "parquet")
+    :param gzip: Compression gzip des fichiers
+    :param max_workers: Nombre de processus pour le parsing des fichiers sources
+    :param directory: Dossier des fichiers sources (par défaut DATA_DIR)
+    :return: Dictionnaire {fichier: "written" ou "unchanged"}
+    """
+    params = version_params(version, directory or DATA_DIR)
+    params.update({"export_format": export_format, "export_gzip": gzip})
+    return run_pipeline(params, targets=["export"], max_workers=max_workers)["export"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument("--gzip", action="store_true", help="Compression gzip")
+    parser.add_argument("--version", help="Version de la Base Impacts (ex: BI_2.02)")
+    parser.add_argument("--data", help="Dossier des fichiers sources")
+    parser.add_argument(
+        "--workers", type=int, help="Processus pour le parsing des fichiers sources"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    status = run_export(args.version, args.format, args.gzip, args.workers, args.data)
+    for path, state in status.items():
+        print(f"{state:<10} {path}")
+    counts = Counter(status.values())
+    print(
+        f"{counts['written']} fichier(s) écrit(s), {counts['unchanged']} inchangé(s)"
+        f" en {time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Benchmarks du chargement et des traitements de la Base Impacts sur des jeux
+synthétiques à plusieurs échelles (nombre de procédés et de catégories
+d'impacts multiplié par 1, 10, 100...).
+
+Pour chaque échelle et chaque étape : temps réel, temps CPU, pic mémoire
+(tracemalloc, lors d'une seconde exécution) et nombre de lignes produites.
+Les résultats sont écrits en JSON.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.run_benchmarks --scales 1 10 100 --output bench.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import load
+import parse_cache
+from benchmarks.synthetic import SOURCE_META, generate, tile_meta
+from excel_reader import PROCESS_FIELDS, read_transposed_fields
+from hierarchy import build_category_index
+from query_engine import build_query_engine
+
+DEFAULT_SCALES = [1, 10, 100]
+N_QUERIES = 50
+
+
+def _rows(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    return None
+
+
+def measure(stage, func, *args, memory=True):
+    """
+    Mesure une étape.
+    :return: Tuple (résultat, mesures)
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func(*args)
+    record = {
+        "stage": stage,
+        "wall_s": time.perf_counter() - wall,
+        "cpu_s": time.process_time() - cpu,
+        "rows": _rows(result),
+        "peak_mb": None,
+    }
+    if memory:
+        tracemalloc.start()
+        func(*args)
+        record["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, record
+
+
+def run_scale(scale, work_dir, memory=True):
+    """
+    Génère le jeu synthétique d'une échelle et mesure chaque étape.
+    :return: Liste de mesures
+    """
+    files = generate(os.path.join(work_dir, f"x{scale}"), scale, scale)
+    records = []
+
+    def add(record):
+        record.update(
+            scale=scale,
+            n_processes=files["n_processes"],
+            n_indicators=files["n_indicators"],
+        )
+        records.append(record)
+        if record.get("skipped"):
+            print(f"x{scale:<4} {record['stage']:<40} ignoré")
+        else:
+            peak = record["peak_mb"]
+            print(
+                f"x{scale:<4} {record['stage']:<40} {record['wall_s']:8.3f} s"
+                + (f" {peak:9.1f} Mo" if peak is not None else "")
+            )
+        return record
+
+    # Parsing brut des fichiers
+    impacts, r = measure(
+        "load_impacts", load.load_impacts, files["impacts_path"], memory=memory
+    )
+    add(r)
+    _, r = measure(
+        "read_excel_with_dual_headers[cat]",
+        load.read_excel_with_dual_headers,
+        files["cat_path"],
+        memory=memory,
+    )
+    add(r)
+    if files["xlsx_skipped"]:
+        # Au-delà de 16384 colonnes, le format xlsx transposé n'existe pas :
+        # seules les lectures de la feuille sont ignorées, les métadonnées
+        # sont construites en mémoire pour mesurer les étapes suivantes
+        for stage in [
+            "read_excel_with_dual_headers[meta]",
+            "read_transposed_fields[meta, projection]",
+            "parse_meta[cold]",
+            "parse_meta[cached]",
+        ]:
+            add(
+                {
+                    "stage": stage,
+                    "wall_s": None,
+                    "cpu_s": None,
+                    "rows": None,
+                    "peak_mb": None,
+                    "skipped": True,
+                }
+            )
+        df_meta = tile_meta(load.parse_meta(SOURCE_META), scale)
+    else:
+        _, r = measure(
+            "read_excel_with_dual_headers[meta]",
+            load.read_excel_with_dual_headers,
+            files["meta_path"],
+            memory=memory,
+        )
+        add(r)
+        _, r = measure(
+            "read_transposed_fields[meta, projection]",
+            read_transposed_fields,
+            files["meta_path"],
+            PROCESS_FIELDS,
+            memory=memory,
+        )
+        add(r)
+
+        # Étapes du pipeline (cache Parquet froid puis chaud)
+        df_meta, r = measure(
+            "parse_meta[cold]", load.parse_meta, files["meta_path"], memory=False
+        )
+        add(r)
+        _, r = measure(
+            "parse_meta[cached]", load.parse_meta, files["meta_path"], memory=memory
+        )
+        add(r)
+    df_cat = load.parse_categories(files["cat_path"])
+
+    merged, r = measure(
+        "merge", load.merge_impacts, df_meta, impacts, df_cat, memory=memory
+    )
+    add(r)
+    normalized, r = measure(
+        "normalize", load.normalize_impacts, merged, memory=memory
+    )
+    add(r)
+    _, r = measure("aggregate", load.aggregate_impacts, normalized, memory=memory)
+    add(r)
+
+    # Hiérarchie et filtrage de page_comparatif
+    hierarchy, r = measure(
+        "build_category_index", build_category_index, df_meta, memory=memory
+    )
+    add(r)
+    matrix, r = measure("matrix", load.build_matrix, impacts, df_cat, memory=memory)
+    add(r)
+    engine, r = measure(
+        "build_query_engine",
+        build_query_engine,
+        df_meta,
+        df_cat,
+        matrix,
+        hierarchy,
+        memory=memory,
+    )
+    add(r)
+
+    paths = [p for p in hierarchy.rows if len(p) == 4][:N_QUERIES]
+    categories = list(df_cat["Nom français"].dropna()[:3])
+
+    def comparatif_queries():
+        engine._cache.clear()
+        engine._cache_bytes = 0
+        return [engine.query(p, categories) for p in paths]
+
+    _, r = measure(
+        f"page_comparatif_query[x{len(paths)}]", comparatif_queries, memory=memory
+    )
+    add(r)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--output", default="benchmarks/results/benchmarks.json")
+    parser.add_argument(
+        "--work-dir", default=None, help="Dossier des jeux synthétiques"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Sans mesure mémoire"
+    )
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bi_bench_")
+    # Cache Parquet isolé : ne pas polluer (ni réutiliser) celui de l'application
+    parse_cache.CACHE_DIR = os.path.join(work_dir, "parse_cache")
+
+    records = []
+    for scale in args.scales:
+        records.extend(run_scale(scale, work_dir, memory=not args.no_memory))
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "platform": platform.platform(),
+                "results": records,
+            },
+            f,
+            indent=2,
+        )
+    print("Résultats :", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Génération de jeux de données synthétiques au format exact de la Base Impacts,
+à partir des fichiers réels de data/ :
+- détails des procédés et des catégories d'impacts : xlsx transposé, une ligne
+  par champ (libellé français, libellé anglais, puis une colonne par élément) ;
+- impacts : CSV latin1 séparé par des ";", une ligne par catégorie d'impact
+  (4 cellules de métadonnées puis une valeur par procédé), précédée des lignes
+  UUID et nom des procédés.
+
+Les procédés et les catégories sont dupliqués avec de nouveaux UUID
+déterministes et des valeurs d'impacts perturbées.
+
+Usage : python -m benchmarks.synthetic --processes 10 --indicators 10 --out /tmp/bi_x10
+"""
+
+import argparse
+import csv
+import os
+import uuid
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+SOURCE_META = "data/BI_2.02__02_Procedes_Details.xlsx"
+SOURCE_IMPACTS = "data/BI_2.02__03_Procedes_Impacts.csv"
+SOURCE_CATEGORIES = "data/BI_2.02__06_CatImpacts_Details.xlsx"
+
+# Nombre maximal de colonnes d'une feuille Excel (XFD)
+XLSX_MAX_COLUMNS = 16384
+
+_NAMESPACE = uuid.UUID("5f1d7c1e-3b51-4c55-9a0e-2a2c4f0b9e61")
+
+
+def _new_uuid(old, copy):
+    if copy == 0:
+        return old
+    return str(uuid.uuid5(_NAMESPACE, f"{old.strip()}/{copy}"))
+
+
+def _suffix(name, copy):
+    if copy == 0 or not name.strip():
+        return name
+    return f"{name.rstrip()} #{copy} "
+
+
+def _read_sheet(path):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    ws = wb[wb.sheetnames[0]]
+    title = ws.title
+    rows = [list(row) for row in ws.iter_rows(values_only=True)]
+    wb.close()
+    return title, rows
+
+
+def _write_sheet(path, title, rows):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def _field_index(rows, *labels):
+    # Ligne d'un champ, par son libellé français ou anglais
+    for i, row in enumerate(rows):
+        if str(row[0] or "").strip() in labels or str(row[1] or "").strip() in labels:
+            return i
+    raise KeyError(labels)
+
+
+def _tile_sheet(rows, copies, uuid_label, name_labels):
+    """
+    Duplique les colonnes de données d'une feuille transposée (colonnes 2+).
+    :return: Lignes de la nouvelle feuille et liste (copie, ancien UUID, nouvel UUID)
+    """
+    uuid_row = _field_index(rows, uuid_label)
+    name_rows = [_field_index(rows, label) for label in name_labels]
+    n_items = len(rows[uuid_row]) - 2
+
+    out = [row[:2] + [None] * (n_items * copies) for row in rows]
+    mapping = []
+    for copy in range(copies):
+        for j in range(n_items):
+            col = 2 + copy * n_items + j
+            for i, row in enumerate(rows):
+                out[i][col] = row[2 + j]
+            old = str(rows[uuid_row][2 + j])
+            new = _new_uuid(old, copy)
+            out[uuid_row][col] = f" {new.strip()} " if copy else old
+            for i in name_rows:
+                out[i][col] = _suffix(str(rows[i][2 + j] or ""), copy)
+            mapping.append((copy, old.strip(), new.strip()))
+    return out, mapping
+
+
+def tile_meta(df_meta, process_factor):
+    """
+    Métadonnées des procédés d'un jeu synthétique construites en mémoire, à
+    partir de celles du fichier source déjà chargées (parse_meta) : mêmes
+    UUID et noms que les colonnes de la feuille écrite par generate. Sert
+    aux échelles dont la feuille xlsx n'existe pas (xlsx_skipped).
+    :param df_meta: Métadonnées nettoyées des procédés de SOURCE_META
+    :param process_factor: Facteur multiplicatif sur le nombre de procédés
+    :return: DataFrame (process_factor copies des lignes de df_meta)
+    """
+    copies = []
+    for copy in range(process_factor):
+        df = df_meta.copy()
+        df["UUID"] = [_new_uuid(str(u), copy) for u in df["UUID"]]
+        df["Nom du flux"] = [
+            _suffix(name, copy).strip() if isinstance(name, str) else name
+            for name in df["Nom du flux"]
+        ]
+        copies.append(df)
+    return pd.concat(copies, ignore_index=True)
+
+
+def generate(out_dir, process_factor=1, indicator_factor=1, seed=0):
+    """
+    Écrit un jeu synthétique (3 fichiers) dans out_dir.
+    :param process_factor: Facteur multiplicatif sur le nombre de procédés
+    :param indicator_factor: Facteur multiplicatif sur le nombre de catégories d'impacts
+    :return: Dictionnaire {meta_path, impacts_path, cat_path, n_processes,
+        n_indicators, xlsx_skipped}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = {
+        "meta_path": os.path.join(out_dir, os.path.basename(SOURCE_META)),
+        "impacts_path": os.path.join(out_dir, os.path.basename(SOURCE_IMPACTS)),
+        "cat_path": os.path.join(out_dir, os.path.basename(SOURCE_CATEGORIES)),
+    }
+
+    # Procédés
+    title, rows = _read_sheet(SOURCE_META)
+    n_processes = (len(rows[0]) - 2) * process_factor
+    xlsx_skipped = n_processes + 2 > XLSX_MAX_COLUMNS
+    meta, process_map = _tile_sheet(
+        rows, process_factor, "UUID", ["Nom du flux", "English Name"]
+    )
+    if not xlsx_skipped:
+        _write_sheet(paths["meta_path"], title, meta)
+    del meta
+
+    # Catégories d'impacts
+    title, rows = _read_sheet(SOURCE_CATEGORIES)
+    categories, category_map = _tile_sheet(
+        rows, indicator_factor, "UUID", ["Nom français", "English Name"]
+    )
+    _write_sheet(paths["cat_path"], title, categories)
+    new_category = {(copy, old): new for copy, old, new in category_map}
+
+    # Impacts : une ligne par catégorie, écrite au fil de l'eau
+    with open(SOURCE_IMPACTS, encoding="latin1", newline="") as f:
+        source = list(csv.reader(f, delimiter=";"))
+    header_uuid, header_name, indicators = source[0], source[1], source[2:]
+    n_source = len(header_uuid) - 4
+
+    with open(paths["impacts_path"], "w", encoding="latin1", newline="") as f:
+        writer = csv.writer(f, delimiter=";", lineterminator="\n")
+        writer.writerow(header_uuid[:4] + [new for _, _, new in process_map])
+        writer.writerow(
+            header_name[:4]
+            + [
+                _suffix(header_name[4 + j], copy).strip()
+                for copy in range(process_factor)
+                for j in range(n_source)
+            ]
+        )
+        for copy in range(indicator_factor):
+            for line in indicators:
+                values = np.array(
+                    [float(v) if v else np.nan for v in line[4:]], dtype=np.float64
+                )
+                values = np.tile(values, process_factor) * rng.lognormal(
+                    0.0, 0.1, n_source * process_factor
+                )
+                meta_cells = [
+                    new_category[(copy, line[0].strip())],
+                    _suffix(line[1], copy).strip(),
+                    _suffix(line[2], copy).strip(),
+                    line[3],
+                ]
+                writer.writerow(meta_cells + [f"{v:.6g}" for v in values])
+
+    return {
+        **paths,
+        "n_processes": n_processes,
+        "n_indicators": len(indicators) * indicator_factor,
+        "xlsx_skipped": xlsx_skipped,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--indicators", type=int, default=1)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.out, args.processes, args.indicators, args.seed))
@@ -0,0 +1,459 @@
+"""
+Bundle versionné des tables et index dérivés de la Base Impacts, construit
+hors ligne et ouvert en mémoire mappée par l'application : les réplicas
+Streamlit d'une même machine partagent les pages des fichiers (tableaux
+numériques sans copie) et démarrent sans rejouer le pipeline pandas.
+
+Organisation sur disque :
+    bundles/CURRENT            identifiant de la version servie
+    bundles/<version>/         manifest.json, tables Arrow (*.arrow), tableaux NumPy (*.npy)
+
+Usage : python bundle.py build [--root bundles] [--keep 2]
+        python bundle.py info [--root bundles]
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from correlations import CorrelationService
+from distributions import build_distribution_index
+from hierarchy import CategoryIndex
+from impact_matrix import ImpactMatrix
+from parse_cache import LOADER_VERSION, file_fingerprint, frame_to_table, table_to_frame
+from query_engine import ImpactQueryEngine
+from rollup import RollupCube
+from scoring import build_scoring_engine
+from search import build_search_index
+from similarity import SimilarityIndex
+from star_schema import ImpactStarSchema
+
+
+BUNDLE_ROOT = "bundles"
+
+# A incrémenter à chaque changement du contenu ou du format du bundle
+BUNDLE_FORMAT = "4"
+
+# Étapes du pipeline servies par le bundle
+BUNDLED_STAGES = [
+    "parse_meta",
+    "meta_columns",
+    "meta_details",
+    "parse_impacts",
+    "parse_categories",
+    "matrix",
+    "hierarchy",
+    "star_schema",
+    "correlation_service",
+    "similarity",
+    "distributions",
+    "scoring",
+    "rollup",
+    "search_fields",
+    "search_index",
+    "query_engine",
+]
+
+# Paramètres du pipeline contenant un chemin de fichier source
+SOURCE_PARAMS = ["meta_path", "impacts_path", "cat_path"]
+
+
+def bundle_version(params):
+    """
+    Identifiant d'un bundle : empreinte des fichiers sources, de
+    LOADER_VERSION et de BUNDLE_FORMAT.
+    :param params: Paramètres du pipeline (chemins des fichiers sources)
+    """
+    h = hashlib.sha256(f"{LOADER_VERSION}:{BUNDLE_FORMAT}".encode())
+    for name in SOURCE_PARAMS:
+        h.update(file_fingerprint(params[name]).encode())
+    return h.hexdigest()[:16]
+
+
+def current_version(root=BUNDLE_ROOT):
+    """
+    :return: Version servie (contenu de CURRENT), None s'il n'y a pas de bundle
+    """
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+# Écriture ---------------------------------------------------------------
+
+
+def _write_table(directory, name, table):
+    # Format IPC "fichier" non compressé : relu en mémoire mappée sans copie
+    with pa.OSFile(os.path.join(directory, f"{name}.arrow"), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _write_frame(directory, name, df):
+    _write_table(directory, name, frame_to_table(df))
+
+
+def _write_array(directory, name, array):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+
+def _write_hierarchy(directory, hierarchy):
+    # Noeuds (chemin, enfants, plage dans hierarchy_rows) et chemin de chaque procédé
+    paths, children, starts, stops, rows = [], [], [], [], []
+    offset = 0
+    for path, node_rows in hierarchy.rows.items():
+        paths.append(list(path))
+        children.append(list(hierarchy.children.get(path, [])))
+        starts.append(offset)
+        offset += len(node_rows)
+        stops.append(offset)
+        rows.append(node_rows)
+    _write_table(
+        directory,
+        "hierarchy_nodes",
+        pa.table(
+            {
+                "path": pa.array(paths, pa.list_(pa.string())),
+                "children": pa.array(children, pa.list_(pa.string())),
+                "start": pa.array(starts, pa.int64()),
+                "stop": pa.array(stops, pa.int64()),
+            }
+        ),
+    )
+    _write_array(directory, "hierarchy_rows", np.concatenate(rows).astype(np.int64))
+    _write_table(
+        directory,
+        "hierarchy_paths",
+        pa.table(
+            {"path": pa.array([list(p) for p in hierarchy.paths], pa.list_(pa.string()))}
+        ),
+    )
+
+
+def _write_rollup(directory, cube):
+    # Noeuds (chemin, zone) du cube ; statistiques dans rollup_values
+    _write_table(
+        directory,
+        "rollup_nodes",
+        pa.table(
+            {
+                "path": pa.array([list(p) for p in cube.paths], pa.list_(pa.string())),
+                "zone": pa.array(cube.zones, pa.string()),
+            }
+        ),
+    )
+    _write_array(directory, "rollup_values", cube.values)
+
+
+def write_bundle(results, params, root=BUNDLE_ROOT, keep=2):
+    """
+    Écrit un bundle à partir des résultats du pipeline puis le rend courant.
+    Le bundle est écrit dans un dossier temporaire renommé une fois complet,
+    puis CURRENT est remplacé atomiquement : un réplica lit toujours soit
+    l'ancienne version, soit la nouvelle, jamais un bundle partiel.
+    :param results: Résultats de run_pipeline (étapes de BUNDLED_STAGES)
+    :param params: Paramètres du pipeline (chemins des fichiers sources)
+    :param keep: Nombre de versions conservées sur disque (courante comprise)
+    :return: Version écrite
+    """
+    version = bundle_version(params)
+    final = os.path.join(root, version)
+    os.makedirs(root, exist_ok=True)
+
+    if not os.path.exists(final):
+        tmp = os.path.join(root, f".tmp-{version}-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        df_impacts, df_impacts_large = results["parse_impacts"]
+        for name, df in [
+            ("meta", results["parse_meta"]),
+            ("meta_details", results["meta_details"]),
+            ("impacts", df_impacts),
+            ("impacts_large", df_impacts_large),
+            ("categories", results["parse_categories"]),
+            ("search_fields", results["search_fields"]),
+            ("query_table", results["query_engine"].table),
+        ]:
+            _write_frame(tmp, name, df)
+
+        matrix = results["matrix"]
+        _write_array(tmp, "matrix_values", matrix.values)
+        _write_frame(
+            tmp,
+            "matrix_processes",
+            pd.DataFrame(
+                {"uuid": matrix.process_uuids, "name": matrix.process_names}
+            ),
+        )
+        _write_frame(
+            tmp,
+            "matrix_categories",
+            pd.DataFrame(
+                {"uuid": matrix.category_uuids, "name": matrix.category_names}
+            ),
+        )
+        _write_array(tmp, "meta_to_matrix", results["query_engine"].meta_to_matrix)
+        _write_array(tmp, "similarity_profiles", results["similarity"].profiles)
+        _write_array(tmp, "similarity_unit", results["similarity"].unit)
+        _write_hierarchy(tmp, results["hierarchy"])
+        _write_rollup(tmp, results["rollup"])
+
+        star = results["star_schema"]
+        _write_frame(tmp, "star_facts", star.facts)
+        _write_frame(tmp, "star_processes", star.processes)
+        _write_frame(tmp, "star_categories", star.categories)
+
+        manifest = {
+            "version": version,
+            "format": BUNDLE_FORMAT,
+            "loader_version": LOADER_VERSION,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "sources": {
+                name: {"path": params[name], "sha256": file_fingerprint(params[name])}
+                for name in SOURCE_PARAMS
+            },
+            "meta_columns": results["meta_columns"],
+            "star_columns": star.columns,
+            "rollup_categories": list(results["rollup"].category_names),
+        }
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, final)
+
+    # Bascule atomique de la version servie
+    pointer = os.path.join(root, f".CURRENT-{os.getpid()}")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(pointer, os.path.join(root, "CURRENT"))
+
+    _remove_old_versions(root, version, keep)
+    return version
+
+
+def _remove_old_versions(root, current, keep):
+    # Les réplicas qui ont encore une ancienne version ouverte gardent leurs
+    # pages mappées : sous Linux, un fichier supprimé reste lisible
+    versions = [
+        entry
+        for entry in os.listdir(root)
+        if not entry.startswith(".")
+        and entry != current
+        and os.path.exists(os.path.join(root, entry, "manifest.json"))
+    ]
+    versions.sort(key=lambda v: os.path.getmtime(os.path.join(root, v)), reverse=True)
+    for entry in versions[max(0, keep - 1) :]:
+        shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+# Lecture ----------------------------------------------------------------
+
+
+class DatasetBundle:
+    """
+    Bundle ouvert en lecture. Les tables Arrow et les tableaux NumPy sont
+    mappés en mémoire à la première demande ; les objets (matrice, index,
+    moteur de requêtes) sont reconstruits sans calcul pandas et partagés
+    (lecture seule).
+    :param directory: Dossier de la version
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self._stages = {}
+        self._lock = threading.RLock()
+
+    def table(self, name):
+        """
+        :return: Table Arrow dont les buffers référencent le fichier mappé
+        """
+        source = pa.memory_map(os.path.join(self.directory, f"{name}.arrow"))
+        return pa.ipc.open_file(source).read_all()
+
+    def frame(self, name):
+        """
+        :return: DataFrame (colonnes numériques sans copie, colonnes texte
+            converties en objets Python)
+        """
+        return table_to_frame(self.table(name), split_blocks=True)
+
+    def array(self, name):
+        """
+        :return: Tableau NumPy mappé en lecture seule
+        """
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def stage(self, name):
+        """
+        Résultat d'une étape du pipeline, reconstruit depuis le bundle.
+        :param name: Étape de BUNDLED_STAGES
+        """
+        with self._lock:
+            if name not in self._stages:
+                if name not in BUNDLED_STAGES:
+                    raise KeyError(f"Étape absente du bundle : {name!r}")
+                self._stages[name] = getattr(self, f"_build_{name}")()
+            return self._stages[name]
+
+    def _build_parse_meta(self):
+        return self.frame("meta")
+
+    def _build_meta_columns(self):
+        return list(self.manifest["meta_columns"])
+
+    def _build_meta_details(self):
+        return self.frame("meta_details")
+
+    def _build_parse_impacts(self):
+        return self.frame("impacts"), self.frame("impacts_large")
+
+    def _build_parse_categories(self):
+        return self.frame("categories")
+
+    def _build_matrix(self):
+        processes = self.frame("matrix_processes")
+        categories = self.frame("matrix_categories")
+        return ImpactMatrix(
+            self.array("matrix_values"),
+            processes["uuid"].to_numpy(dtype=object),
+            processes["name"].to_numpy(dtype=object),
+            categories["uuid"].to_numpy(dtype=object),
+            categories["name"].to_numpy(dtype=object),
+        )
+
+    def _build_hierarchy(self):
+        nodes = self.table("hierarchy_nodes").to_pydict()
+        all_rows = self.array("hierarchy_rows")
+        children, rows = {}, {}
+        for path, kids, start, stop in zip(
+            nodes["path"], nodes["children"], nodes["start"], nodes["stop"]
+        ):
+            children[tuple(path)] = list(kids)
+            rows[tuple(path)] = all_rows[start:stop]
+        paths = [tuple(p) for p in self.table("hierarchy_paths")["path"].to_pylist()]
+        names = self.stage("parse_meta")["Nom du flux"].to_numpy(dtype=object)
+        return CategoryIndex(children, rows, paths, names)
+
+    def _build_star_schema(self):
+        return ImpactStarSchema(
+            self.frame("star_facts"),
+            self.frame("star_processes"),
+            self.frame("star_categories"),
+            list(self.manifest["star_columns"]),
+        )
+
+    def _build_correlation_service(self):
+        return CorrelationService(
+            self.stage("matrix"), self.stage("hierarchy"), self.array("meta_to_matrix")
+        )
+
+    def _build_similarity(self):
+        return SimilarityIndex(
+            self.array("similarity_profiles"),
+            self.array("similarity_unit"),
+            self.stage("matrix"),
+            self.stage("hierarchy"),
+            self.array("meta_to_matrix"),
+        )
+
+    def _build_distributions(self):
+        # Tri et histogrammes recalculés (numpy seul) depuis la matrice mappée
+        return build_distribution_index(
+            self.stage("matrix"), self.stage("hierarchy"), self.array("meta_to_matrix")
+        )
+
+    def _build_scoring(self):
+        # Un produit matriciel sur la matrice mappée
+        return build_scoring_engine(
+            self.stage("matrix"), self.stage("hierarchy"), self.array("meta_to_matrix")
+        )
+
+    def _build_rollup(self):
+        nodes = self.table("rollup_nodes").to_pydict()
+        return RollupCube(
+            nodes["path"],
+            nodes["zone"],
+            self.manifest["rollup_categories"],
+            self.array("rollup_values"),
+        )
+
+    def _build_search_fields(self):
+        return self.frame("search_fields")
+
+    def _build_search_index(self):
+        # Trigrammes recalculés (quelques dixièmes de seconde)
+        return build_search_index(self.stage("search_fields"))
+
+    def _build_query_engine(self):
+        return ImpactQueryEngine(
+            self.frame("query_table"),
+            self.stage("matrix"),
+            self.stage("hierarchy"),
+            self.array("meta_to_matrix"),
+        )
+
+
+def open_bundle(root=BUNDLE_ROOT, version=None):
+    """
+    Ouvre un bundle.
+    :param version: Version à ouvrir (par défaut celle de CURRENT)
+    :return: DatasetBundle, None s'il n'y a pas de bundle
+    """
+    version = version or current_version(root)
+    if version is None:
+        return None
+    return DatasetBundle(os.path.join(root, version))
+
+
+def build(root=BUNDLE_ROOT, keep=2, params=None):
+    """
+    Exécute le pipeline sur les fichiers sources (exports compris) et écrit
+    le bundle.
+    :return: Version écrite
+    """
+    # Import local : load importe ce module pour servir le bundle
+    from load import DEFAULT_PARAMS, run_pipeline
+
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    # Les exports JSON sont régénérés au même moment
+    results = run_pipeline(params, targets=BUNDLED_STAGES + ["export"])
+    return write_bundle(results, params, root, keep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--root", default=BUNDLE_ROOT)
+    parser.add_argument("--keep", type=int, default=2, help="Versions conservées")
+    for name in SOURCE_PARAMS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        params = {n: getattr(args, n) for n in SOURCE_PARAMS if getattr(args, n)}
+        version = build(args.root, args.keep, params)
+        print("Bundle courant :", os.path.join(args.root, version))
+    else:
+        bundle = open_bundle(args.root)
+        if bundle is None:
+            print("Aucun bundle dans", args.root)
+        else:
+            print(json.dumps(bundle.manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
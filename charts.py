@@ -0,0 +1,186 @@
+"""
+Graphiques des pages : données prêtes à tracer lues dans les index
+(matrice des impacts, histogrammes précalculés), grandes sélections réduites
+avant le tracé, et cache borné des images rendues (PNG), partagé entre les
+sessions.
+"""
+
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+from matplotlib.figure import Figure
+
+
+# Nombre maximal de barres d'un graphique (au-delà, les plus faibles sont regroupées)
+MAX_BARS = 30
+
+# Hauteur d'une barre (pouces) et résolution des images rendues
+BAR_HEIGHT = 0.25
+DPI = 100
+
+# Longueur maximale des libellés des barres (les noms de procédés dépassent
+# 190 caractères : l'image et son temps de rendu croissent avec leur largeur)
+MAX_LABEL = 45
+
+
+def short_label(label, max_length=MAX_LABEL):
+    """
+    Libellé tronqué à max_length caractères (points de suspension finaux).
+    """
+    label = str(label)
+    return label if len(label) <= max_length else label[: max_length - 1] + "…"
+
+
+def bar_data(matrix, rows, category, max_bars=MAX_BARS):
+    """
+    Valeurs d'une catégorie d'impact pour des lignes de la matrice, triées par
+    valeur croissante. Au-delà de max_bars procédés, seuls les max_bars - 1
+    plus grands sont gardés (sélection partielle, sans tri complet) ; les
+    autres sont regroupés en une barre égale à leur moyenne.
+    :param matrix: ImpactMatrix
+    :param rows: Lignes de la matrice des procédés sélectionnés
+    :param category: Nom français de la catégorie d'impact
+    :param max_bars: Nombre maximal de barres
+    :return: Tuple (libellés, valeurs)
+    """
+    j = matrix.category_name_index[category]
+    values = matrix.values[rows, j]
+    keep = ~np.isnan(values)
+    rows, values = np.asarray(rows)[keep], values[keep]
+
+    rest = None
+    if len(values) > max_bars:
+        top = np.argpartition(values, len(values) - max_bars + 1)
+        rest, top = top[: -max_bars + 1], top[-max_bars + 1 :]
+        rest_mean = values[rest].mean()
+        rows, values = rows[top], values[top]
+
+    order = np.argsort(values, kind="stable")
+    labels = list(matrix.process_names[rows[order]])
+    values = values[order]
+    if rest is not None:
+        labels.insert(0, f"Autres procédés ({len(rest)}, moyenne)")
+        values = np.concatenate(([rest_mean], values))
+    return labels, values
+
+
+def bar_chart(labels, values, xlabel, title):
+    """
+    Diagramme en barres horizontales, hauteur proportionnelle au nombre de
+    barres (bornée par MAX_BARS en amont), libellés tronqués.
+    :return: Figure
+    """
+    fig = Figure(figsize=(6, max(3, len(labels) * BAR_HEIGHT + 1)))
+    ax = fig.subplots()
+    ax.barh(np.arange(len(labels)), values)
+    ax.set_yticks(
+        np.arange(len(labels)), [short_label(label) for label in labels], fontsize=7
+    )
+    ax.set_xlabel(xlabel)
+    ax.set_title(title)
+    return fig
+
+
+def histogram_chart(counts, edges, title):
+    """
+    Histogramme à partir d'effectifs et de bornes précalculés.
+    :return: Figure
+    """
+    fig = Figure(figsize=(6, 4))
+    ax = fig.subplots()
+    ax.bar(
+        edges[:-1],
+        counts,
+        width=np.diff(edges),
+        align="edge",
+        color="blue",
+        alpha=0.7,
+        edgecolor="black",
+    )
+    ax.set_xlabel("Valeur")
+    ax.set_ylabel("Fréquence")
+    ax.set_title(title)
+    return fig
+
+
+def heatmap_chart(corr):
+    """
+    Carte de chaleur d'une matrice de corrélation (DataFrame carré).
+    :return: Figure
+    """
+    fig = Figure(figsize=(7, 6))
+    ax = fig.subplots()
+    im = ax.imshow(corr.to_numpy(), cmap="coolwarm", vmin=-1, vmax=1)
+    ax.set_xticks(range(len(corr)), corr.columns, rotation=90, fontsize=7)
+    ax.set_yticks(range(len(corr)), corr.index, fontsize=7)
+    fig.colorbar(im, ax=ax)
+    return fig
+
+
+def render_png(fig):
+    """
+    Rendu d'une figure en PNG.
+    :return: Octets de l'image
+    """
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=DPI, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """
+    Cache LRU borné des graphiques rendus (PNG), partagé entre les sessions :
+    un graphique déjà tracé pour une sélection est réaffiché sans matplotlib.
+    Les clés contiennent l'empreinte du jeu de données (dataset_digest) en
+    plus de la sélection : un rechargement des données change la clé, et le
+    cache ne garde aucune référence aux objets source.
+    :param max_bytes: Taille maximale des images gardées
+    """
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, draw):
+        """
+        Image d'un graphique, tracée par draw() si elle n'est pas en cache.
+        :param key: Clé hashable (type de graphique, empreinte des données,
+            sélection)
+        :param draw: Fonction renvoyant une Figure
+        :return: Octets PNG
+        """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+        png = render_png(draw())
+
+        with self._lock:
+            self.misses += 1
+            if len(png) <= self.max_bytes and key not in self._cache:
+                self._cache[key] = png
+                self._cache_bytes += len(png)
+                while self._cache_bytes > self.max_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_bytes -= len(evicted)
+        return png
+
+    def cache_info(self):
+        """
+        :return: Dictionnaire (entrées, octets, hits, misses) du cache
+        """
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
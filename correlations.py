@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.stats import rankdata
+
+
+def pearson(values):
+    """
+    Matrice de corrélation de Pearson entre les colonnes, sur les paires de
+    valeurs non manquantes (comme DataFrame.corr).
+    :param values: Tableau (n_observations, n_variables)
+    :return: Tableau (n_variables, n_variables)
+    """
+    x = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(x)
+
+    if present.all():
+        x = x - x.mean(axis=0)
+        cov = x.T @ x
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+    else:
+        # Centrage préalable pour limiter les erreurs d'arrondi, puis sommes
+        # restreintes aux lignes où les deux variables sont présentes
+        x = x - np.nanmean(x, axis=0)
+        m = present.astype(np.float64)
+        x0 = np.where(present, x, 0.0)
+        n = m.T @ m
+        sx = x0.T @ m  # sx[i, j] = somme de x_i sur les lignes où x_j est présent
+        sxx = (x0 * x0).T @ m
+        sxy = x0.T @ x0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = sxy - sx * sx.T / n
+            var = sxx - sx * sx / n
+            corr = cov / np.sqrt(var * var.T)
+        corr[n < 2] = np.nan
+
+    np.clip(corr, -1, 1, out=corr)
+    return corr
+
+
+def spearman(values):
+    """
+    Matrice de corrélation de Spearman sur les paires de valeurs non
+    manquantes (comme DataFrame.corr("spearman")) : pour chaque paire de
+    colonnes, Pearson des rangs (moyens en cas d'égalité) calculés sur les
+    seules lignes où les deux valeurs sont présentes.
+    Les rangs de chaque colonne sont calculés une fois ; seules les paires
+    dont les valeurs manquantes diffèrent sont reclassées.
+    :param values: Tableau (n_observations, n_variables)
+    :return: Tableau (n_variables, n_variables)
+    """
+    x = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(x)
+    corr = pearson(rankdata(x, axis=0, nan_policy="omit"))
+    if present.all():
+        return corr
+
+    n_var = x.shape[1]
+    for i in range(n_var):
+        for j in range(i + 1, n_var):
+            both = present[:, i] & present[:, j]
+            if (both == present[:, i]).all() and (both == present[:, j]).all():
+                continue
+            if both.sum() < 2:
+                corr[i, j] = corr[j, i] = np.nan
+                continue
+            pair = rankdata(x[both][:, [i, j]], axis=0)
+            corr[i, j] = corr[j, i] = pearson(pair)[0, 1]
+    return corr
+
+
+METHODS = {"pearson": pearson, "spearman": spearman}
+
+
+def cluster_order(corr, method="average"):
+    """
+    Ordre des variables par clustering hiérarchique des lignes de la matrice
+    de corrélation (les corrélations indéfinies comptent pour 0).
+    :return: Indices ordonnés
+    """
+    if len(corr) < 2 or not np.isfinite(corr).any():
+        return np.arange(len(corr))
+    return leaves_list(linkage(np.nan_to_num(corr), method=method))
+
+
+class CorrelationService:
+    """
+    Corrélations entre catégories d'impacts calculées à la demande sur la
+    matrice dense, pour tout ou partie des procédés et des indicateurs.
+    Les matrices et leur ordre de clustering sont mémorisés par sous-ensemble.
+    :param matrix: ImpactMatrix
+    :param hierarchy: CategoryIndex
+    :param meta_to_matrix: Ligne de la matrice de chaque ligne de df_meta (-1 si absente)
+    :param max_entries: Nombre de sous-ensembles gardés en cache
+    """
+
+    def __init__(self, matrix, hierarchy, meta_to_matrix, max_entries=128):
+        self.matrix = matrix
+        self.hierarchy = hierarchy
+        self.meta_to_matrix = meta_to_matrix
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clustered(
+        self, path=None, categories=None, method="pearson", linkage_method="average"
+    ):
+        """
+        Matrice de corrélation réordonnée par clustering.
+        :param path: Noeud de la hiérarchie (tous ses procédés), None = tous les procédés
+        :param categories: Noms français des indicateurs, None = tous
+        :param method: "pearson" ou "spearman"
+        :param linkage_method: Méthode de linkage (ex: "average", "ward")
+        :return: DataFrame carré indexé par nom de catégorie (lecture seule)
+        """
+        key = (
+            None if path is None else tuple(path),
+            None if categories is None else tuple(categories),
+            method,
+            linkage_method,
+        )
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        corr = self.correlation(path, categories, method)
+        idx = cluster_order(corr.to_numpy(), linkage_method)
+        result = corr.iloc[idx, idx]
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def correlation(self, path=None, categories=None, method="pearson"):
+        """
+        Matrice de corrélation (non réordonnée) d'un sous-ensemble.
+        :return: DataFrame carré indexé par nom de catégorie
+        """
+        if path is None:
+            rows = np.arange(self.matrix.shape[0])
+        else:
+            rows = self.meta_to_matrix[self.hierarchy.subtree_rows(path)]
+            rows = pd.unique(rows[rows >= 0])
+        cols = self.matrix.columns(category_names=categories)
+
+        corr = METHODS[method](self.matrix.block(rows, cols))
+        names = self.matrix.category_names[cols]
+        return pd.DataFrame(corr, index=names, columns=names)
+
+
+def correlation_long(corr):
+    """
+    Version longue (x, y, value) d'une matrice de corrélation, pour l'export.
+    """
+    corr_long = corr.rename_axis("index").reset_index().melt(id_vars="index")
+    corr_long.columns = ["x", "y", "value"]
+    return corr_long
+
+
+def build_correlation_service(df_meta, matrix, hierarchy):
+    """
+    :return: CorrelationService sur la matrice dense des impacts
+    """
+    return CorrelationService(matrix, hierarchy, matrix.row_lookup(df_meta["UUID"]))
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class DistributionIndex:
+    """
+    Distributions des impacts précalculées pour chaque noeud de la hiérarchie
+    (sous-arbre complet, racine = tous les procédés) : valeurs triées de
+    chaque catégorie d'impact et histogramme à bins fixes.
+    Rang centile, quantiles et histogrammes se lisent sans reparcourir les
+    données (recherche dichotomique dans les valeurs triées).
+    :param nodes: Dictionnaire {chemin: (valeurs triées (n, n_cat) avec les NaN
+        en fin de colonne, nombre de valeurs par catégorie, effectifs
+        (n_cat, bins), bornes (n_cat, bins + 1))}
+    :param category_names: Noms français des catégories (colonnes)
+    """
+
+    def __init__(self, nodes, category_names):
+        self.nodes = nodes
+        self.category_names = np.asarray(category_names, dtype=object)
+        self.category_index = {name: j for j, name in enumerate(self.category_names)}
+
+    def _node(self, path, category):
+        key = () if path is None else tuple(path)
+        if key not in self.nodes:
+            raise KeyError(f"Noeud inconnu {key!r}")
+        return self.nodes[key], self.category_index[category]
+
+    def sorted_values(self, category, path=None):
+        """
+        :return: Valeurs triées (hors NaN) d'une catégorie pour un noeud (vue)
+        """
+        (values, counts, _, _), j = self._node(path, category)
+        return values[: counts[j], j]
+
+    def percentile_rank(self, values, category, path=None):
+        """
+        Rang centile de valeurs parmi les procédés d'un noeud : part des
+        valeurs inférieures ou égales (même définition que la colonne
+        percentile de normalize_impacts).
+        :param values: Valeur ou tableau de valeurs
+        :param category: Nom français de la catégorie d'impact
+        :param path: Chemin du noeud (None = tous les procédés)
+        :return: Tableau dans [0, 1] (NaN pour les valeurs manquantes)
+        """
+        ref = self.sorted_values(category, path)
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ranks = np.searchsorted(ref, values, side="right") / len(ref)
+        return np.where(np.isnan(values), np.nan, ranks)
+
+    def quantile(self, q, category, path=None):
+        """
+        Quantile d'une catégorie pour un noeud (interpolation linéaire).
+        """
+        ref = self.sorted_values(category, path)
+        if not len(ref):
+            return np.nan
+        return np.quantile(ref, q)
+
+    def histogram(self, category, path=None):
+        """
+        :return: Tuple (effectifs, bornes des bins) précalculés
+        """
+        (_, _, hist_counts, hist_edges), j = self._node(path, category)
+        return hist_counts[j], hist_edges[j]
+
+
+def _histograms(values, counts, bins):
+    # Bins de même largeur entre le minimum et le maximum de chaque colonne
+    # (comme np.histogram), effectifs lus par recherche dans les valeurs triées
+    n_cat = values.shape[1]
+    hist_counts = np.zeros((n_cat, bins), dtype=np.int64)
+    hist_edges = np.zeros((n_cat, bins + 1))
+    for j in range(n_cat):
+        col = values[: counts[j], j]
+        if not len(col):
+            hist_edges[j] = np.linspace(0, 1, bins + 1)
+            continue
+        lo, hi = col[0], col[-1]
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        edges = np.linspace(lo, hi, bins + 1)
+        # Dernier bin fermé à droite, comme np.histogram
+        cum = np.searchsorted(col, edges[1:-1], side="left")
+        hist_counts[j] = np.diff(np.concatenate(([0], cum, [len(col)])))
+        hist_edges[j] = edges
+    return hist_counts, hist_edges
+
+
+def build_distribution_index(matrix, hierarchy, meta_to_matrix, bins=20):
+    """
+    Trie les valeurs de la matrice des impacts pour chaque noeud de la
+    hiérarchie et calcule les histogrammes.
+    :param matrix: ImpactMatrix
+    :param hierarchy: CategoryIndex
+    :param meta_to_matrix: Ligne de la matrice de chaque ligne de df_meta (-1 si absente)
+    :param bins: Nombre de bins des histogrammes
+    :return: DistributionIndex
+    """
+    nodes = {}
+    for path, meta_rows in hierarchy.rows.items():
+        if path == ():
+            rows = np.arange(matrix.shape[0])
+        else:
+            rows = meta_to_matrix[meta_rows]
+            rows = np.unique(rows[rows >= 0])
+        values = np.sort(matrix.values[rows], axis=0)  # NaN en fin de colonne
+        counts = (~np.isnan(values)).sum(axis=0)
+        nodes[path] = (values, counts) + _histograms(values, counts, bins)
+    return DistributionIndex(nodes, matrix.category_names)
@@ -0,0 +1,146 @@
+import string
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from instrumentation import instrumented
+
+
+# Champs des procédés utilisés par le chargement (merge, hiérarchie, tables
+# de répartition) : seuls ceux-ci sont lus au démarrage
+PROCESS_FIELDS = [
+    "UUID",
+    "Nom du flux",
+    "Catégorisation (niveau 1)",
+    "Catégorisation (niveau 2)",
+    "Catégorisation (niveau 3)",
+    "Catégorisation (niveau 4)",
+    "Quantité de référence",
+    "Unité",
+    "Zone géographique",
+    "Type de dataset",
+]
+
+
+def header_name(fr, en):
+    """
+    Nom d'un champ d'une feuille transposée : libellé français s'il est non
+    vide, sinon libellé anglais (comme read_excel_with_dual_headers).
+    """
+    fr = str(np.nan if fr is None else fr).strip()
+    en = str(np.nan if en is None else en).strip()
+    return fr if fr else en
+
+
+class HeaderResolver:
+    """
+    Attribue un nom unique à chaque champ, dans l'ordre de la feuille : la
+    première occurrence d'un libellé garde son nom, les suivantes reçoivent
+    un suffixe _b, _c... (convention déjà utilisée par la Base Impacts,
+    ex: "Déviations_b"). Le nom d'un champ ne dépend que des champs qui le
+    précèdent : une lecture interrompue nomme les champs comme une lecture
+    complète.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.labels = []
+        self.duplicates = []
+        self._seen = set()
+
+    def add(self, fr, en):
+        base = header_name(fr, en)
+        name = base
+        if name in self._seen:
+            self.duplicates.append(base)
+            for suffix in string.ascii_lowercase[1:]:
+                name = f"{base}_{suffix}"
+                if name not in self._seen:
+                    break
+        self._seen.add(name)
+        self.names.append(name)
+        self.labels.append(base)
+        return name
+
+
+def _convert(value):
+    # Mêmes conversions que pd.read_excel (moteur openpyxl) : cellule vide ->
+    # NaN, nombre entier -> int
+    if value is None:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_fields(path, resolver=None):
+    """
+    Parcourt une feuille transposée (un champ par ligne : libellé français,
+    libellé anglais, puis une valeur par élément) en mode lecture seule.
+    :param path: Chemin du fichier Excel
+    :param resolver: HeaderResolver à utiliser (par défaut un nouveau)
+    :return: Générateur de tuples (nom unique du champ, valeurs brutes)
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        resolver = resolver or HeaderResolver()
+        for row in ws.iter_rows(values_only=True):
+            if all(v is None for v in row):
+                continue  # pd.read_excel ignore les lignes vides
+            row = row + (None,) * max(0, 2 - len(row))
+            yield resolver.add(row[0], row[1]), row[2:]
+    finally:
+        wb.close()
+
+
+@instrumented()
+def read_transposed_fields(path, fields=None):
+    """
+    Lit les champs demandés d'une feuille transposée, sans charger le reste
+    de la feuille : la lecture s'arrête dès que tous les champs sont trouvés.
+    :param path: Chemin du fichier Excel
+    :param fields: Noms des champs (noms uniques, cf. HeaderResolver),
+        None = tous les champs
+    :return: DataFrame (une ligne par élément, une colonne par champ, dans
+        l'ordre de la feuille)
+    """
+    wanted = None if fields is None else set(fields)
+    columns = {}
+    for name, values in iter_fields(path):
+        if wanted is None or name in wanted:
+            columns[name] = values
+            if wanted is not None and len(columns) == len(wanted):
+                break
+
+    if wanted is not None and len(columns) < len(wanted):
+        missing = [f for f in fields if f not in columns]
+        raise KeyError(f"{path} : champs absents {missing}")
+
+    # Cellules vides en fin de ligne ignorées, comme pd.read_excel
+    for name, values in columns.items():
+        end = len(values)
+        while end and values[end - 1] is None:
+            end -= 1
+        columns[name] = values[:end]
+
+    n = max((len(v) for v in columns.values()), default=0)
+    data = {}
+    for name, values in columns.items():
+        cells = [_convert(v) for v in values] + [np.nan] * (n - len(values))
+        data[name] = np.array(cells, dtype=object)
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def read_field_labels(path):
+    """
+    Noms uniques de tous les champs d'une feuille transposée, dans l'ordre,
+    et libellés d'origine (avant renommage des doublons).
+    :return: DataFrame (Champ, Libellé)
+    """
+    resolver = HeaderResolver()
+    names = [name for name, _ in iter_fields(path, resolver)]
+    if resolver.duplicates:
+        print("Colonnes dupliquées renommées :", resolver.duplicates)
+    return pd.DataFrame({"Champ": names, "Libellé": resolver.labels})
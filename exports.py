@@ -0,0 +1,130 @@
+"""
+Écriture des fichiers exportés pour le frontend : sérialisation des tables
+en JSON (format historique), NDJSON ou Parquet, compression gzip
+optionnelle, écritures en parallèle. Un fichier dont le contenu n'a pas
+changé (même empreinte SHA-256) n'est pas réécrit : sa date de
+modification reste celle de la dernière version réellement différente.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import measure
+
+
+FORMATS = ["json", "ndjson", "parquet"]
+
+
+def _arrow_table(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Colonnes texte contenant aussi des nombres : converties en texte
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def serialize(data, fmt="json", compress=False):
+    """
+    Sérialise un artefact.
+    :param data: DataFrame (au format fmt), dict ou liste (JSON indenté) ou
+        texte (écrit tel quel)
+    :param fmt: Format des DataFrames : "json" (liste d'objets), "ndjson"
+        (un objet par ligne) ou "parquet"
+    :param compress: Compression gzip (pour Parquet : codec gzip interne)
+    :return: Tuple (extension ou None si inchangée, contenu en octets)
+    """
+    if isinstance(data, pd.DataFrame):
+        if fmt == "parquet":
+            buffer = io.BytesIO()
+            pq.write_table(
+                _arrow_table(data),
+                buffer,
+                compression="gzip" if compress else "snappy",
+            )
+            return ".parquet", buffer.getvalue()
+        if fmt not in FORMATS:
+            raise ValueError(f"Format inconnu {fmt!r} (formats : {FORMATS})")
+        lines = fmt == "ndjson"
+        content = data.to_json(orient="records", force_ascii=False, lines=lines)
+        extension = f".{fmt}"
+    elif isinstance(data, str):
+        content, extension = data, None
+    else:
+        content = json.dumps(data, ensure_ascii=False, indent=2)
+        extension = ".json"
+
+    content = content.encode("utf-8")
+    if compress:
+        # mtime fixé : même contenu -> mêmes octets, donc même empreinte
+        content = gzip.compress(content, mtime=0)
+    return extension, content
+
+
+def _output_path(path, extension, compress):
+    # Chemin écrit pour un artefact déclaré sous son nom historique
+    # (ex: export/geo_table.json -> export/geo_table.parquet)
+    if extension is not None:
+        path = os.path.splitext(path)[0] + extension
+    if compress and extension != ".parquet":
+        path += ".gz"
+    return path
+
+
+def _same_content(path, content):
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        with open(path, "rb") as f:
+            existing = f.read()
+    except OSError:
+        return False
+    return hashlib.sha256(existing).digest() == hashlib.sha256(content).digest()
+
+
+def _write(path, data, fmt, compress):
+    with measure(f"export.{os.path.basename(path)}") as m:
+        if isinstance(data, pd.DataFrame):
+            m.set_rows(len(data))
+        extension, content = serialize(data, fmt, compress)
+        output = _output_path(path, extension, compress)
+        if _same_content(output, content):
+            return output, "unchanged"
+
+        # Écriture dans un fichier temporaire puis renommage : le frontend ne
+        # lit jamais un fichier à moitié écrit
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        tmp = f"{output}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, output)
+        return output, "written"
+
+
+def write_artifacts(artifacts, fmt="json", compress=False, max_workers=None):
+    """
+    Écrit les artefacts en parallèle (threads : sérialisation et écritures
+    indépendantes), en sautant ceux dont le contenu est inchangé.
+    :param artifacts: Dictionnaire {chemin historique: données} (cf. serialize)
+    :param fmt: Format des DataFrames ("json", "ndjson" ou "parquet")
+    :param compress: Compression gzip
+    :param max_workers: Nombre de threads (par défaut celui de ThreadPoolExecutor)
+    :return: Dictionnaire {chemin écrit: "written" ou "unchanged"}, dans
+        l'ordre des artefacts
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_write, path, data, fmt, compress)
+            for path, data in artifacts.items()
+        ]
+        return dict(future.result() for future in futures)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+
+LEVELS = [
+    "Categorie_niv_1",
+    "Categorie_niv_2",
+    "Categorie_niv_3",
+    "Categorie_niv_4",
+]
+
+
+class CategoryIndex:
+    """
+    Index de la hiérarchie Categorie_niv_1..4 des procédés.
+    Chaque noeud est identifié par son chemin, un tuple de libellés
+    (ex: ("Energie", "Electricité")) ; la racine est le tuple vide.
+    :param children: {chemin: liste des sous-catégories, dans l'ordre d'apparition}
+    :param rows: {chemin: indices des lignes de df_meta sous ce noeud (sous-arbre)}
+    :param paths: Chemin de la catégorie de chaque ligne de df_meta
+    :param names: Nom du flux de chaque ligne de df_meta
+    """
+
+    def __init__(self, children, rows, paths, names):
+        self.children = children
+        self.rows = rows
+        self.paths = paths
+        self.names = names
+        self.depth = np.fromiter((len(p) for p in paths), dtype=np.int64)
+
+    def children_of(self, path=()):
+        """
+        Sous-catégories d'un noeud (liste vide si le noeud est inconnu).
+        """
+        return self.children.get(tuple(path), [])
+
+    def subtree_rows(self, path=()):
+        """
+        Indices des procédés situés sous un noeud, à toutes les profondeurs.
+        """
+        return self.rows.get(tuple(path), np.empty(0, dtype=np.int64))
+
+    def process_rows(self, path):
+        """
+        Indices des procédés (ayant un Nom du flux) rattachés directement au
+        noeud, c'est-à-dire dont la catégorie la plus fine est ce noeud.
+        """
+        path = tuple(path)
+        rows = self.subtree_rows(path)
+        keep = (self.depth[rows] == len(path)) & pd.notna(self.names[rows])
+        return rows[keep]
+
+    def to_tree(self):
+        """
+        Arbre imbriqué {catégorie: {...: {Nom du flux: None}}}, exporté dans
+        arbre_categories.json.
+        """
+        tree = {}
+        for path, name in zip(self.paths, self.names):
+            current = tree
+            for level in path:
+                current = current.setdefault(level, {})
+            # Feuille = Nom du flux
+            if isinstance(name, str):
+                current[name] = None
+        return tree
+
+
+def build_category_index(df_meta):
+    """
+    Construit l'index de la hiérarchie par groupby vectorisés sur les
+    colonnes Categorie_niv_1..4 (un niveau à la fois).
+    Le chemin d'un procédé s'arrête au premier niveau manquant.
+    :param df_meta: DataFrame des métadonnées des procédés
+    :return: CategoryIndex
+    """
+    levels = df_meta[LEVELS].reset_index(drop=True)
+    depth = levels.notna().to_numpy().cumprod(axis=1).sum(axis=1)
+
+    children = {(): []}
+    rows = {(): np.arange(len(levels))}
+    for d in range(1, len(LEVELS) + 1):
+        keys = LEVELS[:d]
+        at_depth = levels[depth >= d]
+
+        # Sous-arbres : indices des lignes de chaque noeud de profondeur d
+        for key, idx in at_depth.groupby(keys, sort=False).indices.items():
+            path = key if isinstance(key, tuple) else (key,)
+            rows[path] = at_depth.index.to_numpy()[idx]
+
+        # Enfants, dans l'ordre de première apparition
+        for path in at_depth.drop_duplicates(keys)[keys].itertuples(
+            index=False, name=None
+        ):
+            children.setdefault(path[:-1], []).append(path[-1])
+            children.setdefault(path, [])
+
+    paths = [
+        row[:d] for row, d in zip(levels.itertuples(index=False, name=None), depth)
+    ]
+    names = df_meta["Nom du flux"].to_numpy(dtype=object)
+    return CategoryIndex(children, rows, paths, names)
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+
+class ImpactMatrix:
+    """
+    Matrice dense procédés x catégories d'impacts (float64), avec les index
+    UUID -> ligne et UUID de catégorie -> colonne pour des accès en O(1).
+    :param values: Tableau (n_procedes, n_categories), NaN si valeur absente
+    :param process_uuids: UUID des procédés, dans l'ordre des lignes
+    :param process_names: Noms des procédés, dans l'ordre des lignes
+    :param category_uuids: UUID des catégories, dans l'ordre des colonnes
+    :param category_names: Noms français des catégories, dans l'ordre des colonnes
+    """
+
+    def __init__(
+        self, values, process_uuids, process_names, category_uuids, category_names
+    ):
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.process_uuids = np.asarray(process_uuids, dtype=object)
+        self.process_names = np.asarray(process_names, dtype=object)
+        self.category_uuids = np.asarray(category_uuids, dtype=object)
+        self.category_names = np.asarray(category_names, dtype=object)
+
+        self.process_index = {uuid: i for i, uuid in enumerate(self.process_uuids)}
+        self.category_index = {uuid: j for j, uuid in enumerate(self.category_uuids)}
+        self.category_name_index = {
+            name: j for j, name in enumerate(self.category_names) if isinstance(name, str)
+        }
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def rows(self, uuids):
+        """
+        Indices de lignes des procédés (les UUID inconnus sont ignorés).
+        """
+        index = self.process_index
+        return np.fromiter(
+            (index[u] for u in uuids if u in index), dtype=np.int64
+        )
+
+    def row_lookup(self, uuids):
+        """
+        Ligne de chaque UUID, dans l'ordre donné (-1 si le procédé est absent).
+        """
+        index = self.process_index
+        return np.fromiter((index.get(u, -1) for u in uuids), dtype=np.int64)
+
+    def columns(self, category_uuids=None, category_names=None):
+        """
+        Indices de colonnes des catégories, par UUID ou par nom français
+        (toutes les colonnes si aucun filtre n'est donné).
+        """
+        if category_uuids is None and category_names is None:
+            return np.arange(self.values.shape[1])
+        if category_uuids is not None:
+            keys, index = category_uuids, self.category_index
+        else:
+            keys, index = category_names, self.category_name_index
+        return np.fromiter((index[k] for k in keys if k in index), dtype=np.int64)
+
+    def process_vector(self, uuid):
+        """
+        Vecteur des impacts d'un procédé (None si le procédé est inconnu).
+        """
+        row = self.process_index.get(uuid)
+        return None if row is None else self.values[row]
+
+    def block(self, rows, cols):
+        """
+        Sous-matrice procédés x catégories par indexation entière.
+        """
+        return self.values[np.ix_(rows, cols)]
+
+    def to_long(self, rows, cols):
+        """
+        Version longue d'un bloc (une ligne par procédé x catégorie), dans le
+        format de df_impacts enrichi du nom de catégorie.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        r = np.repeat(rows, len(cols))
+        c = np.tile(cols, len(rows))
+        return pd.DataFrame(
+            {
+                "UUID_procede": self.process_uuids[r],
+                "Nom_procede": self.process_names[r],
+                "UUID_cat": self.category_uuids[c],
+                "Nom français": self.category_names[c],
+                "valeur": self.values[r, c],
+            }
+        )
+
+
+def build_impact_matrix(df_impacts, df_cat):
+    """
+    Construit la matrice dense à partir de la table longue des impacts.
+    Les lignes et colonnes suivent l'ordre d'apparition dans le fichier ; les
+    lignes sans UUID de procédé ou de catégorie sont ignorées.
+    :param df_impacts: DataFrame long (UUID_procede, Nom_procede, UUID_cat, valeur)
+    :param df_cat: DataFrame des catégories d'impacts (UUID_cat, Nom français)
+    :return: ImpactMatrix
+    """
+    # pd.factorize code les UUID manquants -1, qui indexerait la dernière case
+    df_impacts = df_impacts.dropna(subset=["UUID_procede", "UUID_cat"])
+    process_codes, process_uuids = pd.factorize(df_impacts["UUID_procede"])
+    category_codes, category_uuids = pd.factorize(df_impacts["UUID_cat"])
+
+    values = np.full((len(process_uuids), len(category_uuids)), np.nan)
+    values[process_codes, category_codes] = df_impacts["valeur"].to_numpy(
+        dtype=np.float64
+    )
+
+    # Nom de chaque procédé : première occurrence dans la table longue
+    first = np.full(len(process_uuids), -1, dtype=np.int64)
+    first[process_codes[::-1]] = np.arange(len(process_codes))[::-1]
+    process_names = df_impacts["Nom_procede"].to_numpy(dtype=object)[first]
+
+    category_names = (
+        df_cat.drop_duplicates("UUID_cat")
+        .set_index("UUID_cat")["Nom français"]
+        .reindex(category_uuids)
+        .to_numpy(dtype=object)
+    )
+
+    return ImpactMatrix(
+        values, process_uuids, process_names, category_uuids, category_names
+    )
@@ -0,0 +1,220 @@
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+
+# Journal JSON-lines des mesures (une ligne par étape), pour l'analyse hors ligne
+LOG_PATH = "logs/instrumentation.jsonl"
+
+# Nombre de mesures gardées en mémoire pour le panneau du tableau de bord
+MAX_RECORDS = 500
+
+COLUMNS = ["time", "stage", "wall_s", "cpu_s", "peak_mb", "rows", "depth", "error"]
+
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+_local = threading.local()
+
+# Mesure du pic mémoire (tracemalloc) : désactivée par défaut. tracemalloc
+# est global au processus : tant qu'il est démarré, toutes les allocations
+# de tous les threads sont tracées (et ralenties), et son pic est unique.
+# Les exécutions mesurées sont donc sérialisées par un verrou (réentrant :
+# mesures imbriquées d'un même thread) ; tracemalloc est arrêté à la fin.
+_memory_run = threading.RLock()
+_memory = {"depth": 0, "started": False}
+
+
+@contextmanager
+def _tracemalloc_scope():
+    with _memory_run:
+        if _memory["depth"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory["started"] = True
+        _memory["depth"] += 1
+        try:
+            yield
+        finally:
+            _memory["depth"] -= 1
+            if _memory["depth"] == 0 and _memory["started"]:
+                tracemalloc.stop()
+                _memory["started"] = False
+
+
+@contextmanager
+def memory_tracking(enabled=True):
+    """
+    Mesure du pic mémoire (tracemalloc) des étapes mesurées dans le bloc
+    (ex: exécution d'une session Streamlit). Le coût est celui du processus
+    entier : pendant le bloc, les allocations de toutes les sessions sont
+    tracées et comptées dans le pic relevé. Un seul bloc mesuré s'exécute à
+    la fois : les autres sessions qui mesurent la mémoire attendent leur tour.
+    :param enabled: True pour mesurer le pic mémoire dans le bloc
+    """
+    previous = getattr(_local, "track_memory", False)
+    _local.track_memory = enabled
+    try:
+        with _tracemalloc_scope() if enabled else nullcontext():
+            yield
+    finally:
+        _local.track_memory = previous
+
+
+def count_rows(result):
+    """
+    Nombre de lignes d'un résultat d'étape (DataFrame, tableau, ImpactMatrix,
+    tuple dont le premier élément est l'un de ceux-ci), None sinon.
+    """
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    shape = getattr(result, "shape", None)
+    if isinstance(shape, tuple) and shape:
+        return shape[0]
+    return None
+
+
+class Measure:
+    """
+    Mesure d'une étape en cours, renvoyée par measure().
+    Le nombre de lignes se renseigne avec set_rows() ou set_result().
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.rows = None
+        self.peak_seen = 0
+
+    def set_rows(self, rows):
+        self.rows = rows
+
+    def set_result(self, result):
+        self.rows = count_rows(result)
+        return result
+
+
+@contextmanager
+def measure(stage, track_memory=None):
+    """
+    Mesure le temps réel, le temps CPU (du thread) et, si demandé, le pic
+    mémoire d'un bloc de code. Les mesures imbriquées sont prises en compte :
+    le pic d'une étape englobe celui de ses sous-étapes.
+    :param stage: Nom de l'étape (ex: "load.merge")
+    :param track_memory: Mesure du pic mémoire (par défaut celle du bloc
+        memory_tracking englobant, sinon aucune) ; sérialisée comme
+        memory_tracking
+    """
+    if track_memory is None:
+        track_memory = getattr(_local, "track_memory", False)
+    with _tracemalloc_scope() if track_memory else nullcontext():
+        with _measure(stage, track_memory) as m:
+            yield m
+
+
+@contextmanager
+def _measure(stage, tracing):
+    m = Measure(stage)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+        tracemalloc.reset_peak()
+        start_memory = current
+    stack.append(m)
+
+    wall, cpu = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield m
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        stack.pop()
+
+        peak_mb = None
+        if tracing and tracemalloc.is_tracing():
+            peak = max(m.peak_seen, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+            peak_mb = round((peak - start_memory) / 1e6, 3)
+
+        _record(
+            {
+                "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                "stage": stage,
+                "wall_s": round(wall, 6),
+                "cpu_s": round(cpu, 6),
+                "peak_mb": peak_mb,
+                "rows": m.rows,
+                "depth": len(stack),
+                "error": error,
+            }
+        )
+
+
+def instrumented(stage=None, track_memory=None):
+    """
+    Décorateur : mesure chaque appel de la fonction avec measure(), le nombre
+    de lignes étant déduit de la valeur de retour.
+    :param stage: Nom de l'étape (par défaut module.fonction)
+    :param track_memory: Mesure du pic mémoire (cf. measure)
+    """
+
+    def decorator(func):
+        name = stage or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(name, track_memory) as m:
+                return m.set_result(func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def _record(record):
+    with _lock:
+        _records.append(record)
+        try:
+            os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print("Journal d'instrumentation non écrit :", e)
+
+
+def recent_records(n=None):
+    """
+    Dernières mesures gardées en mémoire, de la plus ancienne à la plus récente.
+    :param n: Nombre de mesures (par défaut toutes)
+    :return: DataFrame (une ligne par mesure)
+    """
+    with _lock:
+        records = list(_records)
+    if n is not None:
+        records = records[-n:]
+    return pd.DataFrame(records, columns=COLUMNS)
+
+
+def clear_records():
+    """
+    Vide les mesures gardées en mémoire (le journal JSON-lines est conservé).
+    """
+    with _lock:
+        _records.clear()
@@ -1,12 +1,54 @@
+import csv
+import os
+import numpy as np
 import pandas as pd
-from scipy.cluster.hierarchy import linkage, leaves_list
 import streamlit as st
 from collections import Counter
 import matplotlib.pyplot as plt
 from io import BytesIO
 from analyse_pays import generate_tables_pays
+from charts import FigureCache
+from bundle import (
+    BUNDLE_ROOT,
+    BUNDLED_STAGES,
+    SOURCE_PARAMS,
+    bundle_version,
+    current_version,
+    open_bundle,
+)
+from parse_cache import cached_parse, file_fingerprint, parse_parallel
+from correlations import build_correlation_service, correlation_long
+from distributions import build_distribution_index
+from excel_reader import PROCESS_FIELDS, read_field_labels, read_transposed_fields
+from hierarchy import LEVELS, build_category_index
+from impact_matrix import build_impact_matrix
+from exports import write_artifacts
+from instrumentation import instrumented
+from pipeline import Pipeline, Stage
+from query_engine import build_query_engine
+from rollup import build_rollup_cube
+from scoring import build_scoring_engine
+from search import SEARCH_FIELDS, build_search_index
+from similarity import build_similarity_index
+from star_schema import build_star_schema, memory_report
+from validation import (
+    build_validation_report,
+    check_links,
+    check_outliers,
+    check_sources,
+)
+from version_diff import diff_matrices
+from stats import (
+    CATEGORY_KEYS,
+    GROUP_KEYS,
+    group_codes,
+    group_statistics,
+    map_to_rows,
+    segment_percentile_ranks,
+)
 
 
+@instrumented()
 def read_excel_with_dual_headers(path):
     df_raw = pd.read_excel(path, header=None).T
 
@@ -49,52 +91,114 @@ def load_excel_transpose(file_path):
     return df
 
 
-def load_impacts(file_path):
+@instrumented()
+def load_impacts(file_path, dtype=np.float64):
     """
     Charge un fichier CSV contenant des impacts environnementaux.
+    Le fichier est lu en flux, une catégorie d'impact (une ligne) à la fois :
+    les 4 premières cellules de chaque ligne sont les métadonnées de la
+    catégorie (UUID, nom anglais, nom français, unité), les suivantes ses
+    valeurs pour chaque procédé. Les deux premières lignes donnent les UUID
+    et les noms des procédés.
     :param file_path: Chemin du fichier CSV
-    :return: DataFrame avec les impacts
-    """
-    df_raw = pd.read_csv(file_path, encoding="latin1", sep=";", header=None).T
-
-    # Étape 1 : On récupère les metadonnées des catégories d'impacts (Lignes 0 à 3)
-    column_metadata = df_raw.iloc[0:4, 2:]
-
-    # Etape 2 : On set proprement les noms de colonnes
-    cols = [str(col).strip() for col in df_raw.iloc[0].tolist()]
-    cols[0] = "UUID_procede"
-    cols[1] = "Nom_procede"
-    df_raw.columns = cols
-
-    # On garde créé la version large du dataframe
-    # row 2 devient les noms de colonnes, et on supprime jusqu'à la ligne 3
-    df_large = df_raw.copy()
-    df_large.columns = [str(col).strip() for col in df_large.iloc[2].tolist()]
-    df_large = df_large[
-        4:
-    ]  # Enlève la ligne des noms maintenant qu'elle est en colonnes
-    df_large.reset_index(drop=True, inplace=True)
-
-    # Etape 3 : On retire les metadonnées
-    df_data = df_raw.iloc[4:, :]  # données des
-
-    # Étape 4 : On melt les données
-    df_melted = df_data.melt(
-        id_vars=[
-            "UUID_procede",
-            "Nom_procede",
-        ],  # UUID procédé et nom procédé (colonnes 0 et 1)
-        var_name="UUID_cat",  # index de colonne (ex: 2, 3, 4...)
-        value_name="valeur",
+    :param dtype: Type des valeurs d'impacts (np.float64 ou np.float32)
+    :return: DataFrame long des impacts et DataFrame large (procédés x catégories)
+    """
+    with open(file_path, encoding="latin1", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+
+        # Lignes 0 et 1 : UUID et noms des procédés
+        header_uuid = next(reader)
+        header_name = next(reader)
+        n_procedes = len(header_uuid) - 4
+        uuids = _uuid_cells(header_uuid[4:])
+        names = _text_cells(_pad(header_name[4:], n_procedes))
+
+        cat_uuids, cat_names, values = [], [], []
+        for line in reader:
+            if not line:
+                continue
+            line = _pad(line, n_procedes + 4)
+            # Métadonnées de la catégorie d'impact
+            cat_uuids.append(line[0].strip())
+            cat_names.append(line[2].strip())
+            # Les cellules non numériques deviennent NaN
+            values.append(
+                pd.to_numeric(
+                    np.array(line[4 : n_procedes + 4], dtype=object), errors="coerce"
+                ).astype(dtype)
+            )
+
+    n_cat = len(values)
+    values = np.vstack(values) if values else np.empty((0, n_procedes), dtype=dtype)
+
+    # Version longue (une ligne par catégorie x procédé, catégorie par catégorie)
+    df_melted = pd.DataFrame(
+        {
+            "UUID_procede": np.tile(uuids, n_cat),
+            "Nom_procede": np.tile(names, n_cat),
+            "UUID_cat": np.repeat(np.array(cat_uuids, dtype=object), n_procedes),
+            "valeur": values.ravel(),
+        }
     )
 
-    df_melted["valeur"] = pd.to_numeric(df_melted["valeur"], errors="coerce")
-    # df.columns = df.iloc[1]  # Première ligne devient les noms de colonnes
-    # df = df[4:]  # Enlève la ligne des noms maintenant qu'elle est en colonnes
-    # df.reset_index(drop=True, inplace=True)
+    # Version large (une ligne par procédé, une colonne par catégorie)
+    df_large = pd.DataFrame(values.T, columns=cat_names)
+    df_large.insert(0, header_name[2].strip(), names)
+    df_large.insert(0, header_uuid[2].strip(), uuids)
     return df_melted, df_large
 
 
+def scan_impacts(file_path):
+    """
+    Relit le fichier d'impacts (même disposition que load_impacts) et relève
+    les cellules non vides que pd.to_numeric convertit en NaN.
+    :param file_path: Chemin du fichier CSV
+    :return: DataFrame (UUID_procede, UUID_cat, cellule)
+    """
+    procedes, categories, cells = [], [], []
+    with open(file_path, encoding="latin1", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        uuids = _uuid_cells(next(reader)[4:])
+        next(reader)
+        n_procedes = len(uuids)
+        for line in reader:
+            if not line:
+                continue
+            raw = np.array(line[4 : n_procedes + 4], dtype=object)
+            raw = np.append(raw, np.full(n_procedes - len(raw), "", dtype=object))
+            coerced = np.isnan(pd.to_numeric(raw, errors="coerce").astype(np.float64))
+            bad = np.flatnonzero(coerced & (np.char.strip(raw.astype(str)) != ""))
+            procedes.append(uuids[bad])
+            categories.append(np.full(len(bad), line[0].strip(), dtype=object))
+            cells.append(raw[bad])
+
+    if not cells:
+        return pd.DataFrame(columns=["UUID_procede", "UUID_cat", "cellule"])
+    return pd.DataFrame(
+        {
+            "UUID_procede": np.concatenate(procedes),
+            "UUID_cat": np.concatenate(categories),
+            "cellule": np.concatenate(cells).astype(str),
+        }
+    )
+
+
+def _pad(cells, n):
+    return cells + [""] * (n - len(cells))
+
+
+def _text_cells(cells):
+    # Cellules vides -> NaN, comme pd.read_csv
+    return np.array([c if c != "" else np.nan for c in cells], dtype=object)
+
+
+def _uuid_cells(cells):
+    # UUID des procédés de l'en-tête : espaces supprimés (comme _clean_meta
+    # pour les métadonnées), cellules vides -> NaN
+    return _text_cells([c.strip() for c in cells])
+
+
 def create_group_tables(df):
     # 1. Répartition catégorie + unité + quantité de référence
     unit_table = (
@@ -148,46 +252,101 @@ def create_group_tables(df):
     return unit_table, geo_table, dataset_table
 
 
-# Configuration de la page
-# Chargement des données
-@st.cache_data
-def load_data():
-    """
-    Charge les données nécessaires pour le tableau de bord.
-    :return: DataFrames contenant les métadonnées, les impacts et les catégories d'impacts
-    """
-    # Metadonnées
-    df_meta = read_excel_with_dual_headers("data/BI_2.02__02_Procedes_Details.xlsx")
+# Étapes du pipeline de chargement ---------------------------------------
+# Chaque étape est une fonction sans effet de bord (hors export) : elle ne
+# modifie pas ses entrées, qui sont mémoïsées par le pipeline.
+
+
+META_RENAMES = {
+    "Catégorisation (niveau 1)": "Categorie_niv_1",
+    "Catégorisation (niveau 2)": "Categorie_niv_2",
+    "Catégorisation (niveau 3)": "Categorie_niv_3",
+    "Catégorisation (niveau 4)": "Categorie_niv_4",
+}
+
+# Champs des procédés lus pour l'index de recherche
+SEARCH_FIELDS_READ = ["UUID"] + list(SEARCH_FIELDS)
+
+
+def _clean_meta(df_meta):
     df_meta["UUID"] = df_meta["UUID"].str.strip()  # Supprime les espaces en début/fin
 
     # Trims de toutes les colonnes de type string
     for col in df_meta.select_dtypes(include=["object"]).columns:
         df_meta[col] = df_meta[col].str.strip()
 
-    df_meta.rename(
-        columns={
-            "Catégorisation (niveau 1)": "Categorie_niv_1",
-            "Catégorisation (niveau 2)": "Categorie_niv_2",
-            "Catégorisation (niveau 3)": "Categorie_niv_3",
-            "Catégorisation (niveau 4)": "Categorie_niv_4",
-        },
-        inplace=True,
+    df_meta.rename(columns=META_RENAMES, inplace=True)
+    return df_meta
+
+
+def parse_meta(meta_path):
+    """
+    Charge et nettoie les métadonnées des procédés utilisées par le chargement
+    (champs de PROCESS_FIELDS uniquement, lus en streaming).
+    :param meta_path: Chemin du fichier Excel des procédés
+    :return: DataFrame des métadonnées
+    """
+    df_meta = cached_parse(meta_path, read_transposed_fields, PROCESS_FIELDS)
+    return _clean_meta(df_meta)
+
+
+def parse_meta_details(meta_path):
+    """
+    Charge et nettoie toutes les métadonnées des procédés (tous les champs de
+    la feuille), pour les pages qui les affichent.
+    :param meta_path: Chemin du fichier Excel des procédés
+    :return: DataFrame des métadonnées complètes
+    """
+    return _clean_meta(cached_parse(meta_path, read_transposed_fields))
+
+
+def parse_search_fields(meta_path):
+    """
+    Noms et synonymes des procédés (champs de SEARCH_FIELDS), lus en
+    streaming pour l'index de recherche.
+    :param meta_path: Chemin du fichier Excel des procédés
+    :return: DataFrame (UUID, champs de SEARCH_FIELDS)
+    """
+    return _clean_meta(
+        cached_parse(meta_path, read_transposed_fields, SEARCH_FIELDS_READ)
     )
 
-    # Export de la liste des colonnes en json
 
-    with open("export/columns_meta_procedes.txt", "w", encoding="utf-8") as f:
-        for col in df_meta.columns:
-            f.write(col + "\n")
+def parse_meta_columns(meta_path):
+    """
+    Noms de tous les champs des procédés, tels qu'ils figurent dans
+    parse_meta_details.
+    :return: Liste des noms de colonnes
+    """
+    fields = cached_parse(meta_path, read_field_labels)["Champ"]
+    return [META_RENAMES.get(name, name) for name in fields]
 
-    # Impacts
-    df_impacts, df_impacts_large = load_impacts("data/BI_2.02__03_Procedes_Impacts.csv")
 
-    st.write("df_impacts_large")
-    st.write(df_impacts_large)
+def parse_meta_labels(meta_path):
+    """
+    Libellés d'origine de tous les champs des procédés, avant le renommage
+    des doublons (HeaderResolver) : un libellé répété y figure plusieurs fois.
+    :return: Liste des libellés
+    """
+    return list(cached_parse(meta_path, read_field_labels)["Libellé"])
+
 
-    # Catégories d'impacts
-    df_cat = read_excel_with_dual_headers("data/BI_2.02__06_CatImpacts_Details.xlsx")
+def parse_impacts(impacts_path):
+    """
+    Charge les impacts des procédés (versions longue et large).
+    :param impacts_path: Chemin du fichier CSV des impacts
+    :return: Tuple (df_impacts, df_impacts_large)
+    """
+    return cached_parse(impacts_path, load_impacts)
+
+
+def parse_categories(cat_path):
+    """
+    Charge et nettoie les catégories d'impacts.
+    :param cat_path: Chemin du fichier Excel des catégories d'impacts
+    :return: DataFrame des catégories d'impacts
+    """
+    df_cat = cached_parse(cat_path, read_excel_with_dual_headers)
     df_cat.rename(columns={"UUID": "UUID_cat"}, inplace=True)
 
     # Trims de toutes les colonnes de type string
@@ -197,6 +356,15 @@ def load_data():
     df_cat["UUID_cat"] = df_cat[
         "UUID_cat"
     ].str.strip()  # Supprime les espaces en début/fin
+    return df_cat
+
+
+def merge_impacts(df_meta, impacts, df_cat):
+    """
+    Rattache les métadonnées des procédés et des catégories aux impacts.
+    :return: DataFrame long des impacts enrichis
+    """
+    df_impacts, _ = impacts
 
     # Merge impacts with meta data
     df_impacts_merged = df_impacts.merge(
@@ -232,46 +400,56 @@ def load_data():
         },
         inplace=True,
     )
-    st.write("df_impacts_merged")
-    st.write(df_impacts_merged)
 
     # Trims de toutes les colonnes de type string
     for col in df_impacts_merged.select_dtypes(include=["object"]).columns:
         df_impacts_merged[col] = df_impacts_merged[col].str.strip()
 
-    # Ajout de données statistiques --------------------------------------
+    return df_impacts_merged
 
-    df_im = df_impacts_merged.copy()
 
-    # 1. Normalisation globale par catégorie d’impact
-    df_im["valeur_norm_median"] = df_im.groupby("category_name")["valeur"].transform(
-        lambda x: x / x.median()
-    )
-    df_im["valeur_norm_q3"] = df_im.groupby("category_name")["valeur"].transform(
-        lambda x: x / x.quantile(0.75)
-    )
+def build_matrix(impacts, df_cat):
+    """
+    Matrice dense procédés x catégories d'impacts indexée par UUID.
+    :return: ImpactMatrix
+    """
+    df_impacts, _ = impacts
+    return build_impact_matrix(df_impacts, df_cat)
 
-    # 2. Calcul des moyennes, médianes, et Q3 par combinaison de catégories niv1 à niv4
-    group_cols = [
-        "Categorie_niv_1",
-        "Categorie_niv_2",
-        "Categorie_niv_3",
-        "Categorie_niv_4",
-        "category_name",
-    ]
 
-    # Moyenne de la valeur brute par catégorie
-    agg_df = (
-        df_im.groupby(group_cols)["valeur"]
-        .agg(moyenne_cat="mean", median_cat="median", q3_cat=lambda x: x.quantile(0.75))
-        .reset_index()
-    )
+def normalize_impacts(df_impacts_merged):
+    """
+    Normalisation globale par catégorie d'impact (médiane et Q3) et rang
+    centile dans la catégorie.
+    :return: Copie du DataFrame long avec valeur_norm_median, valeur_norm_q3
+        et percentile
+    """
+    df_im = df_impacts_merged.copy()
 
-    # 3. Merge pour rattacher les stats agrégées au dataframe original
-    df_im = df_im.merge(agg_df, on=group_cols, how="left")
+    codes, groups = group_codes(df_im, CATEGORY_KEYS)
+    stats = group_statistics(df_im["valeur"], codes, len(groups), quantiles=(0.5, 0.75))
+    df_im["valeur_norm_median"] = df_im["valeur"] / map_to_rows(stats["q50"], codes)
+    df_im["valeur_norm_q3"] = df_im["valeur"] / map_to_rows(stats["q75"], codes)
+    # Rang centile du procédé parmi tous les procédés, pour la catégorie d'impact
+    df_im["percentile"] = segment_percentile_ranks(df_im["valeur"], codes, len(groups))
+    return df_im
 
-    st.write("df_im")
-    st.write(df_im)
+
+def aggregate_impacts(df_im):
+    """
+    Calcule les statistiques par combinaison de catégories niv1 à niv4 et le
+    score d'impact global de chaque procédé.
+    :return: Tuple (df_im enrichi des statistiques, global_impacts)
+    """
+    # Calcul des moyennes, médianes, Q3 et rangs centiles par combinaison de
+    # catégories niv1 à niv4 (rattachés à chaque ligne par le code de son groupe)
+    df_im = df_im.copy()
+    codes, groups = group_codes(df_im, GROUP_KEYS)
+    stats = group_statistics(df_im["valeur"], codes, len(groups), quantiles=(0.5, 0.75))
+    df_im["moyenne_cat"] = map_to_rows(stats["mean"], codes)
+    df_im["median_cat"] = map_to_rows(stats["q50"], codes)
+    df_im["q3_cat"] = map_to_rows(stats["q75"], codes)
+    df_im["percentile_cat"] = segment_percentile_ranks(df_im["valeur"], codes, len(groups))
 
     # Insertion d'un score d'impact global qui est la somme des impacts normalisés q3
     # l'impact global est considéré comme une catégorie d'impact
@@ -292,52 +470,85 @@ def load_data():
     global_impacts["category_name"] = "Impact global"
     global_impacts["valeur"] = global_impacts["valeur_norm_q3"]
 
-    # Remove first column
-    # global_impacts = global_impacts.drop(columns=["valeur_norm_q3"])
-    st.write("global_impacts")
-    st.write(global_impacts)
-
     # Insertion de l'impact global dans le dataframe
     # df_im = pd.concat([df_im, global_impacts], ignore_index=True)
-    st.write("df_im")
-    st.write(df_im)
-    # df_cat.to_json("categorie_impacts.json", orient="records", force_ascii=False)
+    return df_im, global_impacts
 
-    # Correlations de matrice -----------------------------------------
 
-    # On ne garde que les colonnes numériques
-    df_value_only = df_impacts_large.drop(
-        columns=[
-            "Nom français",
-            "French Name",
-        ]
-    )
+def build_star(aggregated):
+    """
+    Modèle en étoile (faits numériques + dimensions) de la table longue enrichie.
+    :return: ImpactStarSchema
+    """
+    df_im, _ = aggregated
+    return build_star_schema(df_im)
 
-    # Génération de la Matrice de corrélation
-    corr = df_value_only.corr()
 
-    # Affichage de la matrice de correlation
-    st.write("Matrice de corrélation :")
-    st.write(corr)
+def correlate_impacts(correlation_service, linkage_method):
+    """
+    Matrice de corrélation entre catégories d'impacts, réordonnée par
+    clustering hiérarchique.
+    :param linkage_method: Méthode de linkage (ex: "average", "ward")
+    :return: Tuple (corr, corr_reordered_long)
+    """
+    corr = correlation_service.correlation()
+    corr_reordered = correlation_service.clustered(linkage_method=linkage_method)
+    return corr, correlation_long(corr_reordered)
+
 
-    # Clustering
-    link = linkage(corr, method="average")  # ou 'ward'
-    idx = leaves_list(link)  # indices ordonnés
+def build_distributions(df_meta, matrix, hierarchy):
+    """
+    Valeurs triées et histogrammes de chaque catégorie d'impact, par noeud
+    de la hiérarchie.
+    :return: DistributionIndex
+    """
+    return build_distribution_index(matrix, hierarchy, matrix.row_lookup(df_meta["UUID"]))
 
-    # Réordonner la matrice
-    corr_reordered = corr.iloc[idx, idx]
 
-    # Conversion pour export
-    corr_reordered_long = corr_reordered.reset_index().melt(id_vars="index")
-    corr_reordered_long.columns = ["x", "y", "value"]
+def build_rollup(aggregated):
+    """
+    Cube d'agrégats (nombre, moyenne, médiane, Q3, min, max) de chaque
+    préfixe de la hiérarchie x catégorie d'impact, avec et sans zone
+    géographique.
+    :return: RollupCube
+    """
+    df_im, _ = aggregated
+    return build_rollup_cube(df_im)
+
 
-    # Export JSON
-    corr_reordered_long.to_json(
-        "correlations.json", orient="records", force_ascii=False
-    )
+def build_scoring(df_meta, matrix, hierarchy):
+    """
+    Scores uniques pondérés de tous les procédés (jeux de pondération par
+    défaut) et classements par noeud de la hiérarchie.
+    :return: ScoringEngine
+    """
+    return build_scoring_engine(matrix, hierarchy, matrix.row_lookup(df_meta["UUID"]))
 
-    # Analyse Zones géo / unités --------------------------------
 
+def parse_scan_impacts(impacts_path):
+    """
+    Cellules non numériques du fichier d'impacts (mises en cache comme les
+    autres parsings).
+    :return: DataFrame (UUID_procede, UUID_cat, cellule)
+    """
+    return cached_parse(impacts_path, scan_impacts)
+
+
+def validate_outliers(aggregated):
+    """
+    Valeurs atypiques de la table longue enrichie (écart interquartile en
+    échelle logarithmique, par groupe de niveau 4 x indicateur).
+    :return: DataFrame des anomalies
+    """
+    df_im, _ = aggregated
+    return check_outliers(df_im)
+
+
+def build_group_tables(df_meta):
+    """
+    Analyse Zones géo / unités / types de dataset.
+    :return: Dictionnaire des tables de répartition et des listes distinctes
+    """
     unit_table, geo_table, dataset_table = create_group_tables(df_meta)
 
     # Liste des unités distinctes (sans doublons, triée)
@@ -350,28 +561,606 @@ def load_data():
     datasets_list = sorted(set(datasets_list))
     datasets_list = pd.DataFrame(datasets_list, columns=["Type de dataset"])
 
-    # display tables
+    return {
+        "unit_table": unit_table,
+        "geo_table": geo_table,
+        "dataset_table": dataset_table,
+        "unit_list": unit_list,
+        "datasets_list": datasets_list,
+    }
+
+
+def build_tables_pays(aggregated):
+    df_im, _ = aggregated
+    return generate_tables_pays(df_im)
+
+
+def export_tables(
+    df_meta,
+    meta_columns,
+    df_cat,
+    aggregated,
+    correlations,
+    group_tables,
+    hierarchy,
+    tables_pays,
+    validation,
+    export_format,
+    export_gzip,
+):
+    """
+    Exporte les tables pour le frontend, en parallèle : les fichiers dont le
+    contenu n'a pas changé ne sont pas réécrits.
+    :param meta_columns: Noms de tous les champs des procédés
+    :param validation: Rapport du contrôle qualité (ValidationReport)
+    :param export_format: Format des tables ("json", "ndjson" ou "parquet")
+    :param export_gzip: Compression gzip des fichiers
+    :return: Dictionnaire {fichier: "written" ou "unchanged"}
+    """
+    df_im, _ = aggregated
+    _, corr_reordered_long = correlations
+
+    # Hiérarchie à plat
+    flat = df_meta[LEVELS + ["Nom du flux", "UUID"]].dropna(subset=["Nom du flux"])
+
+    artifacts = {
+        "export/columns_meta_procedes.txt": "".join(
+            col + "\n" for col in meta_columns
+        ),
+        "export/arbre_categories.json": hierarchy.to_tree(),
+        "export/hiérarchie_plate.json": flat,
+        "correlations.json": corr_reordered_long,
+        "export/impacts_long_merged.json": df_im,
+        "export/categories_metadata.json": df_cat,
+        "export/unit_list.json": group_tables["unit_list"],
+        "export/unit_table.json": group_tables["unit_table"],
+        "export/datasets_list.json": group_tables["datasets_list"],
+        "export/geo_table.json": group_tables["geo_table"],
+        "export/validation_report.json": validation.to_dict(),
+    }
+    # Extraits par pays (chemins déclarés par les ExtractSpec)
+    artifacts.update(tables_pays)
+    return write_artifacts(artifacts, export_format, export_gzip)
+
+
+# Nombre de versions de la Base Impacts dont les résultats restent en mémoire
+# (chaque version occupe une entrée du memo par étape)
+MEMO_VERSIONS = 4
+
+STAGES = [
+    Stage("parse_meta", parse_meta, ["meta_path"], files=["meta_path"]),
+    Stage(
+        "meta_columns", parse_meta_columns, ["meta_path"], files=["meta_path"]
+    ),
+    Stage(
+        "meta_labels", parse_meta_labels, ["meta_path"], files=["meta_path"]
+    ),
+    Stage(
+        "meta_details", parse_meta_details, ["meta_path"], files=["meta_path"]
+    ),
+    Stage(
+        "search_fields", parse_search_fields, ["meta_path"], files=["meta_path"]
+    ),
+    Stage("parse_impacts", parse_impacts, ["impacts_path"], files=["impacts_path"]),
+    Stage("parse_categories", parse_categories, ["cat_path"], files=["cat_path"]),
+    Stage(
+        "merge",
+        merge_impacts,
+        ["parse_meta", "parse_impacts", "parse_categories"],
+    ),
+    Stage("matrix", build_matrix, ["parse_impacts", "parse_categories"]),
+    Stage("hierarchy", build_category_index, ["parse_meta"]),
+    Stage("normalize", normalize_impacts, ["merge"]),
+    Stage("aggregate", aggregate_impacts, ["normalize"]),
+    Stage("star_schema", build_star, ["aggregate"]),
+    Stage("rollup", build_rollup, ["aggregate"]),
+    Stage(
+        "correlation_service",
+        build_correlation_service,
+        ["parse_meta", "matrix", "hierarchy"],
+    ),
+    Stage("correlate", correlate_impacts, ["correlation_service", "linkage_method"]),
+    Stage("group_tables", build_group_tables, ["parse_meta"]),
+    Stage(
+        "similarity",
+        build_similarity_index,
+        ["parse_meta", "matrix", "hierarchy"],
+    ),
+    Stage(
+        "distributions",
+        build_distributions,
+        ["parse_meta", "matrix", "hierarchy"],
+    ),
+    Stage("scoring", build_scoring, ["parse_meta", "matrix", "hierarchy"]),
+    Stage(
+        "query_engine",
+        build_query_engine,
+        ["parse_meta", "parse_categories", "matrix", "hierarchy"],
+    ),
+    Stage("search_index", build_search_index, ["search_fields"]),
+    Stage("tables_pays", build_tables_pays, ["aggregate"]),
+    Stage(
+        "scan_impacts",
+        parse_scan_impacts,
+        ["impacts_path"],
+        files=["impacts_path"],
+    ),
+    Stage(
+        "check_sources",
+        check_sources,
+        ["scan_impacts", "parse_impacts", "parse_categories", "meta_labels"],
+    ),
+    Stage(
+        "check_links",
+        check_links,
+        ["parse_meta", "parse_impacts", "parse_categories", "matrix"],
+    ),
+    Stage("check_outliers", validate_outliers, ["aggregate"]),
+    Stage(
+        "validation",
+        build_validation_report,
+        ["check_sources", "check_links", "check_outliers"],
+    ),
+    Stage(
+        "export",
+        export_tables,
+        [
+            "parse_meta",
+            "meta_columns",
+            "parse_categories",
+            "aggregate",
+            "correlate",
+            "group_tables",
+            "hierarchy",
+            "tables_pays",
+            "validation",
+            "export_format",
+            "export_gzip",
+        ],
+    ),
+]
+
+PIPELINE = Pipeline(STAGES, max_entries=len(STAGES) * MEMO_VERSIONS, name="load")
+
+# Dossier des fichiers sources et version chargée par défaut
+DATA_DIR = "data"
+DEFAULT_VERSION = "BI_2.02"
+
+DEFAULT_PARAMS = {
+    "meta_path": "data/BI_2.02__02_Procedes_Details.xlsx",
+    "impacts_path": "data/BI_2.02__03_Procedes_Impacts.csv",
+    "cat_path": "data/BI_2.02__06_CatImpacts_Details.xlsx",
+    "linkage_method": "average",  # ou 'ward'
+    "export_format": "json",  # ou 'ndjson', 'parquet'
+    "export_gzip": False,
+}
+
+
+# Parsing des fichiers sources par étape : (paramètre du chemin, parser,
+# arguments), tels qu'appelés par l'étape via cached_parse
+PARSE_JOBS = {
+    "parse_meta": ("meta_path", read_transposed_fields, (PROCESS_FIELDS,)),
+    "meta_columns": ("meta_path", read_field_labels, ()),
+    "meta_labels": ("meta_path", read_field_labels, ()),
+    "meta_details": ("meta_path", read_transposed_fields, ()),
+    "search_fields": ("meta_path", read_transposed_fields, (SEARCH_FIELDS_READ,)),
+    "parse_impacts": ("impacts_path", load_impacts, ()),
+    "scan_impacts": ("impacts_path", scan_impacts, ()),
+    "parse_categories": ("cat_path", read_excel_with_dual_headers, ()),
+}
+
+# Suffixes des fichiers d'un jeu de la Base Impacts (ex: BI_2.02__03_Procedes_Impacts.csv)
+SOURCE_SUFFIXES = {
+    "meta_path": "_02_Procedes_Details.xlsx",
+    "impacts_path": "_03_Procedes_Impacts.csv",
+    "cat_path": "_06_CatImpacts_Details.xlsx",
+}
+
+
+# Étapes calculées seulement à la demande (jamais par défaut)
+LAZY_STAGES = {"meta_details"}
+
+
+def default_targets(exclude=()):
+    """
+    Étapes calculées par défaut : toutes sauf celles de LAZY_STAGES.
+    :param exclude: Autres étapes à exclure
+    """
+    return [
+        name
+        for name in PIPELINE.stages
+        if name not in LAZY_STAGES and name not in exclude
+    ]
+
+
+def prefetch_sources(param_sets, targets=None, max_workers=None):
+    """
+    Parse en parallèle (pool de processus) les fichiers sources nécessaires
+    aux étapes cibles qui ne sont pas encore dans le cache disque : les
+    étapes de parsing du pipeline les relisent ensuite depuis le cache.
+    :param param_sets: Liste de dictionnaires de paramètres (un par jeu de fichiers)
+    :param targets: Étapes à calculer (par défaut default_targets())
+    :param max_workers: Nombre de processus (par défaut le nombre de CPU)
+    :return: Nombre de fichiers parsés
+    """
+    needed = PIPELINE.dependencies(targets or default_targets())
+    jobs = [
+        (params[path_param], parser, args)
+        for params in param_sets
+        for stage, (path_param, parser, args) in PARSE_JOBS.items()
+        if stage in needed
+    ]
+    return parse_parallel(jobs, max_workers)
+
+
+def run_pipeline(params=None, targets=None, max_workers=None):
+    """
+    Exécute le pipeline de chargement (les étapes inchangées sont reprises du cache).
+    Les fichiers sources non encore en cache sont d'abord parsés en parallèle.
+    :param params: Paramètres remplaçant ceux de DEFAULT_PARAMS
+    :param targets: Étapes à calculer (par défaut toutes sauf LAZY_STAGES,
+        export compris)
+    :param max_workers: Nombre de processus pour le parsing (1 = séquentiel)
+    :return: Dictionnaire {nom d'étape: résultat}
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    targets = targets or default_targets()
+    prefetch_sources([params], targets, max_workers)
+    return PIPELINE.run(params, targets)
+
+
+def find_file_sets(directory):
+    """
+    Recherche les jeux de fichiers de la Base Impacts d'un dossier, regroupés
+    par préfixe (ex: "BI_2.02_").
+    :param directory: Dossier contenant les fichiers sources
+    :return: Dictionnaire {préfixe: {meta_path, impacts_path, cat_path}}
+        (les jeux incomplets sont ignorés)
+    """
+    sets = {}
+    for entry in sorted(os.listdir(directory)):
+        for param, suffix in SOURCE_SUFFIXES.items():
+            if entry.endswith(suffix):
+                prefix = entry[: -len(suffix)]
+                sets.setdefault(prefix, {})[param] = os.path.join(directory, entry)
+
+    complete = {}
+    for prefix, paths in sets.items():
+        if len(paths) == len(SOURCE_SUFFIXES):
+            complete[prefix] = paths
+        else:
+            print(f"Jeu incomplet ignoré : {prefix} ({sorted(paths)})")
+    return complete
+
+
+def load_directory(directory, targets=None, max_workers=None, params=None):
+    """
+    Charge tous les jeux de fichiers d'un dossier : les fichiers de tous les
+    jeux sont parsés ensemble dans un même pool de processus, puis le
+    pipeline est exécuté pour chaque jeu.
+    :param directory: Dossier contenant les fichiers sources
+    :param targets: Étapes à calculer pour chaque jeu (par défaut toutes
+        sauf LAZY_STAGES et l'export, dont les fichiers de sortie sont communs)
+    :param params: Autres paramètres du pipeline (ex: linkage_method)
+    :return: Dictionnaire {préfixe: résultats de run_pipeline}
+    """
+    targets = targets or default_targets(exclude=["export"])
+    param_sets = {
+        prefix: {**DEFAULT_PARAMS, **(params or {}), **paths}
+        for prefix, paths in find_file_sets(directory).items()
+    }
+    prefetch_sources(list(param_sets.values()), targets, max_workers)
+    # Tous les jeux du dossier doivent tenir ensemble dans le memo
+    PIPELINE.max_entries = max(
+        PIPELINE.max_entries, len(PIPELINE.stages) * len(param_sets)
+    )
+    return {
+        prefix: PIPELINE.run(set_params, targets)
+        for prefix, set_params in param_sets.items()
+    }
+
+
+def dataset_versions(directory=DATA_DIR):
+    """
+    Versions de la Base Impacts disponibles dans un dossier, nommées d'après
+    le préfixe de leurs fichiers (ex: "BI_2.02" pour
+    BI_2.02__03_Procedes_Impacts.csv).
+    :param directory: Dossier contenant les fichiers sources
+    :return: Dictionnaire {version: {meta_path, impacts_path, cat_path}}, trié
+    """
+    return {
+        prefix.rstrip("_"): paths for prefix, paths in find_file_sets(directory).items()
+    }
+
+
+def version_params(version=None, directory=DATA_DIR):
+    """
+    Paramètres du pipeline pour une version de la Base Impacts.
+    :param version: Nom de la version (None = DEFAULT_PARAMS)
+    :return: Dictionnaire de paramètres
+    """
+    if version is None:
+        return dict(DEFAULT_PARAMS)
+    versions = dataset_versions(directory)
+    if version not in versions:
+        raise KeyError(f"Version inconnue {version!r} (disponibles : {list(versions)})")
+    return {**DEFAULT_PARAMS, **versions[version]}
+
+
+def diff_versions(old_version, new_version, rtol=0.0, directory=DATA_DIR):
+    """
+    Compare deux versions de la Base Impacts (procédés ajoutés, supprimés,
+    modifiés et variation relative par indicateur). Seules les étapes
+    nécessaires aux matrices des impacts sont exécutées, chaque version
+    étant mise en cache indépendamment.
+    :param rtol: Tolérance relative des valeurs considérées inchangées
+    :return: VersionDiff
+    """
+    old = run_pipeline(version_params(old_version, directory), targets=["matrix"])
+    new = run_pipeline(version_params(new_version, directory), targets=["matrix"])
+    return diff_matrices(
+        old["matrix"], new["matrix"], old_version, new_version, rtol=rtol
+    )
+
+
+def version_diff_path(old_version, new_version):
+    """
+    :return: Chemin de l'export JSON du diff entre deux versions
+    """
+    return f"export/diff_{old_version}_{new_version}.json"
+
+
+def render_frames(results):
+    """
+    Affiche les tables intermédiaires du pipeline (coûteux sur la table longue).
+    :param results: Résultats de run_pipeline
+    """
+    _, df_impacts_large = results["parse_impacts"]
+    df_im, global_impacts = results["aggregate"]
+    corr, _ = results["correlate"]
+    tables = results["group_tables"]
+
+    st.write("df_impacts_large")
+    st.write(df_impacts_large)
+    st.write("df_impacts_merged")
+    st.write(results["merge"])
+    st.write("df_im")
+    st.write(df_im)
+    st.write("Mémoire : modèle en étoile vs tables plates")
+    st.write(
+        memory_report(
+            results["star_schema"],
+            {"df_impacts_merged": results["merge"], "df_im": df_im},
+        )
+    )
+    st.write("global_impacts")
+    st.write(global_impacts)
+    st.write("Matrice de corrélation :")
+    st.write(corr)
     st.write("datasets_list")
-    st.write(datasets_list)
+    st.write(tables["datasets_list"])
     st.write("Tableau de répartition par catégorie + zone géographique")
-    st.write(geo_table)
+    st.write(tables["geo_table"])
     st.write("Tableau de répartition par catégorie + unité + quantité de référence")
-    st.write(unit_table)
+    st.write(tables["unit_table"])
     st.write("Tableau de répartition par catégorie + Type de dataset")
-    st.write(dataset_table)
+    st.write(tables["dataset_table"])
+
+
+# Chargement des données
+@st.cache_data
+def _load_data_pipeline(show_frames=False, version=None):
+    # Les exports JSON ne sont écrits que pour la version par défaut
+    targets = default_targets() if version is None else default_targets(["export"])
+    results = run_pipeline(version_params(version), targets)
+    if show_frames:
+        render_frames(results)
+
+    df_impacts, _ = results["parse_impacts"]
+    return results["parse_meta"], df_impacts, results["parse_categories"]
+
 
-    # Export des tables
-    df_im.to_json(
-        "export/impacts_long_merged.json", orient="records", force_ascii=False
+def load_data(show_frames=False, version=None):
+    """
+    Charge les données nécessaires pour le tableau de bord : depuis le bundle
+    courant s'il existe (mémoire mappée, partagée entre réplicas), sinon en
+    exécutant le pipeline sur les fichiers sources. Chaque version est mise
+    en cache indépendamment.
+    :param show_frames: Affiche les tables intermédiaires avec st.write
+        (exécute toujours le pipeline)
+    :param version: Version de la Base Impacts (cf. dataset_versions), None =
+        fichiers de DEFAULT_PARAMS
+    :return: DataFrames contenant les métadonnées, les impacts et les catégories
+        d'impacts (la matrice dense des impacts, partagée entre les sessions,
+        est servie par load_impact_matrix)
+    """
+    if show_frames or _bundle_version(version) is None:
+        return _load_data_pipeline(show_frames, version)
+
+    df_impacts, _ = load_stage("parse_impacts", version)
+    return (
+        load_stage("parse_meta", version),
+        df_impacts,
+        load_stage("parse_categories", version),
     )
-    df_cat.to_json(
-        "export/categories_metadata.json", orient="records", force_ascii=False
+
+
+@st.cache_resource(max_entries=2)
+def _open_bundle(version):
+    return open_bundle(BUNDLE_ROOT, version)
+
+
+def _bundle_version(version):
+    # Bundle courant, s'il a été construit à partir des fichiers de la version
+    # dans leur état actuel (chemin et contenu) ; un fichier source absent
+    # (réplica servi par le bundle seul) n'est pas comparé
+    bundle = current_version(BUNDLE_ROOT)
+    if bundle is None:
+        return None
+    sources = _open_bundle(bundle).manifest["sources"]
+    params = version_params(version)
+    for name in SOURCE_PARAMS:
+        if sources[name]["path"] != params[name]:
+            return None
+        if not os.path.exists(params[name]):
+            continue
+        if sources[name]["sha256"] != file_fingerprint(params[name]):
+            return None
+    return bundle
+
+
+@st.cache_resource(max_entries=64)
+def _load_stage(name, bundle, version, digest):
+    # digest (dataset_digest) ne sert que de clé : une étape calculée par le
+    # pipeline est recalculée quand un fichier source est modifié
+    if bundle is not None and name in BUNDLED_STAGES:
+        return _open_bundle(bundle).stage(name)
+    return run_pipeline(version_params(version), targets=[name])[name]
+
+
+def load_stage(name, version=None):
+    """
+    Résultat d'une étape, partagé entre les sessions (lecture seule) : lu dans
+    le bundle courant s'il correspond à la version, sinon calculé par le
+    pipeline. La version du bundle est relue à chaque appel : après une
+    reconstruction, les sessions passent à la nouvelle version au rerun suivant.
+    :param name: Nom de l'étape du pipeline
+    :param version: Version de la Base Impacts (None = DEFAULT_PARAMS)
+    """
+    return _load_stage(
+        name, _bundle_version(version), version, dataset_digest(version)
     )
-    unit_list.to_json("export/unit_list.json", orient="records", force_ascii=False)
-    unit_table.to_json("export/unit_table.json", orient="records", force_ascii=False)
-    datasets_list.to_json(
-        "export/datasets_list.json", orient="records", force_ascii=False
+
+
+@st.cache_resource(max_entries=8)
+def load_version_diff(old_version, new_version, rtol=0.0):
+    """
+    Diff entre deux versions de la Base Impacts, calculé sur les matrices
+    des impacts mises en cache et partagé entre les sessions.
+    :return: VersionDiff
+    """
+    return diff_matrices(
+        load_stage("matrix", old_version),
+        load_stage("matrix", new_version),
+        old_version,
+        new_version,
+        rtol=rtol,
     )
-    geo_table.to_json("export/geo_table.json", orient="records", force_ascii=False)
 
-    return df_meta, df_impacts, df_cat
+
+def load_category_index(version=None):
+    """
+    Index de la hiérarchie des catégories, construit une fois par jeu de
+    données et partagé entre les sessions (lecture seule).
+    :return: CategoryIndex
+    """
+    return load_stage("hierarchy", version)
+
+
+def load_impact_matrix(version=None):
+    """
+    Matrice dense des impacts (procédés x catégories), partagée entre les
+    sessions (lecture seule).
+    :return: ImpactMatrix
+    """
+    return load_stage("matrix", version)
+
+
+def dataset_digest(version=None):
+    """
+    Empreinte du jeu de données d'une version (contenu des fichiers sources,
+    LOADER_VERSION et BUNDLE_FORMAT), qui change dès que les données
+    rechargées changent : clé des caches de résultats dérivés (graphiques).
+    :param version: Version de la Base Impacts (None = DEFAULT_PARAMS)
+    :return: Empreinte hexadécimale
+    """
+    return bundle_version(version_params(version))
+
+
+@st.cache_resource
+def load_figure_cache():
+    """
+    Cache des graphiques rendus, partagé entre les sessions et les versions
+    (les clés contiennent l'empreinte du jeu de données, cf. dataset_digest).
+    :return: FigureCache
+    """
+    return FigureCache()
+
+
+def load_query_engine(version=None):
+    """
+    Moteur de requêtes sur la table pré-jointe des impacts, partagé entre
+    les sessions (cache de résultats commun).
+    :return: ImpactQueryEngine
+    """
+    return load_stage("query_engine", version)
+
+
+def load_star_schema(version=None):
+    """
+    Modèle en étoile de la table longue enrichie, partagé entre les sessions.
+    La table plate s'obtient à la demande avec to_flat().
+    :return: ImpactStarSchema
+    """
+    return load_stage("star_schema", version)
+
+
+def load_correlation_service(version=None):
+    """
+    Service de corrélations (cache par sous-ensemble partagé entre les sessions).
+    :return: CorrelationService
+    """
+    return load_stage("correlation_service", version)
+
+
+def load_similarity_index(version=None):
+    """
+    Index de similarité des profils d'impacts, partagé entre les sessions.
+    :return: SimilarityIndex
+    """
+    return load_stage("similarity", version)
+
+
+def load_distributions(version=None):
+    """
+    Distributions précalculées des impacts (rangs centiles, histogrammes),
+    partagées entre les sessions.
+    :return: DistributionIndex
+    """
+    return load_stage("distributions", version)
+
+
+def load_scoring_engine(version=None):
+    """
+    Moteur de scores uniques pondérés (scores de tous les procédés et
+    classements par noeud), partagé entre les sessions.
+    :return: ScoringEngine
+    """
+    return load_stage("scoring", version)
+
+
+def load_rollup_cube(version=None):
+    """
+    Cube d'agrégats par noeud de la hiérarchie (et par zone), partagé entre
+    les sessions : montée et descente dans la hiérarchie sans regroupement.
+    :return: RollupCube
+    """
+    return load_stage("rollup", version)
+
+
+def load_search_index(version=None):
+    """
+    Index de recherche approchée des procédés (noms et synonymes), partagé
+    entre les sessions.
+    :return: SearchIndex
+    """
+    return load_stage("search_index", version)
+
+
+def load_process_details(version=None):
+    """
+    Métadonnées complètes des procédés (tous les champs), chargées à la
+    première demande seulement et partagées entre les sessions.
+    :return: DataFrame des métadonnées complètes (lecture seule)
+    """
+    return load_stage("meta_details", version)
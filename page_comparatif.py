@@ -1,88 +1,72 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
-import json
 from collections import Counter
 import matplotlib.pyplot as plt
-
-
-def build_category_tree(df):
-    tree = {}
-    for _, row in df.iterrows():
-        levels = [
-            row.get("Categorie_niv_1"),
-            row.get("Categorie_niv_2"),
-            row.get("Categorie_niv_3"),
-            row.get("Categorie_niv_4"),
-        ]
-        current = tree
-        for level in levels:
-            if pd.isna(level):
-                break
-            current = current.setdefault(level, {})
-        # Feuille = Nom du flux
-        nom_flux = row.get("Nom du flux")
-        if isinstance(nom_flux, str):
-            current[nom_flux] = None
-    return tree
-
-
-def display_tree(tree, indent=0):
+from charts import bar_chart, bar_data, heatmap_chart, histogram_chart
+from instrumentation import instrumented
+from hierarchy import LEVELS
+from load import (
+    dataset_digest,
+    load_category_index,
+    load_correlation_service,
+    load_distributions,
+    load_figure_cache,
+    load_query_engine,
+    load_rollup_cube,
+    load_scoring_engine,
+    load_search_index,
+)
+
+
+def tree_lines(tree, indent=0):
     for key, subtree in tree.items():
-        st.markdown(" " * indent + f"- {key}")
+        yield "  " * indent + f"- {key}"
         if isinstance(subtree, dict):
-            display_tree(subtree, indent + 1)
+            yield from tree_lines(subtree, indent + 1)
 
 
-def page_comparatif(df_meta, df_impacts, df_cat):
+def display_tree(tree):
+    # Une seule liste markdown imbriquée (et non un élément par noeud) :
+    # l'arbre complet compte environ 2000 lignes, renvoyées à chaque rerun
+    st.markdown("\n".join(tree_lines(tree)))
 
-    st.write(df_meta)
 
-    category_tree = build_category_tree(df_meta)
+@instrumented()
+def page_comparatif(df_meta, df_impacts, df_cat, version=None):
 
-    with open("arbre_categories.json", "w", encoding="utf-8") as f:
-        json.dump(category_tree, f, ensure_ascii=False, indent=2)
-
-    df_export = df_meta[
-        [
-            "Categorie_niv_1",
-            "Categorie_niv_2",
-            "Categorie_niv_3",
-            "Categorie_niv_4",
-            "Nom du flux",
-            "UUID",
-        ]
-    ].dropna(subset=["Nom du flux"])
+    st.write(df_meta)
 
-    df_export.to_json("hiérarchie_plate.json", orient="records", force_ascii=False)
+    # Index de la hiérarchie partagé entre les sessions
+    category_index = load_category_index(version)
 
     st.title("Hiérarchie des catégories de flux")
-    tree = build_category_tree(df_meta)
     with st.expander("Afficher la hiérarchie des catégories"):
-        display_tree(tree)
+        display_tree(category_index.to_tree())
+
+    # Recherche d'un procédé : catégories des procédés trouvés, pour choisir
+    # les niveaux ci-dessous
+    query = st.text_input("Rechercher un procédé dans la hiérarchie")
+    if query.strip():
+        matches = load_search_index(version).search(query)
+        matches = matches[["UUID", "Nom du flux", "score"]].merge(
+            df_meta[["UUID"] + LEVELS], on="UUID", how="left"
+        )
+        st.dataframe(matches.drop(columns=["UUID"]), hide_index=True)
     col1, col2 = st.columns(2)
 
     # Sélection
-    level1 = st.selectbox("Niveau 1", list(category_tree.keys()))
-    level2 = st.selectbox(
-        "Niveau 2",
-        list(category_tree[level1].keys()) if level1 in category_tree else [],
-    )
-    level3 = st.selectbox(
-        "Niveau 3",
-        (
-            list(category_tree[level1][level2].keys())
-            if level2 and level2 in category_tree[level1]
-            else []
-        ),
-    )
+    level1 = st.selectbox("Niveau 1", category_index.children_of(()))
+    level2 = st.selectbox("Niveau 2", category_index.children_of((level1,)))
+    level3 = st.selectbox("Niveau 3", category_index.children_of((level1, level2)))
     level4 = st.selectbox(
-        "Niveau 4",
-        (
-            list(category_tree[level1][level2][level3].keys())
-            if level3 and level3 in category_tree[level1][level2]
-            else []
-        ),
+        "Niveau 4", category_index.children_of((level1, level2, level3))
     )
+    path = []
+    for level in (level1, level2, level3, level4):
+        if level is None:
+            break
+        path.append(level)
 
     # Selecteur de catégorie d'impact
     categories = df_cat["Nom français"].dropna().unique()
@@ -92,30 +76,42 @@ def page_comparatif(df_meta, df_impacts, df_cat):
         default=categories[:3],  # Valeur par défaut : les 3 premières catégories
     )
 
-    mask = (
-        (df_meta["Categorie_niv_1"] == level1)
-        & (df_meta["Categorie_niv_2"] == level2)
-        & (df_meta["Categorie_niv_3"] == level3)
-        & (df_meta["Categorie_niv_4"] == level4)
-        & (df_meta["Nom du flux"].notna())
-    )
-
-    df_filtered = df_meta[mask]
+    df_filtered = df_meta.iloc[category_index.process_rows(path)]
 
     st.write(df_filtered)
-    uuid_flux = df_filtered["UUID"].dropna().unique()
-
-    impacts_merged = df_impacts.merge(df_cat, on="UUID_cat", how="left")
-    impacts_merged.to_json("impacts__long.json", orient="records", force_ascii=False)
 
-    impacts = impacts_merged[
-        impacts_merged["UUID_procede"].isin(uuid_flux)
-        & impacts_merged["Nom français"].isin(selected_categories)
-    ]
-
-    impacts_filtered_cat = impacts_merged[
-        (impacts_merged["Nom français"].isin(selected_categories))
-    ]
+    # Requêtes sur la table pré-jointe (résultats en cache entre les sessions)
+    query_engine = load_query_engine(version)
+    impacts = query_engine.query(path, selected_categories)
+    impacts_filtered_cat = query_engine.query(None, selected_categories)
+
+    # Rang centile de chaque procédé parmi tous les procédés et dans le noeud
+    distributions = load_distributions(version)
+    percentile = np.full(len(impacts), np.nan)
+    percentile_node = np.full(len(impacts), np.nan)
+    for category in selected_categories:
+        mask = (impacts["Nom français"] == category).to_numpy()
+        values = impacts["valeur"].to_numpy()[mask]
+        percentile[mask] = distributions.percentile_rank(values, category)
+        percentile_node[mask] = distributions.percentile_rank(values, category, path)
+    impacts = impacts.assign(percentile=percentile, percentile_noeud=percentile_node)
+
+    # Classement des procédés du noeud par score unique pondéré
+    st.subheader("Score unique")
+    scoring = load_scoring_engine(version)
+    weight_set = st.selectbox("Jeu de pondération", scoring.set_names)
+    st.write(scoring.ranking(weight_set, path))
+
+    # Agrégats du noeud et de ses sous-catégories, lus dans le cube précalculé
+    st.subheader("Statistiques du noeud")
+    cube = load_rollup_cube(version)
+    if (tuple(path), None) in cube.index:
+        st.write(cube.node(path).reindex(selected_categories))
+        if selected_categories:
+            st.write(f"Sous-catégories ({selected_categories[0]}) :")
+            st.write(cube.drill_down(path, selected_categories[0]))
+    else:
+        st.info("Aucun impact pour ce noeud.")
 
     st.write("Flux sélectionnés :")
     st.write("Type de la colonne 'valeur':", impacts["valeur"].dtype)
@@ -123,35 +119,54 @@ def page_comparatif(df_meta, df_impacts, df_cat):
     # for _, row in df_filtered.iterrows():
     #     st.write(f"- {row['Nom du flux']}")
 
-    # Visualisation des impacts
+    # Visualisation des impacts : un graphique par catégorie (unités
+    # différentes), images en cache par sélection
+    figures = load_figure_cache()
+    digest = dataset_digest(version)
     st.subheader("Impacts environnementaux")
     if not impacts.empty:
-
-        df_plot = impacts.sort_values("valeur", ascending=True)
-
-        fig, ax = plt.subplots(figsize=(6, max(4, len(df_plot) * 0.4)))
-        ax.barh(df_plot["Nom_procede"], df_plot["valeur"])
-        ax.set_xlabel(selected_categories)
-        ax.set_title(f"{selected_categories} pour chaque procédé")
-        st.pyplot(fig)
+        rows = query_engine.node_rows(path)
+        matrix = query_engine.matrix
+        for category in selected_categories:
+            if category not in matrix.category_name_index:
+                continue
+            png = figures.get(
+                ("barres", digest, tuple(path), category),
+                lambda: bar_chart(
+                    *bar_data(matrix, rows, category),
+                    xlabel=category,
+                    title=f"{category} pour chaque procédé",
+                ),
+            )
+            st.image(png)
     else:
         st.info("Aucun impact trouvé pour ce procédé.")
 
     # Histogramme des impacts de la catégorie sélectionnée
     st.subheader("Histogramme des impacts environnementaux")
     st.write(impacts_filtered_cat)
-    if not impacts_filtered_cat.empty:
-        fig, ax = plt.subplots(figsize=(6, max(4, len(impacts_filtered_cat) * 0.4)))
-        ax.hist(
-            impacts_filtered_cat["valeur"],
-            bins=20,
-            color="blue",
-            alpha=0.7,
-            edgecolor="black",
+    if selected_categories:
+        # Histogramme précalculé (bins fixes) de tous les procédés
+        hist_category = st.selectbox("Catégorie de l'histogramme", selected_categories)
+        png = figures.get(
+            ("histogramme", digest, hist_category),
+            lambda: histogram_chart(
+                *distributions.histogram(hist_category),
+                title=f"Histogramme des impacts environnementaux : {hist_category}",
+            ),
         )
-        ax.set_xlabel("Valeur")
-        ax.set_ylabel("Fréquence")
-        ax.set_title(f"Histogramme des impacts environnementaux pour {level1}")
-        st.pyplot(fig)
+        st.image(png)
     else:
         st.info("Aucun impact trouvé pour cette catégorie.")
+
+    # Corrélations entre indicateurs pour le secteur sélectionné (niveau 1)
+    st.subheader(f"Corrélations entre indicateurs : {level1}")
+    method = st.radio("Méthode", ["pearson", "spearman"], horizontal=True)
+    correlation_service = load_correlation_service(version)
+    png = figures.get(
+        ("correlations", digest, level1, method),
+        lambda: heatmap_chart(
+            correlation_service.clustered((level1,), method=method)
+        ),
+    )
+    st.image(png)
@@ -2,37 +2,88 @@ import pandas as pd
 import streamlit as st
 from collections import Counter
 import matplotlib.pyplot as plt
+from charts import bar_chart
+from instrumentation import instrumented
+from hierarchy import LEVELS
+from load import (
+    dataset_digest,
+    load_figure_cache,
+    load_impact_matrix,
+    load_process_details,
+    load_scoring_engine,
+    load_search_index,
+    load_similarity_index,
+)
 
 
-def page_procede(df_meta, df_impacts, df_cat):
+@instrumented()
+def page_procede(version=None):
 
     # Sélection du procédé
     st.title("Dashboard Empreinte – Visualisation des impacts environnementaux")
-    procedes_dict = {
-        row["Nom du flux"]: row["UUID"]
-        for _, row in df_meta.dropna(subset=["Nom du flux", "UUID"]).iterrows()
-    }
-    procede_options = df_meta["Nom du flux"].dropna().unique()
-    selected_nom = st.selectbox("Choisir un procédé", list(procedes_dict.keys()))
-    selected_uuid = procedes_dict[selected_nom]
-
-    # Affichage des métadonnées
-    meta_info = df_meta[df_meta["UUID"] == selected_uuid]
+    # Recherche approchée (noms français et anglais, synonymes) ; sans
+    # requête, tous les procédés sont proposés
+    search_index = load_search_index(version)
+    query = st.text_input("Rechercher un procédé", placeholder="ex: acier, beton")
+    if query.strip():
+        options = search_index.search(query, k=50)
+        if options.empty:
+            st.info("Aucun procédé ne correspond à cette recherche.")
+            return
+    else:
+        options = search_index.table
+    names = dict(zip(options["UUID"], options["Nom du flux"]))
+    selected_uuid = st.selectbox(
+        "Choisir un procédé", list(names), format_func=names.get
+    )
+
+    # Affichage des métadonnées (tous les champs, chargés à la demande)
+    df_details = load_process_details(version)
+    meta_info = df_details[df_details["UUID"] == selected_uuid]
     st.subheader("Métadonnées")
     st.write(meta_info)
 
     # Visualisation des impacts
     st.subheader("Impacts environnementaux")
-    print("meta -", df_meta["UUID"][297], "-")
-    print("impacts -", df_impacts["UUID_procede"][297], "-")
-    print("cat -", df_impacts["UUID_cat"][0], "-")
-    impacts = df_impacts[df_impacts["UUID_procede"] == selected_uuid]
-    if not impacts.empty:
-        impacts_merged = impacts.merge(df_cat, on="UUID_cat", how="left")
-        fig, ax = plt.subplots()
-        ax.barh(impacts_merged["Nom français"], impacts_merged["valeur"])
-        ax.set_xlabel("Impact")
-        ax.set_title("Indicateurs environnementaux")
-        st.pyplot(fig)
+    # Matrice partagée entre les sessions
+    shared_matrix = load_impact_matrix(version)
+    impacts = shared_matrix.process_vector(selected_uuid)
+    if impacts is not None:
+        png = load_figure_cache().get(
+            ("procede", dataset_digest(version), selected_uuid),
+            lambda: bar_chart(
+                list(shared_matrix.category_names),
+                impacts,
+                xlabel="Impact",
+                title="Indicateurs environnementaux",
+            ),
+        )
+        st.image(png)
     else:
         st.info("Aucun impact trouvé pour ce procédé.")
+
+    # Score unique (jeux de pondération) et rang dans la catégorie du procédé
+    st.subheader("Score unique")
+    node = ()
+    if not meta_info.empty:
+        # Chemin tronqué au premier niveau manquant, comme dans CategoryIndex
+        levels = meta_info.iloc[0][LEVELS]
+        node = tuple(levels.iloc[: int(levels.notna().cumprod().sum())])
+    st.write("Rang parmi les procédés de la catégorie :", " > ".join(node) or "tous")
+    st.write(load_scoring_engine(version).process_ranks(selected_uuid, node))
+
+    # Procédés au profil d'impacts similaire (aide à la substitution)
+    st.subheader("Procédés similaires")
+    col1, col2, col3 = st.columns(3)
+    metric = col1.radio("Distance", ["cosine", "euclidean"])
+    k = col2.slider("Nombre de procédés", 1, 50, 10)
+    scope = col3.selectbox(
+        "Restreindre à la catégorie", ["Aucune"] + [f"Niveau {i}" for i in range(1, 5)]
+    )
+    path = None
+    if scope != "Aucune" and not meta_info.empty:
+        levels = meta_info.iloc[0][LEVELS[: int(scope[-1])]]
+        path = tuple(levels) if levels.notna().all() else None
+
+    similar = load_similarity_index(version).query(selected_uuid, k=k, metric=metric, path=path)
+    st.write(similar)
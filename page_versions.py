@@ -0,0 +1,75 @@
+import json
+import os
+
+import streamlit as st
+
+from instrumentation import instrumented
+from load import dataset_versions, load_version_diff, version_diff_path
+
+
+@instrumented()
+def page_versions():
+    st.title("Comparaison de versions de la Base Impacts")
+
+    versions = list(dataset_versions())
+    if len(versions) < 2:
+        st.info(
+            "Une seule version disponible dans data/ : ajoutez les fichiers d'une "
+            "autre version (ex: BI_2.03__03_Procedes_Impacts.csv) pour les comparer."
+        )
+        return
+
+    col1, col2 = st.columns(2)
+    old_version = col1.selectbox("Ancienne version", versions, index=len(versions) - 2)
+    new_version = col2.selectbox("Nouvelle version", versions, index=len(versions) - 1)
+    if old_version == new_version:
+        st.warning("Choisissez deux versions différentes.")
+        return
+
+    # Diff calculé une fois par couple de versions, partagé entre les sessions
+    diff = load_version_diff(old_version, new_version)
+    summary = diff.summary()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Procédés communs", summary["procedes_communs"])
+    col2.metric("Ajoutés", summary["procedes_ajoutes"])
+    col3.metric("Supprimés", summary["procedes_supprimes"])
+    col4.metric("Modifiés", summary["procedes_modifies"])
+    if diff.categories_added or diff.categories_removed:
+        st.write("Catégories ajoutées :", diff.categories_added)
+        st.write("Catégories supprimées :", diff.categories_removed)
+
+    st.subheader("Variation relative par indicateur")
+    st.dataframe(diff.indicators.drop(columns=["UUID_cat"]), hide_index=True)
+
+    tab_changed, tab_added, tab_removed, tab_renamed = st.tabs(
+        ["Modifiés", "Ajoutés", "Supprimés", "Renommés"]
+    )
+    with tab_changed:
+        changed = diff.changed.sort_values("variation_rel_max", ascending=False)
+        st.dataframe(changed, hide_index=True)
+        if len(changed):
+            # Sélection par UUID : plusieurs procédés peuvent porter le même nom
+            names = dict(zip(changed["UUID"], changed["Nom"]))
+            selected_uuid = st.selectbox(
+                "Détail d'un procédé modifié", list(names), format_func=names.get
+            )
+            st.dataframe(
+                diff.changes[diff.changes["UUID"] == selected_uuid].drop(
+                    columns=["UUID", "Nom"]
+                ),
+                hide_index=True,
+            )
+    with tab_added:
+        st.dataframe(diff.added, hide_index=True)
+    with tab_removed:
+        st.dataframe(diff.removed, hide_index=True)
+    with tab_renamed:
+        st.dataframe(diff.renamed, hide_index=True)
+
+    st.download_button(
+        "Exporter le diff en JSON",
+        json.dumps(diff.to_dict(), ensure_ascii=False),
+        file_name=os.path.basename(version_diff_path(old_version, new_version)),
+        mime="application/json",
+    )
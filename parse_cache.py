@@ -0,0 +1,243 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Dossier du cache disque (persiste entre les redémarrages de l'application)
+CACHE_DIR = ".cache/parse"
+
+# A incrémenter à chaque modification des fonctions de parsing de load.py :
+# les entrées du cache écrites par une version précédente sont alors ignorées.
+LOADER_VERSION = "3"
+
+_COLUMNS_KEY = b"base_impacts_columns"
+
+# Empreintes déjà calculées, par (chemin, taille, date de modification)
+_fingerprints = {}
+
+
+class ParseError(Exception):
+    """
+    Échec du parsing d'un fichier source dans un processus de parse_parallel.
+    Le message indique le fichier et le parser ; l'exception d'origine (et sa
+    trace dans le processus fils) est disponible dans __cause__.
+    """
+
+    def __init__(self, path, parser_name, error):
+        super().__init__(f"{path} ({parser_name}) : {type(error).__name__}: {error}")
+        self.path = path
+        self.parser_name = parser_name
+
+
+def file_fingerprint(path):
+    """
+    Calcule l'empreinte (sha256 du contenu) d'un fichier source. L'empreinte
+    est mémorisée tant que la taille et la date de modification du fichier
+    sont inchangées.
+    :param path: Chemin du fichier
+    :return: Empreinte hexadécimale
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key in _fingerprints:
+        return _fingerprints[key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    _fingerprints[key] = h.hexdigest()
+    return _fingerprints[key]
+
+
+def _cache_key(path, name):
+    h = hashlib.sha256()
+    h.update(file_fingerprint(path).encode())
+    h.update(name.encode())
+    h.update(LOADER_VERSION.encode())
+    return h.hexdigest()[:24]
+
+
+def frame_to_table(df):
+    """
+    Convertit un DataFrame (index ignoré) en table Arrow.
+    Les noms de colonnes peuvent être dupliqués ou vides : on stocke des noms
+    positionnels et la liste d'origine dans les métadonnées du schéma.
+    """
+    table = pa.Table.from_pandas(
+        df.set_axis([str(i) for i in range(df.shape[1])], axis=1),
+        preserve_index=False,
+    )
+    metadata = dict(table.schema.metadata or {})
+    metadata[_COLUMNS_KEY] = json.dumps(list(df.columns), ensure_ascii=False).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def table_to_frame(table, split_blocks=False):
+    """
+    Inverse de frame_to_table.
+    :param split_blocks: Une colonne par bloc pandas : les colonnes numériques
+        sans valeur manquante référencent alors la mémoire Arrow sans copie
+    """
+    columns = json.loads(table.schema.metadata[_COLUMNS_KEY])
+    df = table.to_pandas(split_blocks=split_blocks)
+    df.columns = columns
+
+    # Arrow restitue les valeurs manquantes des colonnes texte en None :
+    # on remet des NaN comme le fait pandas à la lecture des fichiers sources
+    for i in np.flatnonzero(df.dtypes.to_numpy() == object):
+        col = df.iloc[:, i]
+        df.isetitem(i, col.where(col.notna(), np.nan))
+    return df
+
+
+def _source_prefix(path):
+    # Préfixe des entrées d'un fichier source : nom du fichier et empreinte
+    # courte de son chemin absolu (deux fichiers de même nom dans des
+    # dossiers différents, ex: deux versions, ont des entrées distinctes)
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f"{os.path.basename(path)}-{digest}"
+
+
+def _entry(path, parser, args):
+    # Nom de l'entrée (parser et arguments) et préfixe de ses fichiers
+    name = parser.__name__
+    if args:
+        digest = hashlib.sha256(repr(args).encode()).hexdigest()[:8]
+        name = f"{name}-{digest}"
+    key = _cache_key(path, name)
+    return name, os.path.join(CACHE_DIR, f"{_source_prefix(path)}.{name}.{key}")
+
+
+def is_cached(path, parser, *args):
+    """
+    Indique si le résultat de parser(path, *args) est dans le cache disque.
+    """
+    return os.path.exists(_entry(path, parser, args)[1] + ".json")
+
+
+def cached_parse(path, parser, *args):
+    """
+    Parse un fichier source en passant par le cache disque Parquet.
+    Le résultat est relu depuis le cache tant que le contenu du fichier et
+    LOADER_VERSION sont inchangés, sinon le fichier est re-parsé.
+    :param path: Chemin du fichier source
+    :param parser: Fonction de parsing (ex: read_excel_with_dual_headers)
+    :param args: Arguments supplémentaires du parser (ex: champs à lire) ;
+        chaque jeu d'arguments a sa propre entrée dans le cache
+    :return: Le résultat de parser(path, *args) (DataFrame ou tuple de DataFrames)
+    """
+    name, base = _entry(path, parser, args)
+    manifest_path = base + ".json"
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        frames = [
+            table_to_frame(pq.read_table(f"{base}.{i}.parquet"))
+            for i in range(manifest["n_frames"])
+        ]
+        return tuple(frames) if manifest["is_tuple"] else frames[0]
+
+    result = parser(path, *args)
+    frames = list(result) if isinstance(result, tuple) else [result]
+
+    try:
+        tables = [frame_to_table(df) for df in frames]
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        # Colonnes de types mixtes non sérialisables : on n'utilise pas le cache
+        print(f"Cache désactivé pour {path} :", e)
+        return result
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _remove_stale_entries(_source_prefix(path), name)
+    for i, table in enumerate(tables):
+        tmp = f"{base}.{i}.parquet.tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, f"{base}.{i}.parquet")
+
+    # Le manifeste est écrit en dernier : une entrée sans manifeste est ignorée
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "source": path,
+                "parser": name,
+                "loader_version": LOADER_VERSION,
+                "n_frames": len(frames),
+                "is_tuple": isinstance(result, tuple),
+            },
+            f,
+        )
+    os.replace(tmp, manifest_path)
+
+    return result
+
+
+def _remove_stale_entries(source_prefix, parser_name):
+    # Anciennes entrées du même fichier source (même chemin) et du même parser
+    prefix = f"{source_prefix}.{parser_name}."
+    for entry in os.listdir(CACHE_DIR):
+        if entry.startswith(prefix):
+            os.remove(os.path.join(CACHE_DIR, entry))
+
+
+def _parse_worker(cache_dir, path, parser, args):
+    # Exécuté dans un processus fils : le résultat est écrit dans le cache
+    # (Parquet) et relu par le processus principal, sans passer par pickle
+    global CACHE_DIR
+    CACHE_DIR = cache_dir
+    cached_parse(path, parser, *args)
+
+
+def parse_parallel(jobs, max_workers=None):
+    """
+    Parse plusieurs fichiers sources en parallèle, dans un pool de processus,
+    et place les résultats dans le cache disque : les appels suivants à
+    cached_parse les relisent depuis les fichiers Parquet (format Arrow).
+    Les entrées déjà en cache ne sont pas recalculées.
+    :param jobs: Liste de tuples (path, parser, args)
+    :param max_workers: Nombre de processus (par défaut le nombre de CPU) ;
+        1 = parsing séquentiel dans le processus courant
+    :return: Nombre de fichiers parsés
+    :raise ParseError: Au premier parsing en échec (les autres sont annulés)
+    """
+    pending, seen = [], set()
+    for path, parser, args in jobs:
+        key = (path, parser.__name__, repr(tuple(args)))
+        if key not in seen and not is_cached(path, parser, *args):
+            seen.add(key)
+            pending.append((path, parser, tuple(args)))
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    if max_workers <= 1:
+        for path, parser, args in pending:
+            try:
+                cached_parse(path, parser, *args)
+            except Exception as e:
+                raise ParseError(path, parser.__name__, e) from e
+        return len(pending)
+
+    # "spawn" : le processus principal (Streamlit) a déjà des threads, un
+    # fork pourrait hériter de verrous tenus
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(_parse_worker, CACHE_DIR, path, parser, args): (path, parser)
+            for path, parser, args in pending
+        }
+        for future in as_completed(futures):
+            path, parser = futures[future]
+            try:
+                future.result()
+            except Exception as e:  # y compris BrokenProcessPool
+                for other in futures:
+                    other.cancel()
+                raise ParseError(path, parser.__name__, e) from e
+    return len(pending)
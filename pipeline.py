@@ -0,0 +1,120 @@
+import hashlib
+from collections import OrderedDict
+
+from instrumentation import measure
+from parse_cache import file_fingerprint
+
+
+class Stage:
+    """
+    Étape nommée du pipeline de chargement.
+    :param name: Nom de l'étape
+    :param func: Fonction appelée avec les valeurs de `inputs`, dans l'ordre
+    :param inputs: Noms des étapes amont ou des paramètres du pipeline
+    :param files: Paramètres contenant un chemin de fichier : leur empreinte
+        porte sur le contenu du fichier et non sur le chemin
+    :param version: A incrémenter quand le code de l'étape change
+    """
+
+    def __init__(self, name, func, inputs=(), files=(), version="1"):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.files = tuple(files)
+        self.version = version
+
+
+class Pipeline:
+    """
+    Enchaîne des étapes dont les résultats sont mémoïsés par le hash de leurs
+    entrées : modifier un fichier ou un paramètre ne recalcule que les étapes
+    situées en aval.
+    :param stages: Liste d'étapes (Stage), dans un ordre topologique
+    :param max_entries: Nombre maximal de résultats conservés en mémoire
+    :param name: Préfixe des étapes dans les mesures d'instrumentation
+    """
+
+    def __init__(self, stages, max_entries=64, name="pipeline"):
+        self.stages = OrderedDict((stage.name, stage) for stage in stages)
+        self.max_entries = max_entries
+        self.name = name
+        self._memo = OrderedDict()
+        # Pour chaque étape du dernier run : "computed" ou "cached"
+        self.last_run = {}
+
+        declared = set()
+        for stage in stages:
+            for name in stage.inputs:
+                if name in self.stages and name not in declared:
+                    raise ValueError(
+                        f"{stage.name} : l'étape {name} doit être déclarée avant"
+                    )
+            declared.add(stage.name)
+            for name in stage.files:
+                if name not in stage.inputs:
+                    raise ValueError(f"{stage.name} : fichier {name} absent des entrées")
+
+    def _input_hash(self, stage, name, params, keys):
+        if name in self.stages:
+            return keys[name]
+        if name not in params:
+            raise KeyError(f"{stage.name} : entrée inconnue {name!r}")
+        if name in stage.files:
+            return file_fingerprint(params[name])
+        return hashlib.sha256(repr(params[name]).encode()).hexdigest()
+
+    def run(self, params, targets=None):
+        """
+        Exécute le pipeline.
+        :param params: Dictionnaire des paramètres (chemins, options...)
+        :param targets: Étapes à calculer (par défaut toutes) ; seules leurs
+            dépendances sont exécutées
+        :return: Dictionnaire {nom d'étape: résultat}
+        """
+        needed = self.dependencies(targets or list(self.stages))
+        keys, results = {}, {}
+        self.last_run = {}
+
+        for name, stage in self.stages.items():
+            if name not in needed:
+                continue
+
+            h = hashlib.sha256(f"{name}:{stage.version}".encode())
+            for input_name in stage.inputs:
+                h.update(self._input_hash(stage, input_name, params, keys).encode())
+            keys[name] = h.hexdigest()
+
+            if keys[name] in self._memo:
+                self._memo.move_to_end(keys[name])
+                results[name] = self._memo[keys[name]]
+                self.last_run[name] = "cached"
+                continue
+
+            args = [
+                results[i] if i in self.stages else params[i] for i in stage.inputs
+            ]
+            with measure(f"{self.name}.{name}") as m:
+                results[name] = m.set_result(stage.func(*args))
+            self.last_run[name] = "computed"
+
+            self._memo[keys[name]] = results[name]
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+        return results
+
+    def dependencies(self, targets):
+        """
+        Étapes nécessaires au calcul des étapes cibles (cibles comprises).
+        :return: Ensemble de noms d'étapes
+        """
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            if name not in self.stages:
+                raise KeyError(f"Étape inconnue {name!r}")
+            needed.add(name)
+            stack.extend(i for i in self.stages[name].inputs if i in self.stages)
+        return needed
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class ImpactQueryEngine:
+    """
+    Requêtes sur la table des impacts pré-jointe aux catégories d'impacts.
+    La table suit la grille de la matrice dense (ligne = procédé x n_cat +
+    catégorie) : une sélection se traduit directement en positions, sans
+    filtre isin sur la table longue.
+    Les résultats sont gardés dans un cache LRU borné en mémoire, partagé
+    entre les sessions : ils doivent être traités en lecture seule.
+    :param table: Table pré-jointe (voir build_query_engine)
+    :param matrix: ImpactMatrix
+    :param hierarchy: CategoryIndex
+    :param meta_to_matrix: Ligne de la matrice de chaque ligne de df_meta (-1 si absente)
+    :param max_bytes: Taille maximale du cache de résultats
+    """
+
+    def __init__(self, table, matrix, hierarchy, meta_to_matrix, max_bytes=256 << 20):
+        self.table = table
+        self.matrix = matrix
+        self.hierarchy = hierarchy
+        self.meta_to_matrix = meta_to_matrix
+        self.max_bytes = max_bytes
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def query(self, path, categories):
+        """
+        Impacts des procédés d'un noeud de la hiérarchie pour des catégories
+        d'impacts données.
+        :param path: Chemin du noeud (procédés rattachés directement au noeud),
+            ou None pour tous les procédés
+        :param categories: Noms français des catégories d'impacts
+        :return: DataFrame (une ligne par procédé x catégorie)
+        """
+        key = (None if path is None else tuple(path), tuple(categories))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+        result = self._run(*key)
+        size = int(result.memory_usage(index=True).sum())
+
+        with self._lock:
+            self.misses += 1
+            if size <= self.max_bytes and key not in self._cache:
+                self._cache[key] = result
+                self._cache_bytes += size
+                while self._cache_bytes > self.max_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_bytes -= int(evicted.memory_usage(index=True).sum())
+        return result
+
+    def node_rows(self, path):
+        """
+        Lignes de la matrice des procédés rattachés directement à un noeud.
+        :param path: Chemin du noeud, ou None pour tous les procédés
+        """
+        if path is None:
+            return np.arange(self.matrix.shape[0])
+        rows = self.meta_to_matrix[self.hierarchy.process_rows(path)]
+        return pd.unique(rows[rows >= 0])
+
+    def _run(self, path, categories):
+        rows = self.node_rows(path)
+        cols = self.matrix.columns(category_names=categories)
+
+        positions = (rows[:, None] * self.matrix.shape[1] + cols).ravel()
+        return self.table.take(positions).reset_index(drop=True)
+
+    def cache_info(self):
+        """
+        :return: Dictionnaire (entrées, octets, hits, misses) du cache de résultats
+        """
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def build_query_engine(df_meta, df_cat, matrix, hierarchy, max_bytes=256 << 20):
+    """
+    Construit la table pré-jointe (une fois au chargement) et le moteur de requêtes.
+    Les colonnes texte sont codées en catégories pandas.
+    :return: ImpactQueryEngine
+    """
+    n_proc, n_cat = matrix.shape
+    table = matrix.to_long(np.arange(n_proc), np.arange(n_cat)).drop(
+        columns=["Nom français"]
+    )
+    table = table.merge(
+        df_cat.drop_duplicates("UUID_cat"), on="UUID_cat", how="left", sort=False
+    )
+    for col in table.columns:
+        if table[col].dtype == object:
+            table[col] = table[col].astype("category")
+
+    meta_to_matrix = matrix.row_lookup(df_meta["UUID"])
+    return ImpactQueryEngine(table, matrix, hierarchy, meta_to_matrix, max_bytes)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from hierarchy import LEVELS
+from stats import group_codes, group_statistics
+
+
+# Statistiques du cube, dans l'ordre du dernier axe de RollupCube.values
+STATISTICS = ["count", "mean", "median", "q3", "min", "max"]
+
+ZONE = "Zone géographique"
+
+
+class RollupCube:
+    """
+    Cube d'agrégats des impacts (grouping sets) : nombre, moyenne, médiane,
+    Q3, minimum et maximum pour chaque noeud de la hiérarchie des catégories
+    (tous les préfixes Categorie_niv_1..4, racine comprise) x catégorie
+    d'impact, et éventuellement x zone géographique.
+    Chaque noeud est indexé par (chemin, zone) : montée et descente dans la
+    hiérarchie sont des lectures en temps constant.
+    :param paths: Chemin de chaque noeud (tuple de libellés, () = racine)
+    :param zones: Zone géographique de chaque noeud (None = toutes les zones)
+    :param category_names: Noms des catégories d'impacts (deuxième axe de values)
+    :param values: Tableau (noeuds, catégories, STATISTICS)
+    """
+
+    def __init__(self, paths, zones, category_names, values):
+        self.paths = [tuple(p) for p in paths]
+        self.zones = list(zones)
+        self.category_names = np.asarray(category_names, dtype=object)
+        self.values = values
+
+        self.index = {key: i for i, key in enumerate(zip(self.paths, self.zones))}
+        self.category_index = {name: j for j, name in enumerate(self.category_names)}
+        self.children = {}
+        self.zones_of = {}
+        for path, zone in self.index:
+            if zone is None:
+                self.children.setdefault(path, [])
+                if path:
+                    self.children.setdefault(path[:-1], []).append(path)
+            else:
+                self.zones_of.setdefault(path, []).append(zone)
+
+    def _row(self, path, zone):
+        key = (tuple(path or ()), zone)
+        if key not in self.index:
+            raise KeyError(f"Noeud absent du cube : {key!r}")
+        return self.index[key]
+
+    def node(self, path=(), zone=None):
+        """
+        Statistiques d'un noeud pour toutes les catégories d'impacts.
+        :param path: Chemin du noeud (() = tous les procédés)
+        :param zone: Zone géographique (None = toutes les zones)
+        :return: DataFrame (une ligne par catégorie, une colonne par statistique)
+        """
+        return pd.DataFrame(
+            self.values[self._row(path, zone)],
+            index=pd.Index(self.category_names, name="category_name"),
+            columns=STATISTICS,
+        )
+
+    def get(self, path, category, zone=None):
+        """
+        Statistiques d'un noeud pour une catégorie d'impact.
+        :return: Dictionnaire {statistique: valeur}
+        """
+        cell = self.values[self._row(path, zone), self.category_index[category]]
+        return dict(zip(STATISTICS, cell.tolist()))
+
+    def _table(self, keys, labels, category):
+        rows = [self.index[key] for key in keys]
+        df = pd.DataFrame(
+            self.values[rows, self.category_index[category]], columns=STATISTICS
+        )
+        df.insert(0, labels[0], labels[1])
+        return df
+
+    def drill_down(self, path, category, zone=None):
+        """
+        Statistiques des sous-catégories d'un noeud pour une catégorie d'impact.
+        :return: DataFrame (une ligne par sous-catégorie)
+        """
+        path = tuple(path or ())
+        children = self.children.get(path, [])
+        if zone is not None:
+            children = [c for c in children if (c, zone) in self.index]
+        return self._table(
+            [(c, zone) for c in children],
+            ("Sous-catégorie", [c[-1] for c in children]),
+            category,
+        )
+
+    def by_zone(self, path, category):
+        """
+        Statistiques d'un noeud par zone géographique pour une catégorie d'impact.
+        :return: DataFrame (une ligne par zone)
+        """
+        path = tuple(path or ())
+        zones = self.zones_of.get(path, [])
+        return self._table([(path, z) for z in zones], (ZONE, zones), category)
+
+    def to_frame(self):
+        """
+        Version longue du cube (une ligne par noeud x catégorie d'impact).
+        """
+        n_nodes, n_cat, _ = self.values.shape
+        node = np.repeat(np.arange(n_nodes), n_cat)
+        df = pd.DataFrame(self.values.reshape(-1, len(STATISTICS)), columns=STATISTICS)
+        df.insert(0, "path", [self.paths[i] for i in node])
+        df.insert(1, "zone", [self.zones[i] for i in node])
+        df.insert(2, "category_name", np.tile(self.category_names, n_nodes))
+        return df
+
+
+def build_rollup_cube(df_im, by_zone=True, value_col="valeur"):
+    """
+    Construit le cube d'agrégats en une passe : les codes de groupe de tous
+    les grouping sets (préfixes de la hiérarchie, avec ou sans zone) sont
+    empilés puis agrégés ensemble par group_statistics.
+    Comme dans l'index de la hiérarchie, le chemin d'une ligne s'arrête au
+    premier niveau manquant ; à profondeur 4, les agrégats sont ceux de
+    aggregate_impacts (moyenne_cat, median_cat, q3_cat).
+    :param df_im: Table longue des impacts enrichie (non modifiée)
+    :param by_zone: Ajoute les grouping sets x zone géographique
+    :return: RollupCube
+    """
+    keys = df_im[LEVELS].reset_index(drop=True)
+    if by_zone:
+        # Même nettoyage que les extraits par pays (";" final)
+        keys[ZONE] = df_im[ZONE].str.rstrip(";").str.strip().to_numpy()
+    depth = keys[LEVELS].notna().to_numpy().cumprod(axis=1).sum(axis=1)
+    category_codes, category_names = pd.factorize(df_im["category_name"])
+    n_cat = len(category_names)
+
+    paths, zones, set_codes = [], [], []
+    for zone_set in [False, True] if by_zone else [False]:
+        for d in range(len(LEVELS) + 1):
+            columns = LEVELS[:d] + ([ZONE] if zone_set else [])
+            if columns:
+                # Lignes ayant une clé manquante : hors groupe (-1)
+                codes, groups = group_codes(keys, columns)
+                codes = np.where(depth >= d, codes, -1)
+                tuples = list(groups.itertuples(index=False, name=None))
+            else:
+                codes = np.zeros(len(keys), dtype=np.int64)
+                tuples = [()]
+            for key in tuples:
+                paths.append(key[:d])
+                zones.append(key[d] if zone_set else None)
+            set_codes.append(np.where(codes >= 0, codes + len(paths) - len(tuples), -1))
+
+    # Une seule agrégation sur les codes (noeud, catégorie) de tous les sets
+    node_codes = np.concatenate(set_codes)
+    category = np.tile(category_codes, len(set_codes))
+    codes = np.where(
+        (node_codes >= 0) & (category >= 0), node_codes * n_cat + category, -1
+    )
+    values = np.tile(df_im[value_col].to_numpy(dtype=np.float64), len(set_codes))
+    stats = group_statistics(
+        values, codes, len(paths) * n_cat, quantiles=(0, 0.5, 0.75, 1)
+    )
+    table = stats[["count", "mean", "q50", "q75", "q0", "q100"]].to_numpy()
+    table = table.reshape(len(paths), n_cat, len(STATISTICS))
+    return RollupCube(paths, zones, category_names, table)
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+
+# Facteurs de normalisation EF 3.0 (impact annuel moyen d'un habitant du
+# monde), dans les unités de la Base Impacts
+NORMALIZATION_FACTORS = {
+    "Acidification": 5.56e1,  # mol éq. H+
+    "Appauvrissement de la couche d'ozone": 5.23e-2,  # kg éq. CFC 11
+    "Changement climatique": 7.55e3,  # kg éq. CO2
+    "Changement climatique - Biogénique": 7.55e3,
+    "Changement climatique - Fossile": 7.55e3,
+    "Eutrophisation eaux douces": 1.61,  # kg éq. P
+    "Eutrophisation marine": 1.95e1,  # kg éq. N
+    "Eutrophisation terrestre": 1.77e2,  # mol éq. N
+    "Formation d'ozone photochimique": 4.09e1,  # kg éq. COVNM
+    "Particules": 5.95e-4,  # incidence de maladie
+    "Radiations ionisantes": 4.22e3,  # kBq éq. U235
+    "Utilisation de ressources fossiles": 6.50e4,  # MJ
+    "Utilisation de ressources minérales et métalliques": 6.36e-2,  # kg éq. Sb
+    "Utilisation des sols": 8.19e5,  # pt
+}
+
+# Pondérations EF 3.0 (en fraction ; la toxicité et l'utilisation d'eau,
+# absentes de la Base Impacts, ne sont pas reportées). Les sous-indicateurs
+# du changement climatique ne sont pas pondérés : ils sont déjà comptés dans
+# l'indicateur total.
+EF_WEIGHTS = {
+    "Acidification": 0.0620,
+    "Appauvrissement de la couche d'ozone": 0.0631,
+    "Changement climatique": 0.2106,
+    "Eutrophisation eaux douces": 0.0280,
+    "Eutrophisation marine": 0.0296,
+    "Eutrophisation terrestre": 0.0371,
+    "Formation d'ozone photochimique": 0.0478,
+    "Particules": 0.0896,
+    "Radiations ionisantes": 0.0501,
+    "Utilisation de ressources fossiles": 0.0832,
+    "Utilisation de ressources minérales et métalliques": 0.0755,
+    "Utilisation des sols": 0.0794,
+}
+
+WEIGHT_SETS = {
+    "EF 3.0": EF_WEIGHTS,
+    "Pondération égale": {name: 1 / len(EF_WEIGHTS) for name in EF_WEIGHTS},
+    "Climat seul": {"Changement climatique": 1.0},
+}
+
+
+class ScoringEngine:
+    """
+    Scores uniques des procédés : impacts normalisés (divisés par les
+    facteurs de normalisation) puis sommés avec les poids de chaque jeu de
+    pondération. Tous les jeux sont évalués ensemble, en un seul produit
+    matriciel (procédés x catégories) @ (catégories x jeux).
+    Un procédé sans valeur pour une catégorie pondérée d'un jeu n'a pas de
+    score pour ce jeu (NaN) et n'est pas classé. Les catégories inconnues ou
+    sans facteur de normalisation sont ignorées, les poids restants du jeu
+    étant renormalisés.
+    :param matrix: ImpactMatrix
+    :param hierarchy: CategoryIndex
+    :param meta_to_matrix: Ligne de la matrice de chaque ligne de df_meta
+        (-1 si absente)
+    :param normalization: {Nom français de la catégorie: facteur de normalisation}
+    :param weight_sets: {nom du jeu: {Nom français de la catégorie: poids}}
+    """
+
+    def __init__(
+        self,
+        matrix,
+        hierarchy,
+        meta_to_matrix,
+        normalization=NORMALIZATION_FACTORS,
+        weight_sets=WEIGHT_SETS,
+    ):
+        self.matrix = matrix
+        self.hierarchy = hierarchy
+        self.meta_to_matrix = meta_to_matrix
+
+        factors = np.array(
+            [normalization.get(name, np.nan) for name in matrix.category_names]
+        )
+        missing = [n for n, f in zip(matrix.category_names, factors) if np.isnan(f)]
+        if missing:
+            print("Catégories sans facteur de normalisation (ignorées) :", missing)
+        self.scorable = ~np.isnan(factors)
+        with np.errstate(invalid="ignore"):
+            self.normalized = matrix.values / factors
+
+        self.set_names = list(weight_sets)
+        self.weights = self.weight_matrix(weight_sets)
+        self.scores = self.evaluate(self.weights)
+        self._ranks = {}
+
+    def weight_matrix(self, weight_sets):
+        """
+        Matrice des poids (catégories x jeux), dans l'ordre des colonnes de
+        la matrice des impacts (poids nul pour les catégories non citées).
+        Les catégories inconnues ou sans facteur de normalisation sont
+        ignorées (avertissement) et les autres poids du jeu renormalisés pour
+        garder sa somme.
+        :param weight_sets: {nom du jeu: {Nom français: poids}}
+        """
+        weights = np.zeros((len(self.matrix.category_names), len(weight_sets)))
+        for k, (set_name, weight_set) in enumerate(weight_sets.items()):
+            ignored = []
+            for name, weight in weight_set.items():
+                j = self.matrix.category_name_index.get(name)
+                if j is None or not self.scorable[j]:
+                    ignored.append(name)
+                    continue
+                weights[j, k] = weight
+
+            if ignored:
+                print(f"Jeu {set_name!r} : catégories ignorées {ignored}")
+                known = weights[:, k].sum()
+                if known:
+                    weights[:, k] *= sum(weight_set.values()) / known
+        return weights
+
+    def evaluate(self, weights):
+        """
+        Scores de tous les procédés pour une matrice de poids (NaN si une
+        catégorie pondérée du jeu n'a pas de valeur pour le procédé).
+        :param weights: Tableau (catégories x jeux)
+        :return: Tableau (procédés x jeux)
+        """
+        used = weights.any(axis=1)
+        values = self.normalized[:, used]
+        missing = np.isnan(values)
+        scores = np.where(missing, 0.0, values) @ weights[used]
+        incomplete = (missing.astype(np.float64) @ (weights[used] != 0)) > 0
+        scores[incomplete] = np.nan
+        return scores
+
+    def evaluate_sets(self, weight_sets):
+        """
+        Scores de tous les procédés pour des jeux de pondération quelconques
+        (scénarios), évalués en un seul produit matriciel.
+        :param weight_sets: {nom du jeu: {Nom français: poids}}
+        :return: DataFrame (une ligne par procédé, une colonne par jeu)
+        """
+        return self._frame(self.evaluate(self.weight_matrix(weight_sets)), weight_sets)
+
+    def scores_frame(self):
+        """
+        :return: DataFrame des scores des jeux du moteur (une colonne par jeu)
+        """
+        return self._frame(self.scores, self.set_names)
+
+    def _frame(self, scores, names):
+        df = pd.DataFrame(scores, columns=list(names))
+        df.insert(0, "UUID_procede", self.matrix.process_uuids)
+        df.insert(1, "Nom_procede", self.matrix.process_names)
+        return df
+
+    def node_rows(self, path=None):
+        """
+        Lignes (matrice) des procédés situés sous un noeud de la hiérarchie.
+        :param path: Chemin du noeud (None = tous les procédés)
+        """
+        if path is None or tuple(path) == ():
+            return np.arange(self.matrix.shape[0])
+        rows = self.meta_to_matrix[self.hierarchy.subtree_rows(path)]
+        return np.unique(rows[rows >= 0])
+
+    def ranks(self, path=None):
+        """
+        Rangs des procédés d'un noeud pour tous les jeux à la fois (1 = score
+        le plus faible, ex aequo au même rang), mis en cache par noeud. Les
+        procédés sans score pour un jeu ne sont pas classés (rang NaN).
+        :return: Tuple (lignes des procédés, rangs (procédés x jeux),
+            effectif classé de chaque jeu)
+        """
+        key = () if path is None else tuple(path)
+        if key not in self._ranks:
+            rows = self.node_rows(key)
+            scores = self.scores[rows]
+            ranks = rankdata(scores, method="min", axis=0, nan_policy="omit")
+            self._ranks[key] = (rows, ranks, (~np.isnan(scores)).sum(axis=0))
+        return self._ranks[key]
+
+    def ranking(self, weight_set, path=None):
+        """
+        Classement des procédés d'un noeud pour un jeu de pondération. Les
+        procédés sans score (complet = False) sont listés après les autres,
+        sans rang.
+        :param weight_set: Nom du jeu (cf. set_names)
+        :param path: Chemin du noeud (None = tous les procédés)
+        :return: DataFrame trié par rang (UUID_procede, Nom_procede, score,
+            rang, rang_centile, complet)
+        """
+        k = self.set_names.index(weight_set)
+        rows, ranks, counts = self.ranks(path)
+        df = pd.DataFrame(
+            {
+                "UUID_procede": self.matrix.process_uuids[rows],
+                "Nom_procede": self.matrix.process_names[rows],
+                "score": self.scores[rows, k],
+                "rang": pd.array(ranks[:, k], dtype="Int64"),
+                "rang_centile": ranks[:, k] / max(counts[k], 1),
+                "complet": ~np.isnan(self.scores[rows, k]),
+            }
+        )
+        return df.sort_values("rang", kind="stable").reset_index(drop=True)
+
+    def process_ranks(self, uuid, path=None):
+        """
+        Scores d'un procédé et rangs parmi les procédés classés d'un noeud,
+        pour tous les jeux de pondération.
+        :return: DataFrame (une ligne par jeu : score, rang, effectif classé
+            du noeud, complet), None si le procédé n'est pas sous le noeud
+        """
+        row = self.matrix.process_index.get(uuid)
+        rows, ranks, counts = self.ranks(path)
+        i = np.searchsorted(rows, row) if row is not None else len(rows)
+        if i >= len(rows) or rows[i] != row:
+            return None
+        return pd.DataFrame(
+            {
+                "jeu": self.set_names,
+                "score": self.scores[row],
+                "rang": pd.array(ranks[i], dtype="Int64"),
+                "effectif": counts,
+                "complet": ~np.isnan(self.scores[row]),
+            }
+        )
+
+    def contributions(self, uuid, weight_set):
+        """
+        Contribution de chaque catégorie d'impact au score d'un procédé.
+        :return: Series indexée par Nom français (None si le procédé est inconnu)
+        """
+        row = self.matrix.process_index.get(uuid)
+        if row is None:
+            return None
+        k = self.set_names.index(weight_set)
+        return pd.Series(
+            self.normalized[row] * self.weights[:, k],
+            index=self.matrix.category_names,
+            name=weight_set,
+        )
+
+
+def build_scoring_engine(matrix, hierarchy, meta_to_matrix):
+    """
+    Moteur de scores uniques avec les facteurs et jeux de pondération par
+    défaut (EF 3.0, pondération égale, climat seul).
+    :return: ScoringEngine
+    """
+    return ScoringEngine(matrix, hierarchy, meta_to_matrix)
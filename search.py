@@ -0,0 +1,140 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# Champs indexés et poids de chaque champ dans le score
+SEARCH_FIELDS = {
+    "Nom du flux": 1.0,
+    "English Name": 0.9,
+    "Synonymes": 0.7,
+    "Synonyms": 0.7,
+}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text):
+    """
+    Texte normalisé pour la recherche : minuscules, sans accents, les
+    caractères non alphanumériques remplacés par des espaces.
+    """
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def trigrams(text):
+    """
+    Trigrammes des mots d'un texte normalisé (mots bornés par des espaces :
+    "eau" -> " ea", "eau", "au ").
+    :return: Ensemble de trigrammes
+    """
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Index de recherche approchée des procédés par trigrammes (tolère les
+    fautes de frappe et les accents manquants), sur le nom français, le nom
+    anglais et les synonymes.
+    Chaque procédé est un vecteur creux de trigrammes (poids = poids du
+    meilleur champ contenant le trigramme) : le score d'une requête est la
+    part pondérée de ses trigrammes présents, calculée pour tous les
+    procédés par une somme de colonnes d'une matrice creuse.
+    :param table: DataFrame (UUID, champs de SEARCH_FIELDS), une ligne par procédé
+    :param weights: Matrice creuse CSC (procédés x trigrammes)
+    :param vocabulary: {trigramme: colonne de weights}
+    """
+
+    def __init__(self, table, weights, vocabulary):
+        self.table = table.reset_index(drop=True)
+        self.weights = weights
+        self.vocabulary = vocabulary
+        self.folded_names = self.table["Nom du flux"].map(fold).to_numpy(dtype=object)
+        self.name_lengths = np.fromiter(
+            (len(n) for n in self.folded_names), dtype=np.int64, count=len(self.table)
+        )
+
+    def scores(self, query):
+        """
+        Score de chaque procédé pour une requête, dans [0, 1], plus un bonus
+        si la requête apparaît telle quelle dans le nom français (0.5) et de
+        nouveau si le nom commence par la requête (0.25).
+        :return: Tableau de taille len(table) (None si la requête est vide)
+        """
+        folded = fold(query)
+        grams = trigrams(folded)
+        if not grams:
+            return None
+        columns = [self.vocabulary[g] for g in grams if g in self.vocabulary]
+        scores = np.asarray(self.weights[:, columns].sum(axis=1)).ravel() / len(grams)
+        n = len(self.folded_names)
+        contains = np.fromiter(
+            (folded in name for name in self.folded_names), dtype=bool, count=n
+        )
+        starts = np.fromiter(
+            (name.startswith(folded) for name in self.folded_names), dtype=bool, count=n
+        )
+        return scores + 0.5 * contains + 0.25 * starts
+
+    def search(self, query, k=20, min_score=0.3):
+        """
+        Procédés les plus proches d'une requête, du meilleur au moins bon (à
+        score égal, les noms les plus courts d'abord).
+        :param query: Texte saisi
+        :param k: Nombre maximal de résultats
+        :param min_score: Score minimal (part des trigrammes de la requête)
+        :return: DataFrame (UUID, champs indexés, score)
+        """
+        scores = self.scores(query)
+        if scores is None:
+            return self.table.head(0).assign(score=pd.Series(dtype=float))
+        rows = np.flatnonzero(scores >= min_score)
+        order = np.lexsort((self.name_lengths[rows], -scores[rows]))[:k]
+        rows = rows[order]
+        return self.table.iloc[rows].assign(score=scores[rows]).reset_index(drop=True)
+
+
+def build_search_index(df_fields):
+    """
+    Construit l'index de recherche (une seule fois par jeu de données).
+    :param df_fields: DataFrame des procédés avec UUID et les champs de
+        SEARCH_FIELDS (les procédés sans Nom du flux sont ignorés)
+    :return: SearchIndex
+    """
+    table = df_fields[["UUID"] + list(SEARCH_FIELDS)]
+    table = table[table["Nom du flux"].notna()].reset_index(drop=True)
+
+    vocabulary = {}
+    doc_weights = []
+    for row in table.itertuples(index=False, name=None):
+        weights = {}
+        for value, weight in zip(row[1:], SEARCH_FIELDS.values()):
+            for gram in trigrams(fold(value)):
+                weights[gram] = max(weights.get(gram, 0.0), weight)
+        doc_weights.append(weights)
+        for gram in weights:
+            vocabulary.setdefault(gram, len(vocabulary))
+
+    indptr = np.cumsum([0] + [len(w) for w in doc_weights])
+    n = indptr[-1]
+    indices = np.fromiter(
+        (vocabulary[g] for w in doc_weights for g in w), dtype=np.int64, count=n
+    )
+    data = np.fromiter(
+        (v for w in doc_weights for v in w.values()), dtype=np.float64, count=n
+    )
+    weights = sparse.csr_matrix(
+        (data, indices, indptr), shape=(len(table), len(vocabulary))
+    ).tocsc()
+    return SearchIndex(table, weights, vocabulary)
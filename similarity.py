@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+
+METRICS = ("cosine", "euclidean")
+
+
+def clean_profiles(profiles):
+    """
+    Profils prêts pour les calculs de distance, calculés une fois à la
+    construction de l'index (et stockés dans le bundle).
+    Catégories manquantes ou non normalisables : contribution nulle. Les
+    valeurs négligeables sont mises à 0 : leurs produits seraient des
+    flottants dénormalisés, très lents à calculer.
+    :param profiles: Tableau (n_procedes, n_categories) des profils normalisés
+    :return: Tuple (profils nettoyés, profils de norme 1 (0 si norme nulle))
+    """
+    profiles = np.nan_to_num(profiles, nan=0.0, posinf=0.0, neginf=0.0)
+    profiles[np.abs(profiles) < 1e-100] = 0.0
+    norms = np.sqrt(np.einsum("ij,ij->i", profiles, profiles))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit = np.where(norms[:, None] > 0, profiles / norms[:, None], 0.0)
+    return profiles, unit
+
+
+class SimilarityIndex:
+    """
+    Recherche des procédés les plus proches d'un procédé donné, sur leur
+    profil d'impacts normalisé par le Q3 de chaque catégorie (valeur_norm_q3).
+    Les distances sont calculées par produits matriciels sur des lots de
+    requêtes. Les profils sont utilisés tels quels (sans copie) : ils peuvent
+    être mappés en mémoire depuis le bundle.
+    :param profiles: Profils nettoyés (cf. clean_profiles)
+    :param unit: Profils de norme 1 (cf. clean_profiles)
+    :param matrix: ImpactMatrix (mêmes lignes que profiles)
+    :param hierarchy: CategoryIndex
+    :param meta_to_matrix: Ligne de la matrice de chaque ligne de df_meta (-1 si absente)
+    """
+
+    def __init__(self, profiles, unit, matrix, hierarchy, meta_to_matrix):
+        self.profiles = profiles
+        self.unit = unit
+        self.matrix = matrix
+        self.hierarchy = hierarchy
+        self.meta_to_matrix = meta_to_matrix
+
+    def candidates(self, path=None):
+        """
+        Lignes candidates : tous les procédés, ou ceux d'un sous-arbre de la
+        hiérarchie.
+        """
+        if path is None:
+            return np.arange(len(self.profiles))
+        rows = self.meta_to_matrix[self.hierarchy.subtree_rows(path)]
+        return np.unique(rows[rows >= 0])
+
+    def distances(self, rows, candidates, metric="cosine"):
+        """
+        Distances entre des procédés et des candidats (cosinus par produit
+        matriciel des profils unitaires).
+        :param rows: Lignes des procédés requêtes
+        :param candidates: Lignes des candidats
+        :param metric: "cosine" (1 - similarité cosinus) ou "euclidean"
+        :return: Tableau (len(rows), len(candidates))
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if metric == "cosine":
+            return 1.0 - self.unit[rows] @ self.unit[candidates].T
+        if metric == "euclidean":
+            # Différences calculées explicitement, par lots de requêtes : la
+            # formule |a|² + |b|² - 2a.b perd toute précision pour les profils
+            # de norme élevée
+            out = np.empty((len(rows), len(candidates)))
+            cand = self.profiles[candidates]
+            step = max(1, (1 << 18) // max(1, cand.size))
+            for start in range(0, len(rows), step):
+                diff = self.profiles[rows[start : start + step], None, :] - cand
+                out[start : start + step] = np.sqrt(
+                    np.einsum("ijk,ijk->ij", diff, diff)
+                )
+            return out
+        raise ValueError(f"Métrique inconnue {metric!r} (attendu : {METRICS})")
+
+    def query_batch(self, rows, k=10, metric="cosine", path=None, exclude_self=True):
+        """
+        Les k plus proches voisins de plusieurs procédés à la fois.
+        :param rows: Lignes (matrice) des procédés requêtes
+        :param k: Nombre de voisins
+        :param metric: "cosine" ou "euclidean"
+        :param path: Restreint les candidats à un sous-arbre de la hiérarchie
+        :param exclude_self: Exclut le procédé requête de ses propres voisins
+        :return: Tuple (lignes des voisins, distances), tableaux (len(rows), k')
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        candidates = self.candidates(path)
+        dist = self.distances(rows, candidates, metric)
+        if exclude_self:
+            dist[candidates[None, :] == rows[:, None]] = np.inf
+
+        k = min(k, len(candidates))
+        if k == 0:
+            empty = np.empty((len(rows), 0))
+            return empty.astype(np.int64), empty
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        top_dist = np.take_along_axis(dist, top, axis=1)
+        order = np.argsort(top_dist, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_dist = np.take_along_axis(top_dist, order, axis=1)
+
+        # Moins de k candidats valides (ex: le procédé seul dans son sous-arbre)
+        neighbours = np.where(np.isinf(top_dist), -1, candidates[top])
+        return neighbours, top_dist
+
+    def query(self, uuid, k=10, metric="cosine", path=None):
+        """
+        Les k procédés dont le profil d'impacts est le plus proche de celui
+        d'un procédé.
+        :param uuid: UUID du procédé
+        :return: DataFrame (UUID_procede, Nom_procede, distance), du plus proche
+            au plus lointain
+        """
+        row = self.matrix.process_index.get(uuid)
+        if row is None:
+            return pd.DataFrame(columns=["UUID_procede", "Nom_procede", "distance"])
+        neighbours, dist = self.query_batch([row], k, metric, path)
+        keep = neighbours[0] >= 0
+        rows = neighbours[0][keep]
+        return pd.DataFrame(
+            {
+                "UUID_procede": self.matrix.process_uuids[rows],
+                "Nom_procede": self.matrix.process_names[rows],
+                "distance": dist[0][keep],
+            }
+        )
+
+
+def build_similarity_index(df_meta, matrix, hierarchy):
+    """
+    Construit l'index de similarité : chaque catégorie d'impact est divisée
+    par son Q3 sur l'ensemble des procédés, comme valeur_norm_q3.
+    :return: SimilarityIndex
+    """
+    with np.errstate(all="ignore"):
+        q3 = np.nanquantile(matrix.values, 0.75, axis=0)
+        profiles = matrix.values / q3
+    profiles, unit = clean_profiles(profiles)
+    meta_to_matrix = matrix.row_lookup(df_meta["UUID"])
+    return SimilarityIndex(profiles, unit, matrix, hierarchy, meta_to_matrix)
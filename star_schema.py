@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+
+PROCESS_COLUMNS = [
+    "UUID_procede",
+    "Nom_procede",
+    "UUID",
+    "Nom du flux",
+    "Categorie_niv_1",
+    "Categorie_niv_2",
+    "Categorie_niv_3",
+    "Categorie_niv_4",
+    "Quantité de référence",
+    "Unité",
+    "Zone géographique",
+    "Type de dataset",
+]
+
+CATEGORY_COLUMNS = ["UUID_cat", "category_name", "Unité de référence"]
+
+
+class ImpactStarSchema:
+    """
+    Représentation compacte de la table longue des impacts enrichis (df_im) :
+    une table de faits numérique et deux tables de dimensions.
+    :param facts: Faits (process_code, category_code, valeur, valeurs normalisées
+        et statistiques de groupe)
+    :param processes: Dimension procédés, indexée par process_code
+    :param categories: Dimension catégories d'impacts, indexée par category_code
+    :param columns: Ordre des colonnes de la table plate d'origine
+    """
+
+    def __init__(self, facts, processes, categories, columns):
+        self.facts = facts
+        self.processes = processes
+        self.categories = categories
+        self.columns = columns
+
+    def to_flat(self):
+        """
+        Reconstruit la table plate (mêmes colonnes, lignes et valeurs que df_im).
+        :return: DataFrame
+        """
+        p = self.facts["process_code"].to_numpy()
+        c = self.facts["category_code"].to_numpy()
+        flat = {}
+        for col in self.processes.columns:
+            flat[col] = _decode(self.processes[col]).to_numpy()[p]
+        for col in self.categories.columns:
+            flat[col] = _decode(self.categories[col]).to_numpy()[c]
+        for col in self.facts.columns.drop(["process_code", "category_code"]):
+            flat[col] = self.facts[col].to_numpy()
+        return pd.DataFrame(flat)[self.columns]
+
+    def memory_usage(self):
+        """
+        :return: Octets occupés par les faits et les dimensions
+        """
+        return sum(
+            int(df.memory_usage(index=True, deep=True).sum())
+            for df in (self.facts, self.processes, self.categories)
+        )
+
+
+def _decode(col):
+    # Catégories pandas -> object, pour retrouver les types de la table plate
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.astype(object).where(col.notna(), np.nan)
+    return col
+
+
+def _encode(df):
+    # Les colonnes texte répétées sont codées en catégories pandas
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == object and df[col].nunique() < len(df) / 2:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def build_star_schema(df_im):
+    """
+    Construit le modèle en étoile à partir de la table longue enrichie.
+    :param df_im: DataFrame long (sortie de l'étape aggregate)
+    :return: ImpactStarSchema
+    """
+    process_codes, _ = pd.factorize(df_im["UUID_procede"], use_na_sentinel=False)
+    category_codes, _ = pd.factorize(df_im["UUID_cat"], use_na_sentinel=False)
+
+    # Attributs de chaque procédé / catégorie : première occurrence
+    first_process = ~pd.Series(process_codes).duplicated().to_numpy()
+    first_category = ~pd.Series(category_codes).duplicated().to_numpy()
+    processes = _encode(df_im.loc[first_process, PROCESS_COLUMNS])
+    categories = _encode(df_im.loc[first_category, CATEGORY_COLUMNS])
+
+    value_columns = [
+        col for col in df_im.columns if col not in PROCESS_COLUMNS + CATEGORY_COLUMNS
+    ]
+    facts = pd.DataFrame(
+        {
+            "process_code": process_codes.astype(np.int32),
+            "category_code": category_codes.astype(np.int16),
+        }
+    )
+    for col in value_columns:
+        facts[col] = df_im[col].to_numpy()
+
+    return ImpactStarSchema(facts, processes, categories, list(df_im.columns))
+
+
+def memory_report(star, frames):
+    """
+    Compare l'occupation mémoire du modèle en étoile à celle des tables plates.
+    :param star: ImpactStarSchema
+    :param frames: Dictionnaire {nom: DataFrame plat} (ex: df_impacts_merged, df_im)
+    :return: DataFrame (table, lignes, octets, ratio par rapport au modèle en étoile)
+    """
+    rows = [
+        ("faits", len(star.facts), int(star.facts.memory_usage(deep=True).sum())),
+        (
+            "dimension procédés",
+            len(star.processes),
+            int(star.processes.memory_usage(deep=True).sum()),
+        ),
+        (
+            "dimension catégories",
+            len(star.categories),
+            int(star.categories.memory_usage(deep=True).sum()),
+        ),
+        ("modèle en étoile (total)", len(star.facts), star.memory_usage()),
+    ]
+    for name, df in frames.items():
+        rows.append((name, len(df), int(df.memory_usage(index=True, deep=True).sum())))
+
+    report = pd.DataFrame(rows, columns=["table", "lignes", "octets"])
+    report["ratio"] = report["octets"] / star.memory_usage()
+    return report
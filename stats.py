@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+
+CATEGORY_KEYS = ["category_name"]
+GROUP_KEYS = [
+    "Categorie_niv_1",
+    "Categorie_niv_2",
+    "Categorie_niv_3",
+    "Categorie_niv_4",
+    "category_name",
+]
+
+
+def group_codes(df, keys):
+    """
+    Code entier du groupe de chaque ligne (comme groupby, les lignes ayant
+    une clé manquante n'appartiennent à aucun groupe et reçoivent -1).
+    :param df: DataFrame
+    :param keys: Colonnes de regroupement
+    :return: Tuple (codes, DataFrame des clés de chaque groupe)
+    """
+    grouped = df.groupby(keys, sort=True, dropna=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    groups = grouped.size().index.to_frame(index=False)
+    return codes, groups
+
+
+def _lerp(a, b, t):
+    # Même formule que l'interpolation linéaire de numpy (et donc de
+    # Series.quantile), pour obtenir des résultats identiques au bit près
+    diff = b - a
+    out = a + diff * t
+    high = t >= 0.5
+    out[high] = (b - diff * (1 - t))[high]
+    return np.where(a == b, a, out)
+
+
+def segment_quantiles(values, codes, n_groups, quantiles):
+    """
+    Quantiles par groupe en une passe : les valeurs sont triées par
+    (groupe, valeur), chaque groupe devient un segment contigu.
+    Les NaN sont ignorés, comme dans pandas.
+    :param values: Valeurs (float)
+    :param codes: Code de groupe de chaque valeur (-1 = hors groupe)
+    :param n_groups: Nombre de groupes
+    :param quantiles: Liste de quantiles dans [0, 1] (0.5 = médiane)
+    :return: Dictionnaire {quantile: tableau de taille n_groups}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keep = (codes >= 0) & ~np.isnan(values)
+    v, c = values[keep], codes[keep]
+    order = np.lexsort((v, c))
+    v, c = v[order], c[order]
+
+    counts = np.bincount(c, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    empty = counts == 0
+    last = np.maximum(counts - 1, 0)
+
+    result = {}
+    for q in quantiles:
+        if q == 0.5:
+            # Médiane : moyenne des deux valeurs centrales, comme np.median
+            lo = starts + last // 2
+            hi = starts + (counts // 2)
+            a = v[np.minimum(lo, len(v) - 1)] if len(v) else np.zeros(n_groups)
+            b = v[np.minimum(hi, len(v) - 1)] if len(v) else np.zeros(n_groups)
+            out = np.where(counts % 2 == 1, a, (a + b) / 2)
+        else:
+            pos = q * last
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.ceil(pos).astype(np.int64)
+            a = v[np.minimum(starts + lo, len(v) - 1)] if len(v) else np.zeros(n_groups)
+            b = v[np.minimum(starts + hi, len(v) - 1)] if len(v) else np.zeros(n_groups)
+            out = _lerp(a, b, pos - lo)
+        result[q] = np.where(empty, np.nan, out)
+    return result
+
+
+def segment_percentile_ranks(values, codes, n_groups):
+    """
+    Rang centile de chaque valeur dans son groupe : part des valeurs du
+    groupe inférieures ou égales (comme groupby().rank(method="max", pct=True)).
+    Les NaN et les lignes hors groupe reçoivent NaN.
+    :param values: Valeurs (float)
+    :param codes: Code de groupe de chaque valeur (-1 = hors groupe)
+    :param n_groups: Nombre de groupes
+    :return: Tableau de taille len(values), valeurs dans ]0, 1]
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    keep = np.flatnonzero((codes >= 0) & ~np.isnan(values))
+    if not len(keep):
+        return result
+    v, c = values[keep], codes[keep]
+    order = np.lexsort((v, c))
+    v, c = v[order], c[order]
+
+    counts = np.bincount(c, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # Fin de la série d'ex aequo (même groupe, même valeur) de chaque position
+    n = len(v)
+    run_end = np.flatnonzero(np.append((v[1:] != v[:-1]) | (c[1:] != c[:-1]), True))
+    end = run_end[np.searchsorted(run_end, np.arange(n))]
+    result[keep[order]] = (end + 1 - starts[c]) / counts[c]
+    return result
+
+
+def group_statistics(values, codes, n_groups, quantiles=(0.5, 0.75)):
+    """
+    Nombre, moyenne et quantiles par groupe, sans lambda par groupe.
+    :param values: Valeurs (float)
+    :param codes: Code de groupe de chaque valeur (-1 = hors groupe)
+    :param n_groups: Nombre de groupes
+    :param quantiles: Quantiles à calculer
+    :return: DataFrame indexé par code de groupe (count, mean, q50, q75...)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keep = codes >= 0
+    grouped = pd.Series(values[keep]).groupby(codes[keep])
+    stats = pd.DataFrame(index=pd.RangeIndex(n_groups))
+    stats["count"] = grouped.count().reindex(stats.index, fill_value=0)
+    stats["mean"] = grouped.mean().reindex(stats.index)
+    for q, arr in segment_quantiles(values, codes, n_groups, quantiles).items():
+        stats[quantile_name(q)] = arr
+    return stats
+
+
+def quantile_name(q):
+    """
+    Nom de colonne d'un quantile (0.75 -> "q75", 0.5 -> "q50").
+    """
+    return "q" + f"{q * 100:g}".replace(".", "_")
+
+
+def map_to_rows(stat, codes):
+    """
+    Rattache une statistique de groupe à chaque ligne par son code de groupe
+    (les lignes hors groupe reçoivent NaN), sans merge.
+    :param stat: Tableau de taille n_groups
+    :param codes: Code de groupe de chaque ligne
+    :return: Tableau de taille len(codes)
+    """
+    return np.append(np.asarray(stat, dtype=np.float64), np.nan)[codes]
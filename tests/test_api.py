@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from api import EMPTY_LEVEL, ApiError, ResponseCache, _node_param, make_handler
+
+
+class _StubApi:
+    country_tables = {}
+
+    def indicators(self):
+        raise RuntimeError("panne")
+
+    def subtree(self, node=()):
+        if node != ("Metal", ""):
+            raise ApiError(404, f"Noeud inconnu : {node}")
+        return {"noeud": list(node), "arbre": {}}
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(_StubApi(), ResponseCache())
+    )
+    httpd.RequestHandlerClass.log_message = lambda *args: None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_unexpected_error_returns_json_500(server):
+    status, body = _get(server + "/indicateurs")
+    assert status == 500
+    assert "erreur" in body
+
+
+def test_api_errors_keep_their_status(server):
+    status, body = _get(server + "/inconnue")
+    assert status == 404 and "erreur" in body
+
+
+def test_empty_level_sentinel(server):
+    assert _node_param({"noeud": f"Metal/{EMPTY_LEVEL}"}) == ("Metal", "")
+    assert _node_param({"noeud": "Metal/"}) == ("Metal",)
+
+    status, body = _get(server + "/arbre?noeud=Metal/" + EMPTY_LEVEL)
+    assert status == 200 and body["noeud"] == ["Metal", ""]
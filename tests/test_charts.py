@@ -0,0 +1,28 @@
+from matplotlib.figure import Figure
+
+from charts import FigureCache
+
+
+def _figure():
+    fig = Figure(figsize=(1, 1))
+    fig.subplots().plot([0, 1])
+    return fig
+
+
+def test_figure_cache_keys_on_dataset_digest():
+    cache = FigureCache()
+    first = cache.get(("barres", "digest-a", "Acidification"), _figure)
+    again = cache.get(("barres", "digest-a", "Acidification"), _figure)
+    cache.get(("barres", "digest-b", "Acidification"), _figure)
+
+    assert first == again
+    assert cache.cache_info()["hits"] == 1
+    assert cache.cache_info()["misses"] == 2
+
+
+def test_figure_cache_is_bounded():
+    png = FigureCache().get(("a",), _figure)
+    cache = FigureCache(max_bytes=len(png))
+    cache.get(("a",), _figure)
+    cache.get(("b",), _figure)
+    assert cache.cache_info()["entries"] == 1
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from correlations import spearman
+
+
+def test_spearman_matches_pandas_with_missing_values():
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(size=(200, 5))
+    x[:, 3] = 2 * x[:, 0] + rng.normal(size=200)
+    x[::7, 2] = 1.0  # égalités
+    x[rng.random(x.shape) < 0.2] = np.nan
+
+    expected = pd.DataFrame(x).corr("spearman").to_numpy()
+    np.testing.assert_allclose(spearman(x), expected, atol=1e-12)
+
+
+def test_spearman_reranks_on_pairwise_complete_rows():
+    # Les rangs de y sur ses 4 valeurs ne sont pas ceux des 3 lignes communes
+    x = np.array([1.0, 2.0, 3.0, np.nan])
+    y = np.array([3.0, 1.0, 2.0, 0.0])
+    corr = spearman(np.column_stack([x, y]))
+    expected = pd.DataFrame({"x": x, "y": y}).corr("spearman").iloc[0, 1]
+    assert np.isclose(corr[0, 1], expected)
+
+
+def test_spearman_undefined_with_fewer_than_two_pairs():
+    x = np.array([[1.0, np.nan], [np.nan, 2.0], [3.0, 4.0]])
+    assert np.isnan(spearman(x)[0, 1])
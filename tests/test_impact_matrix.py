@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from impact_matrix import build_impact_matrix
+
+
+def test_rows_without_uuid_are_ignored():
+    df_impacts = pd.DataFrame(
+        {
+            "UUID_procede": ["p0", "p0", None, "p1", "p1"],
+            "Nom_procede": ["P0", "P0", "orphelin", "P1", "P1"],
+            "UUID_cat": ["c0", "c1", "c0", np.nan, "c1"],
+            "valeur": [1.0, 2.0, 99.0, 98.0, 4.0],
+        }
+    )
+    df_cat = pd.DataFrame({"UUID_cat": ["c0", "c1"], "Nom français": ["A", "B"]})
+
+    matrix = build_impact_matrix(df_impacts, df_cat)
+
+    assert list(matrix.process_uuids) == ["p0", "p1"]
+    assert list(matrix.process_names) == ["P0", "P1"]
+    assert list(matrix.category_uuids) == ["c0", "c1"]
+    np.testing.assert_array_equal(matrix.values, [[1.0, 2.0], [np.nan, 4.0]])
@@ -0,0 +1,75 @@
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import instrumentation
+from instrumentation import measure, memory_tracking, recent_records
+
+
+@pytest.fixture(autouse=True)
+def _no_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, "LOG_PATH", str(tmp_path / "log.jsonl"))
+    instrumentation.clear_records()
+
+
+def _peak(stage):
+    records = recent_records()
+    return records[records["stage"] == stage]["peak_mb"].iloc[-1]
+
+
+def test_memory_is_tracked_per_call_only():
+    with measure("sans", track_memory=False):
+        pass
+    with measure("avec", track_memory=True):
+        buffer = bytearray(2_000_000)
+    del buffer
+
+    assert pd.isna(_peak("sans"))
+    assert _peak("avec") >= 2
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_tracking_scope_is_thread_local():
+    seen = {}
+
+    def other_session():
+        with measure("autre"):
+            seen["tracking"] = tracemalloc.is_tracing()
+
+    with memory_tracking():
+        with measure("session"):
+            bytearray(1_000_000)
+        thread = threading.Thread(target=other_session)
+        thread.start()
+        thread.join()
+
+    assert _peak("session") >= 1
+    assert pd.isna(_peak("autre"))
+    assert seen["tracking"]  # tracemalloc reste global au processus
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_tracked_runs_are_serialized():
+    events = []
+    inside = threading.Event()
+
+    def session(name):
+        with memory_tracking():
+            events.append(("debut", name))
+            inside.set()
+            time.sleep(0.05)
+            events.append(("fin", name))
+
+    first = threading.Thread(target=session, args=("a",))
+    first.start()
+    inside.wait()
+    second = threading.Thread(target=session, args=("b",))
+    second.start()
+    first.join()
+    second.join()
+
+    assert events == [("debut", "a"), ("fin", "a"), ("debut", "b"), ("fin", "b")]
+    assert not tracemalloc.is_tracing()
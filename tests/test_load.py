@@ -0,0 +1,43 @@
+import json
+import os
+
+import load
+from parse_cache import file_fingerprint
+
+
+def _bundle(tmp_path, monkeypatch):
+    sources = {}
+    for name in load.SOURCE_PARAMS:
+        path = tmp_path / f"{name}.src"
+        path.write_text("v1")
+        sources[name] = str(path)
+
+    root = tmp_path / "bundles"
+    (root / "b1").mkdir(parents=True)
+    manifest = {
+        "version": "b1",
+        "sources": {
+            name: {"path": path, "sha256": file_fingerprint(path)}
+            for name, path in sources.items()
+        },
+    }
+    (root / "b1" / "manifest.json").write_text(json.dumps(manifest))
+    (root / "CURRENT").write_text("b1")
+    monkeypatch.setattr(load, "BUNDLE_ROOT", str(root))
+    monkeypatch.setattr(load, "DEFAULT_PARAMS", {**load.DEFAULT_PARAMS, **sources})
+    load._open_bundle.clear()
+    return sources
+
+
+def test_bundle_served_while_sources_unchanged(tmp_path, monkeypatch):
+    _bundle(tmp_path, monkeypatch)
+    assert load._bundle_version(None) == "b1"
+
+
+def test_bundle_ignored_after_source_edited_in_place(tmp_path, monkeypatch):
+    sources = _bundle(tmp_path, monkeypatch)
+    path = sources["meta_path"]
+    with open(path, "w") as f:
+        f.write("v2, modifié")
+    os.utime(path, ns=(0, 1))
+    assert load._bundle_version(None) is None
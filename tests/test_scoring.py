@@ -0,0 +1,50 @@
+import numpy as np
+
+from impact_matrix import ImpactMatrix
+from scoring import ScoringEngine
+
+
+def _engine(values, weight_sets):
+    matrix = ImpactMatrix(
+        np.array(values, dtype=np.float64),
+        ["p0", "p1", "p2"],
+        ["P0", "P1", "P2"],
+        ["c0", "c1"],
+        ["A", "B"],
+    )
+    return ScoringEngine(
+        matrix,
+        hierarchy=None,
+        meta_to_matrix=np.arange(3),
+        normalization={"A": 1.0, "B": 1.0},
+        weight_sets=weight_sets,
+    )
+
+
+def test_incomplete_processes_are_not_scored_nor_ranked():
+    engine = _engine(
+        [[1.0, 1.0], [5.0, 5.0], [0.1, np.nan]], {"egal": {"A": 0.5, "B": 0.5}}
+    )
+    assert np.isnan(engine.scores[2, 0])
+
+    ranking = engine.ranking("egal")
+    assert list(ranking["UUID_procede"]) == ["p0", "p1", "p2"]
+    assert list(ranking["complet"]) == [True, True, False]
+    assert ranking["rang"].isna().tolist() == [False, False, True]
+    assert list(ranking["rang_centile"][:2]) == [0.5, 1.0]
+
+    ranks = engine.process_ranks("p2")
+    assert ranks["rang"].isna().all() and ranks["effectif"][0] == 2
+
+
+def test_missing_value_of_unweighted_category_keeps_score():
+    engine = _engine([[1.0, 1.0], [5.0, 5.0], [0.1, np.nan]], {"A seul": {"A": 1.0}})
+    np.testing.assert_allclose(engine.scores[:, 0], [1.0, 5.0, 0.1])
+
+
+def test_unknown_categories_are_skipped_and_weights_renormalized():
+    engine = _engine(
+        [[1.0, 3.0], [5.0, 5.0], [0.0, 1.0]], {"jeu": {"A": 0.25, "B": 0.25, "X": 0.5}}
+    )
+    np.testing.assert_allclose(engine.weights[:, 0], [0.5, 0.5])
+    np.testing.assert_allclose(engine.scores[:, 0], [2.0, 5.0, 0.5])
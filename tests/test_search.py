@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from search import build_search_index
+
+
+def _index():
+    return build_search_index(
+        pd.DataFrame(
+            {
+                "UUID": ["u1", "u2", "u3", "u4"],
+                "Nom du flux": ["Acier inoxydable", "Béton armé", "Bois", np.nan],
+                "English Name": ["Stainless steel", "Reinforced concrete", "Wood", "-"],
+                "Synonymes": [np.nan, "ciment", np.nan, np.nan],
+                "Synonyms": [np.nan, np.nan, "timber", np.nan],
+            }
+        )
+    )
+
+
+def test_search_tolerates_missing_accents_and_typos():
+    index = _index()
+    assert index.search("beton")["UUID"][0] == "u2"
+    assert index.search("acir inox")["UUID"][0] == "u1"
+
+
+def test_search_matches_english_names_and_synonyms():
+    index = _index()
+    assert index.search("timber")["UUID"][0] == "u3"
+    assert index.search("ciment")["UUID"][0] == "u2"
+    assert index.search("steel")["UUID"][0] == "u1"
+
+
+def test_search_without_results_or_query():
+    index = _index()
+    assert len(index.table) == 3  # procédé sans nom ignoré
+    assert index.search("zzzz").empty
+    empty = index.search("  ")
+    assert empty.empty and "score" in empty.columns
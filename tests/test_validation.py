@@ -0,0 +1,117 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from excel_reader import read_field_labels
+from hierarchy import LEVELS
+from load import load_impacts, scan_impacts
+from validation import (
+    OUTLIER_IQR_FACTOR,
+    OUTLIER_MIN_GROUP,
+    check_outliers,
+    check_sources,
+)
+
+
+def _write_transposed(path, rows):
+    wb = openpyxl.Workbook()
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+
+
+def test_duplicate_process_header_is_reported(tmp_path):
+    path = tmp_path / "procedes.xlsx"
+    _write_transposed(
+        path,
+        [
+            ["UUID", "UUID", "u1", "u2"],
+            ["Déviations", "Deviations", "a", "b"],
+            ["Unité", "Unit", "kg", "kg"],
+            ["Déviations", "Deviations", "c", "d"],
+        ],
+    )
+    labels = read_field_labels(str(path))
+    assert list(labels["Champ"]) == ["UUID", "Déviations", "Unité", "Déviations_b"]
+
+    df_large = pd.DataFrame({"UUID": ["u1", "u2"], "Nom": ["a", "b"], "cat": [1, 2]})
+    df_impacts = pd.DataFrame({"UUID_cat": ["c1", "c1"]})
+    df_cat = pd.DataFrame(columns=["UUID_cat", "Nom"])
+    coerced = pd.DataFrame(columns=["UUID_procede", "UUID_cat", "cellule"])
+    issues = check_sources(
+        coerced, (df_impacts, df_large), df_cat, list(labels["Libellé"])
+    )
+
+    assert list(issues["controle"]) == ["en_tete_duplique"]
+    assert issues["detail"][0] == "champs des procédés : 'Déviations'"
+    assert issues["valeur"][0] == 2
+
+
+def test_process_uuids_are_stripped_in_load_and_scan(tmp_path):
+    path = tmp_path / "impacts.csv"
+    path.write_text(
+        "UUID;;UUID;;  u1 ;u2 \n"
+        "Nom;;Nom;;p1;p2\n"
+        "c1;en;fr;kg;1.5;n/a\n",
+        encoding="latin1",
+    )
+    df_impacts, df_large = load_impacts(str(path))
+    coerced = scan_impacts(str(path))
+
+    assert list(df_impacts["UUID_procede"]) == ["u1", "u2"]
+    assert list(df_large["UUID"]) == ["u1", "u2"]
+    assert list(coerced["UUID_procede"]) == ["u2"]
+
+
+def _long_table(values, category="Acidification", level1="Metal", prefix="p"):
+    n = len(values)
+    df = pd.DataFrame({level: ["Metal"] * n for level in LEVELS})
+    df[LEVELS[0]] = level1
+    df["category_name"] = category
+    df["UUID_procede"] = [f"{prefix}{i}" for i in range(n)]
+    df["UUID_cat"] = "c1"
+    df["valeur"] = values
+    return df
+
+
+def test_outliers_use_log_scale_iqr_fences_per_category():
+    # Quartiles de log10 : 0 et 1, barrières à -3 et 4 pour un facteur 3
+    inside = [1.0] * 10 + [10.0] * 10 + [2e-3, 9e3]
+    df = pd.concat(
+        [
+            _long_table(inside + [1e5, 1e-4, 0.0, -50.0]),
+            # Autre indicateur : mêmes valeurs à une autre échelle, sans anomalie
+            _long_table([v * 1e6 for v in inside], category="Climat"),
+        ],
+        ignore_index=True,
+    )
+    issues = check_outliers(df)
+
+    assert sorted(issues["UUID_procede"]) == ["p22", "p23"]
+    scores = dict(zip(issues["UUID_procede"], issues["valeur"]))
+    np.testing.assert_allclose(scores["p22"], 4.0)
+    np.testing.assert_allclose(scores["p23"], -4.0)
+    # Seuil strict : un facteur au-delà des écarts observés ne relève rien
+    assert OUTLIER_IQR_FACTOR < 4.0
+    assert check_outliers(df, factor=4.0).empty
+
+
+def test_outliers_are_relative_to_the_level4_group():
+    # 1e6 est banal pour l'indicateur (groupe Bois) mais atypique parmi les
+    # métaux ; le groupe Verre, trop petit, est évalué sur tout l'indicateur
+    metal = [1.0, 10.0] * 10 + [1e6]
+    wood = [1e6, 1e7] * 10
+    glass = [1e6, 1e6, 1e-30]
+    df = pd.concat(
+        [
+            _long_table(metal, level1="Metal", prefix="m"),
+            _long_table(wood, level1="Bois", prefix="b"),
+            _long_table(glass, level1="Verre", prefix="v"),
+        ],
+        ignore_index=True,
+    )
+    issues = check_outliers(df)
+
+    assert len(glass) < OUTLIER_MIN_GROUP <= len(metal)
+    assert sorted(issues["UUID_procede"]) == ["m20", "v2"]
+    assert issues["detail"].str.startswith("Metal").sum() == 1
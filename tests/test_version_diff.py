@@ -0,0 +1,21 @@
+import numpy as np
+
+from impact_matrix import ImpactMatrix
+from version_diff import diff_matrices
+
+
+def _matrix(names):
+    return ImpactMatrix(
+        np.ones((3, 1)),
+        np.array(["p0", "p1", "p2"], dtype=object),
+        np.array(names, dtype=object),
+        np.array(["c0"], dtype=object),
+        np.array(["A"], dtype=object),
+    )
+
+
+def test_missing_names_on_both_sides_are_not_renames():
+    diff = diff_matrices(
+        _matrix(["P0", np.nan, np.nan]), _matrix(["P0", np.nan, "P2"])
+    )
+    assert list(diff.renamed["UUID"]) == ["p2"]
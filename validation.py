@@ -0,0 +1,302 @@
+"""
+Contrôle qualité de la Base Impacts, en lot sur tout le jeu de données :
+valeurs non numériques converties en NaN, UUID orphelins, en-têtes
+dupliqués, procédés sans valeur pour certains indicateurs et valeurs
+atypiques (écart interquartile en échelle logarithmique, par groupe de
+niveau 4 x indicateur).
+Chaque famille de contrôles est une étape du pipeline de chargement : seules
+celles dont les entrées ont changé sont recalculées.
+
+Usage : python validation.py [--version BI_2.02] [--data data] [--out rapport.json]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from hierarchy import LEVELS
+from stats import CATEGORY_KEYS, GROUP_KEYS, group_codes, group_statistics, map_to_rows
+
+
+# Contrôles du rapport et leur description
+CHECKS = {
+    "valeur_non_numerique": "Cellule d'impact non numérique, convertie en NaN",
+    "en_tete_duplique": "Nom de colonne ou UUID répété dans un en-tête",
+    "procede_orphelin": "Procédé du fichier d'impacts absent des métadonnées",
+    "procede_sans_impacts": "Procédé des métadonnées absent du fichier d'impacts",
+    "categorie_orpheline": "Catégorie d'impact absente du fichier des catégories",
+    "indicateur_manquant": "Procédé sans valeur pour un indicateur",
+    "valeur_atypique": "Valeur atypique dans son groupe de niveau 4 x indicateur",
+}
+
+ISSUE_COLUMNS = ["controle", "UUID_procede", "UUID_cat", "detail", "valeur"]
+
+# Barrières de Tukey « éloignées » : Q1 - 3 x IQR et Q3 + 3 x IQR, calculées
+# sur log10(valeur) (les impacts d'un indicateur couvrent plusieurs ordres
+# de grandeur)
+OUTLIER_IQR_FACTOR = 3.0
+
+# Effectif minimal (valeurs positives) d'un groupe de niveau 4 x indicateur
+# pour ses propres quartiles ; en dessous, ceux de l'indicateur sont utilisés
+OUTLIER_MIN_GROUP = 10
+
+
+class ValidationReport:
+    """
+    Rapport du contrôle qualité : une ligne par anomalie détectée.
+    :param issues: DataFrame (controle, UUID_procede, UUID_cat, detail, valeur)
+    """
+
+    def __init__(self, issues):
+        self.issues = issues.reset_index(drop=True)
+
+    def summary(self):
+        """
+        :return: Dictionnaire {contrôle: nombre d'anomalies} (tous les contrôles)
+        """
+        counts = self.issues["controle"].value_counts()
+        return {check: int(counts.get(check, 0)) for check in CHECKS}
+
+    def check(self, name):
+        """
+        Anomalies d'un contrôle.
+        :param name: Contrôle (cf. CHECKS)
+        :return: DataFrame
+        """
+        return self.issues[self.issues["controle"] == name].reset_index(drop=True)
+
+    def to_dict(self):
+        """
+        Version sérialisable en JSON (NaN -> null), anomalies regroupées par
+        contrôle.
+        """
+        return {
+            "resume": self.summary(),
+            "controles": {
+                check: {
+                    "description": description,
+                    "anomalies": _records(self.check(check).drop(columns="controle")),
+                }
+                for check, description in CHECKS.items()
+            },
+        }
+
+    def to_json(self, path):
+        """
+        Exporte le rapport en JSON.
+        :param path: Chemin du fichier écrit
+        :return: Chemin du fichier écrit
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+def _records(df):
+    df = df.replace([np.inf, -np.inf], np.nan).astype(object)
+    return df.where(df.notna(), None).to_dict(orient="records")
+
+
+def _issues(check, uuid_procede=None, uuid_cat=None, detail=None, valeur=None):
+    # Table d'anomalies d'un contrôle (colonnes de ISSUE_COLUMNS)
+    columns = {
+        "UUID_procede": uuid_procede,
+        "UUID_cat": uuid_cat,
+        "detail": detail,
+        "valeur": valeur,
+    }
+    n = max((len(v) for v in columns.values() if v is not None), default=0)
+    df = pd.DataFrame(
+        {
+            name: np.full(n, None, dtype=object) if v is None else np.asarray(v)
+            for name, v in columns.items()
+        }
+    )
+    df.insert(0, "controle", check)
+    df["valeur"] = pd.to_numeric(df["valeur"], errors="coerce")
+    return df
+
+
+def _concat(frames):
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _duplicates(labels, source):
+    labels = pd.Series(list(labels), dtype=object).dropna()
+    counts = labels.value_counts()
+    counts = counts[counts > 1]
+    return _issues(
+        "en_tete_duplique",
+        detail=[f"{source} : {label!r}" for label in counts.index],
+        valeur=counts.to_numpy(),
+    )
+
+
+def check_sources(coerced, impacts, df_cat, meta_labels):
+    """
+    Contrôles des fichiers sources : valeurs non numériques et en-têtes
+    dupliqués (champs des procédés et des catégories, UUID des procédés et
+    des catégories du fichier d'impacts).
+    :param coerced: Résultat de scan_impacts
+    :param impacts: Tuple (DataFrame long, DataFrame large) de load_impacts
+    :param df_cat: Métadonnées des catégories d'impacts
+    :param meta_labels: Libellés d'origine des champs des procédés (avant
+        renommage des doublons, cf. parse_meta_labels)
+    :return: DataFrame des anomalies
+    """
+    df_impacts, df_large = impacts
+    # Le fichier long répète l'UUID de chaque catégorie pour chaque procédé
+    n_procedes = len(df_large)
+    cat_rows = df_impacts["UUID_cat"].iloc[::n_procedes] if n_procedes else []
+    return _concat(
+        [
+            _issues(
+                "valeur_non_numerique",
+                coerced["UUID_procede"],
+                coerced["UUID_cat"],
+                detail=coerced["cellule"],
+            ),
+            _duplicates(meta_labels, "champs des procédés"),
+            _duplicates(df_cat.columns, "champs des catégories"),
+            _duplicates(df_large.iloc[:, 0], "UUID des procédés (impacts)"),
+            _duplicates(df_large.columns[2:], "catégories (impacts)"),
+            _duplicates(cat_rows, "UUID des catégories (impacts)"),
+        ]
+    )
+
+
+def check_links(df_meta, impacts, df_cat, matrix):
+    """
+    Contrôles des jointures du chargement (merges gauches sur UUID_procede
+    et UUID_cat) et des indicateurs manquants.
+    :param df_meta: Métadonnées des procédés
+    :param impacts: Tuple (DataFrame long, DataFrame large) de load_impacts
+    :param df_cat: Métadonnées des catégories d'impacts
+    :param matrix: ImpactMatrix
+    :return: DataFrame des anomalies
+    """
+    df_impacts, _ = impacts
+    impact_uuids = pd.Series(df_impacts["UUID_procede"].unique()).dropna()
+    cat_uuids = pd.Series(df_impacts["UUID_cat"].unique()).dropna()
+
+    orphans = impact_uuids[~impact_uuids.isin(df_meta["UUID"])]
+    without_impacts = df_meta[
+        df_meta["UUID"].notna() & ~df_meta["UUID"].isin(impact_uuids)
+    ]
+    orphan_categories = cat_uuids[~cat_uuids.isin(df_cat["UUID_cat"])]
+
+    # Indicateurs manquants : cellules NaN de la matrice procédés x catégories
+    rows, cols = np.nonzero(np.isnan(matrix.values))
+    return _concat(
+        [
+            _issues("procede_orphelin", orphans.to_numpy()),
+            _issues(
+                "procede_sans_impacts",
+                without_impacts["UUID"].to_numpy(),
+                detail=without_impacts["Nom du flux"].to_numpy(),
+            ),
+            _issues("categorie_orpheline", uuid_cat=orphan_categories.to_numpy()),
+            _issues(
+                "indicateur_manquant",
+                matrix.process_uuids[rows],
+                np.asarray(matrix.category_uuids)[cols],
+                detail=np.asarray(matrix.category_names)[cols],
+            ),
+        ]
+    )
+
+
+def check_outliers(
+    df_im, factor=OUTLIER_IQR_FACTOR, min_group=OUTLIER_MIN_GROUP, value_col="valeur"
+):
+    """
+    Valeurs atypiques au sein de chaque groupe de niveau 4 x indicateur :
+    log10(valeur) hors des barrières [Q1 - factor x IQR, Q3 + factor x IQR]
+    du groupe. Les groupes de moins de min_group valeurs, ou d'écart
+    interquartile nul, sont évalués avec les quartiles de tout l'indicateur.
+    Seules les valeurs strictement positives sont évaluées (pas d'échelle
+    logarithmique pour les valeurs nulles ou négatives).
+    :param df_im: Table longue des impacts enrichie (non modifiée)
+    :param factor: Multiple de l'écart interquartile
+    :param min_group: Effectif minimal d'un groupe pour ses propres quartiles
+    :return: DataFrame des anomalies (valeur = écart de log10(valeur) au
+        quartile le plus proche, en nombre d'IQR, négatif sous Q1)
+    """
+    values = df_im[value_col].to_numpy(dtype=np.float64)
+    positive = values > 0
+    log_values = np.full(len(values), np.nan)
+    log_values[positive] = np.log10(values[positive])
+
+    q1, q3, count = _log_quartiles(df_im, log_values, GROUP_KEYS)
+    category_q1, category_q3, _ = _log_quartiles(df_im, log_values, CATEGORY_KEYS)
+    fallback = (count < min_group) | ~(q3 - q1 > 0)
+    q1 = np.where(fallback, category_q1, q1)
+    q3 = np.where(fallback, category_q3, q3)
+
+    iqr = q3 - q1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.where(
+            log_values > q3, (log_values - q3) / iqr, (log_values - q1) / iqr
+        )
+    score = np.where(iqr > 0, score, np.nan)
+    rows = np.flatnonzero(np.abs(np.nan_to_num(score)) > factor)
+
+    flagged = df_im.iloc[rows]
+    # Groupe de la valeur : niveaux renseignés > indicateur
+    keys = flagged[LEVELS + ["category_name"]].itertuples(index=False, name=None)
+    detail = [" > ".join(v for v in key if isinstance(v, str) and v) for key in keys]
+    return _issues(
+        "valeur_atypique",
+        flagged["UUID_procede"].to_numpy(),
+        flagged["UUID_cat"].to_numpy(),
+        detail=detail,
+        valeur=score[rows],
+    )
+
+
+def _log_quartiles(df_im, log_values, keys):
+    # Q1, Q3 et nombre de valeurs évaluées du groupe de chaque ligne
+    codes, groups = group_codes(df_im, keys)
+    stats = group_statistics(log_values, codes, len(groups), quantiles=(0.25, 0.75))
+    return (
+        map_to_rows(stats["q25"], codes),
+        map_to_rows(stats["q75"], codes),
+        map_to_rows(stats["count"], codes),
+    )
+
+
+def build_validation_report(*checks):
+    """
+    Rassemble les anomalies des étapes de contrôle.
+    :param checks: DataFrames des anomalies
+    :return: ValidationReport
+    """
+    return ValidationReport(_concat(list(checks)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--version", help="Version de la Base Impacts (ex: BI_2.02)")
+    parser.add_argument("--data", default="data", help="Dossier des fichiers sources")
+    parser.add_argument("--out", help="Fichier JSON écrit (par défaut aucun)")
+    args = parser.parse_args()
+
+    # Import local : load importe ce module
+    from load import run_pipeline, version_params
+
+    params = version_params(args.version, args.data)
+    report = run_pipeline(params, targets=["validation"])["validation"]
+    print(json.dumps(report.summary(), ensure_ascii=False, indent=2))
+    if args.out:
+        print("Rapport exporté :", report.to_json(args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Comparaison de deux versions de la Base Impacts : procédés ajoutés,
+supprimés et modifiés, et variation relative des impacts par indicateur.
+
+Usage : python version_diff.py BI_2.02 BI_2.03 [--data data] [--out diff.json]
+"""
+
+import argparse
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+class VersionDiff:
+    """
+    Différences entre deux versions de la Base Impacts : procédés ajoutés,
+    supprimés et modifiés, valeurs d'impacts modifiées et variation relative
+    par indicateur.
+    :param old_version: Nom de l'ancienne version (ex: "BI_2.02")
+    :param new_version: Nom de la nouvelle version
+    :param added: DataFrame (UUID, Nom) des procédés ajoutés
+    :param removed: DataFrame (UUID, Nom) des procédés supprimés
+    :param changed: DataFrame des procédés communs dont au moins une valeur a changé
+    :param changes: DataFrame longue des valeurs modifiées (une ligne par
+        procédé x catégorie)
+    :param renamed: DataFrame des procédés communs dont le nom a changé
+    :param indicators: DataFrame résumé par catégorie d'impact commune
+    :param categories_added: Noms des catégories ajoutées
+    :param categories_removed: Noms des catégories supprimées
+    :param n_common: Nombre de procédés communs aux deux versions
+    """
+
+    def __init__(
+        self,
+        old_version,
+        new_version,
+        added,
+        removed,
+        changed,
+        changes,
+        renamed,
+        indicators,
+        categories_added,
+        categories_removed,
+        n_common,
+    ):
+        self.old_version = old_version
+        self.new_version = new_version
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.changes = changes
+        self.renamed = renamed
+        self.indicators = indicators
+        self.categories_added = list(categories_added)
+        self.categories_removed = list(categories_removed)
+        self.n_common = n_common
+
+    def summary(self):
+        """
+        :return: Dictionnaire des effectifs (ajoutés, supprimés, modifiés...)
+        """
+        return {
+            "ancienne_version": self.old_version,
+            "nouvelle_version": self.new_version,
+            "procedes_communs": self.n_common,
+            "procedes_ajoutes": len(self.added),
+            "procedes_supprimes": len(self.removed),
+            "procedes_modifies": len(self.changed),
+            "procedes_renommes": len(self.renamed),
+            "valeurs_modifiees": len(self.changes),
+            "categories_ajoutees": len(self.categories_added),
+            "categories_supprimees": len(self.categories_removed),
+        }
+
+    def to_dict(self):
+        """
+        Version sérialisable en JSON (NaN et infinis -> null).
+        """
+        return {
+            "resume": self.summary(),
+            "categories_ajoutees": self.categories_added,
+            "categories_supprimees": self.categories_removed,
+            "indicateurs": _records(self.indicators),
+            "procedes_ajoutes": _records(self.added),
+            "procedes_supprimes": _records(self.removed),
+            "procedes_modifies": _records(self.changed),
+            "procedes_renommes": _records(self.renamed),
+            "valeurs_modifiees": _records(self.changes),
+        }
+
+    def to_json(self, path):
+        """
+        Exporte le diff en JSON.
+        :param path: Chemin du fichier écrit
+        :return: Chemin du fichier écrit
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        return path
+
+
+def _records(df):
+    df = df.replace([np.inf, -np.inf], np.nan).astype(object)
+    return df.where(df.notna(), None).to_dict(orient="records")
+
+
+def _reduce(func, values, axis):
+    # Réduction NaN-aware, NaN si l'axe réduit est vide (aucune valeur)
+    if values.shape[axis] == 0:
+        return np.full(values.shape[1 - axis], np.nan)
+    with warnings.catch_warnings():
+        # Lignes ou colonnes sans valeur modifiée : réduction de NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(values, axis=axis)
+
+
+def _lookup(index, keys):
+    # Jointure par hachage : position de chaque clé dans l'autre version
+    # (-1 si absente)
+    return np.fromiter(
+        (index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys)
+    )
+
+
+def diff_matrices(old, new, old_version="ancienne", new_version="nouvelle", rtol=0.0):
+    """
+    Compare les matrices denses des impacts de deux versions. Procédés et
+    catégories sont appariés par UUID (jointure par hachage sur les index
+    des matrices), puis les valeurs communes sont comparées en un seul
+    passage vectorisé.
+    :param old: ImpactMatrix de l'ancienne version
+    :param new: ImpactMatrix de la nouvelle version
+    :param rtol: Tolérance relative en dessous de laquelle une valeur est
+        considérée inchangée (0 = égalité stricte)
+    :return: VersionDiff
+    """
+    # Procédés : ligne de chaque procédé de la nouvelle version dans l'ancienne
+    old_rows = _lookup(old.process_index, new.process_uuids)
+    common = old_rows >= 0
+    new_common = np.flatnonzero(common)
+    old_common = old_rows[common]
+    kept = np.zeros(old.shape[0], dtype=bool)
+    kept[old_common] = True
+
+    added_rows = np.flatnonzero(~common)
+    removed_rows = np.flatnonzero(~kept)
+    added = pd.DataFrame(
+        {"UUID": new.process_uuids[added_rows], "Nom": new.process_names[added_rows]}
+    )
+    removed = pd.DataFrame(
+        {
+            "UUID": old.process_uuids[removed_rows],
+            "Nom": old.process_names[removed_rows],
+        }
+    )
+
+    old_names = old.process_names[old_common]
+    new_names = new.process_names[new_common]
+    # Deux noms manquants ne constituent pas un renommage (NaN != NaN)
+    renamed_mask = (old_names != new_names) & ~(
+        pd.isna(old_names) & pd.isna(new_names)
+    )
+    renamed = pd.DataFrame(
+        {
+            "UUID": new.process_uuids[new_common[renamed_mask]],
+            "Ancien nom": old_names[renamed_mask],
+            "Nouveau nom": new_names[renamed_mask],
+        }
+    )
+
+    # Catégories d'impacts communes, appariées de la même façon
+    old_cols = _lookup(old.category_index, new.category_uuids)
+    common_cols = old_cols >= 0
+    new_cols = np.flatnonzero(common_cols)
+    old_cols = old_cols[common_cols]
+    kept_cols = np.zeros(old.shape[1], dtype=bool)
+    kept_cols[old_cols] = True
+    categories_added = list(new.category_names[~common_cols])
+    categories_removed = list(old.category_names[~kept_cols])
+    category_names = new.category_names[new_cols]
+
+    # Comparaison des valeurs (NaN des deux côtés = inchangé)
+    a = old.values[np.ix_(old_common, old_cols)]
+    b = new.values[np.ix_(new_common, new_cols)]
+    diff = ~np.isclose(a, b, rtol=rtol, atol=0.0, equal_nan=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = (b - a) / np.abs(a)
+    abs_relative = np.where(diff & np.isfinite(relative), np.abs(relative), np.nan)
+
+    indicators = pd.DataFrame(
+        {
+            "UUID_cat": new.category_uuids[new_cols],
+            "Nom français": category_names,
+            "procedes_communs": len(new_common),
+            "valeurs_modifiees": diff.sum(axis=0),
+            "part_modifiee": _reduce(np.mean, diff, 0),
+            "variation_rel_moyenne": _reduce(np.nanmean, abs_relative, 0),
+            "variation_rel_mediane": _reduce(np.nanmedian, abs_relative, 0),
+            "variation_rel_max": _reduce(np.nanmax, abs_relative, 0),
+        }
+    )
+    changed_rows = np.flatnonzero(diff.any(axis=1))
+    changed = pd.DataFrame(
+        {
+            "UUID": new.process_uuids[new_common[changed_rows]],
+            "Nom": new_names[changed_rows],
+            "indicateurs_modifies": diff[changed_rows].sum(axis=1),
+            "variation_rel_max": _reduce(np.nanmax, abs_relative[changed_rows], 1),
+        }
+    )
+
+    r, c = np.nonzero(diff)
+    changes = pd.DataFrame(
+        {
+            "UUID": new.process_uuids[new_common[r]],
+            "Nom": new_names[r],
+            "Nom français": category_names[c],
+            "ancienne_valeur": a[r, c],
+            "nouvelle_valeur": b[r, c],
+            "variation_rel": relative[r, c],
+        }
+    )
+
+    return VersionDiff(
+        old_version,
+        new_version,
+        added,
+        removed,
+        changed,
+        changes,
+        renamed,
+        indicators,
+        categories_added,
+        categories_removed,
+        len(new_common),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("old", help="Ancienne version (ex: BI_2.02)")
+    parser.add_argument("new", help="Nouvelle version")
+    parser.add_argument("--data", default="data", help="Dossier des fichiers sources")
+    parser.add_argument("--out", help="Fichier JSON écrit (par défaut dans export/)")
+    parser.add_argument("--rtol", type=float, default=0.0, help="Tolérance relative")
+    args = parser.parse_args()
+
+    # Import local : load importe ce module
+    from load import diff_versions, version_diff_path
+
+    diff = diff_versions(args.old, args.new, args.rtol, args.data)
+    path = diff.to_json(args.out or version_diff_path(args.old, args.new))
+    print(json.dumps(diff.summary(), ensure_ascii=False, indent=2))
+    print("Diff exporté :", path)
+
+
+if __name__ == "__main__":
+    main()